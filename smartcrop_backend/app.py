@@ -4,13 +4,17 @@ Production-ready REST API for crop recommendation and disease detection
 """
 
 import os
+import io
+import csv
 import sys
 import json
+import hmac
 import traceback
-from datetime import datetime
-from flask import Flask, request, jsonify
+from datetime import datetime, timedelta
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+import numpy as np
 import logging
 
 # Configure logging
@@ -28,12 +32,30 @@ logger = logging.getLogger(__name__)
 from services.crop_service import CropRecommender
 from services.disease_service import DiseaseDetector
 from services.iot_service import IOTSimulator
+from services.sensor_log import SensorLog
+from services.sensor_stream import SensorStreamHub
+from services.sensor_ingestor import SensorIngestor
+from services.alert_tracker import AlertTracker
+from services.anomaly_detector import AnomalyDetector, SPIKE, FLATLINE, DRIFT
+from services import sensor_export
+from services.recommendation_pipeline import RecommendationPipeline
+from services.field_index import FieldIndex, FEATURES as FIELD_FEATURES
+from services.validation import Field, Schema, ValidationError
+from services.json_provider import FastJSONProvider
+from services.http_cache import Compressor, conditional
+from govt_integrations import enam_scraper
 from govt_integrations.govt_routes import govt_bp, init_all as init_govt
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
 
+# orjson/ujson when installed (JSON_BACKEND=json forces the stdlib); NumPy values serialize as is
+app.json = FastJSONProvider(app, backend=os.environ.get('JSON_BACKEND'))
+
+# gzip (brotli when installed) for text/JSON responses of at least COMPRESS_MIN_BYTES
+compressor = Compressor(app, min_size=int(os.environ.get('COMPRESS_MIN_BYTES', 1024)))
+
 # Register Government Portal blueprint
 app.register_blueprint(govt_bp)
 
@@ -46,12 +68,46 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+SENSOR_LOG_DIR = os.environ.get('SENSOR_LOG_DIR', os.path.join('data', 'sensor_log'))
+SENSOR_TICK_SECONDS = float(os.environ.get('SENSOR_TICK_SECONDS', 5))
+MODEL_WATCH_SECONDS = float(os.environ.get('MODEL_WATCH_SECONDS', 5))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
 
 # Initialize ML services
 try:
-    crop_recommender = CropRecommender()
-    disease_detector = DiseaseDetector()
-    iot_simulator = IOTSimulator()
+    crop_recommender = CropRecommender(
+        cache_size=int(os.environ.get('CROP_CACHE_SIZE', 4096)),
+        cache_precision=int(os.environ.get('CROP_CACHE_PRECISION', 2)),
+        watch_interval=MODEL_WATCH_SECONDS
+    )
+    disease_detector = DiseaseDetector(watch_interval=MODEL_WATCH_SECONDS)
+    field_index = FieldIndex(
+        os.environ.get('FIELD_HISTORY_DB', os.path.join('data', 'field_history.db'))
+    )
+    sensor_log = SensorLog(
+        SENSOR_LOG_DIR,
+        metrics=IOTSimulator.METRICS,
+        scenarios=list(IOTSimulator.SCENARIOS),
+        retention_days=int(os.environ.get('SENSOR_LOG_RETENTION_DAYS', 180)),
+    )
+    sensor_seed = os.environ.get('SENSOR_SEED')
+    iot_simulator = IOTSimulator(
+        sensor_log=sensor_log,
+        seed=int(sensor_seed) if sensor_seed else None,
+    )
+    sensor_hub = SensorStreamHub()
+    sensor_ingestor = SensorIngestor([iot_simulator], interval=SENSOR_TICK_SECONDS)
+    alert_tracker = AlertTracker()
+    sensor_ingestor.add_listener(alert_tracker.observe)
+    sensor_ingestor.add_listener(sensor_hub.on_snapshot)
+    anomaly_detector = AnomalyDetector(IOTSimulator.METRICS)
+    sensor_ingestor.add_batch_listener(anomaly_detector.observe_batch)
+    recommendation_pipeline = RecommendationPipeline(
+        crop_recommender, [iot_simulator], iot_simulator.rules,
+        price_lookup=enam_scraper.get_price_comparison,
+        ttl=float(os.environ.get('RECOMMENDATION_CACHE_TTL', 15))
+    )
+    sensor_ingestor.start()
     logger.info("✅ ML services initialized successfully")
 except Exception as e:
     logger.error(f"❌ Failed to initialize ML services: {str(e)}")
@@ -70,6 +126,147 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+# Sample sheet column aliases (lab sheets often use N/P/K)
+FEATURE_ALIASES = {'n': 'nitrogen', 'p': 'phosphorus', 'k': 'potassium', 'pH': 'ph'}
+BATCH_MAX_SAMPLES = int(os.environ.get('BATCH_MAX_SAMPLES', 50000))
+# Batch responses with more results than this are serialized while being sent
+JSON_STREAM_MIN_ITEMS = int(os.environ.get('JSON_STREAM_MIN_ITEMS', 2000))
+
+# Physically plausible input ranges (N/P/K kg/ha, °C, %, pH, mm)
+CROP_INPUT_RANGES = {
+    'nitrogen': (0, 1000),
+    'phosphorus': (0, 1000),
+    'potassium': (0, 1000),
+    'temperature': (-50, 65),
+    'humidity': (0, 100),
+    'ph': (0, 14),
+    'rainfall': (0, 5000),
+}
+
+
+def crop_fields(required=True):
+    return [Field(name, required=required, min=low, max=high)
+            for name, (low, high) in CROP_INPUT_RANGES.items()]
+
+
+# Request schemas, compiled once at import; a ValidationError becomes a 400
+CROP_INPUT = Schema(*crop_fields(), Field('field_id', str, required=False))
+CROP_SAMPLES = Schema(*crop_fields())
+PREDICT_CROP_ARGS = Schema(
+    Field('top_k', int, required=False, min=1, max=50),
+    Field('contributions', bool, default=False),
+    Field('explain', bool, default=False),
+    Field('similar', int, default=0, min=0, max=100),
+    message='Invalid query parameters'
+)
+BATCH_ARGS = Schema(Field('contributions', bool, default=False), message='Invalid query parameters')
+SIMILAR_FIELDS_ARGS = Schema(
+    *crop_fields(), Field('k', int, default=5, min=1, max=100),
+    message='Invalid query parameters'
+)
+OUTCOME_INPUT = Schema(
+    Field('record_id', int, min=1),
+    Field('crop', str),
+    Field('yield', required=False, min=0, max=100000),
+    message='Invalid outcome'
+)
+SENSOR_HISTORY_ARGS = Schema(
+    Field('limit', int, default=10, min=1, max=10000),
+    Field('device', str, required=False),
+    Field('start', datetime, required=False),
+    Field('end', datetime, required=False),
+    message='Invalid query parameters'
+)
+ALERT_EVENTS_ARGS = Schema(
+    Field('cursor', int, default=0, min=0),
+    Field('limit', int, default=100, min=1, max=1000),
+    Field('device', str, required=False),
+    message='Invalid query parameters'
+)
+ANOMALY_ARGS = Schema(
+    *ALERT_EVENTS_ARGS.fields,
+    Field('type', str, required=False, choices=(SPIKE, FLATLINE, DRIFT)),
+    message='Invalid query parameters'
+)
+TIMESERIES_ARGS = Schema(
+    # The daily tier keeps 366 buckets
+    Field('hours', default=24, min=0.01, max=366 * 24),
+    Field('resolution', str, required=False, choices=('raw', 'minute', 'hour', 'day')),
+    Field('max_points', int, default=500, min=1, max=10000),
+    message='Invalid query parameters'
+)
+EXPORT_ARGS = Schema(
+    Field('format', str, default='csv', choices=sensor_export.available_formats()),
+    Field('devices', str, default=''),
+    Field('start', datetime, required=False),
+    Field('end', datetime, required=False),
+    Field('after', datetime, required=False),
+    Field('after_device', str, required=False),
+    message='Invalid query parameters'
+)
+SMART_INPUT = Schema(
+    *crop_fields(required=False),
+    Field('soil_moisture', required=False, min=0, max=100),
+    Field('light_intensity', required=False, min=0, max=200000),
+    Field('field_id', str, required=False),
+    message='Invalid recommendation input'
+)
+
+
+def json_body():
+    """Parsed JSON request body (None when empty); malformed JSON is a 400"""
+    data = request.get_json(silent=True)
+    if data is None and request.get_data(cache=True).strip():
+        raise ValidationError([{'field': None, 'message': 'Request body is not valid JSON'}])
+    return data
+
+
+def parse_crop_samples():
+    """
+    Read soil samples from the request as (ids, feature matrix)
+    
+    Accepts a CSV upload ('file' field), a text/csv body, or JSON
+    {"samples": [...]} where each sample is a dict of feature names or a
+    list of 7 values. An optional sample_id/id column is echoed back.
+    Values are coerced and range-checked in bulk by CROP_SAMPLES.
+    """
+    features = CropRecommender.FEATURES
+    
+    if 'file' in request.files or request.mimetype == 'text/csv':
+        if 'file' in request.files:
+            text = request.files['file'].read().decode('utf-8-sig')
+        else:
+            text = request.get_data(as_text=True)
+        reader = csv.reader(io.StringIO(text))
+        header = [h.strip() for h in next(reader, [])]
+        columns = [FEATURE_ALIASES.get(h, FEATURE_ALIASES.get(h.lower(), h.lower())) for h in header]
+        missing = [f for f in features if f not in columns]
+        if missing:
+            raise ValidationError([{'field': f, 'message': 'CSV column is missing'} for f in missing],
+                                  required=features)
+        index = [columns.index(f) for f in features]
+        id_col = next((columns.index(c) for c in ('sample_id', 'id') if c in columns), None)
+        rows = [row for row in reader if row]
+        ids = [row[id_col] for row in rows] if id_col is not None else None
+        samples = [[row[i] if i < len(row) else None for i in index] for row in rows]
+    else:
+        data = request.get_json(silent=True) or {}
+        samples = data.get('samples') if isinstance(data, dict) else data
+        if not isinstance(samples, list):
+            raise ValidationError([{'field': 'samples',
+                                    'message': 'Expected JSON {"samples": [...]} or a CSV upload'}])
+        ids = None
+        if samples and isinstance(samples[0], dict):
+            ids = [s.get('sample_id', s.get('id')) if isinstance(s, dict) else None for s in samples]
+            if all(i is None for i in ids):
+                ids = None
+    
+    X = CROP_SAMPLES.validate_matrix(samples, max_samples=BATCH_MAX_SAMPLES)
+    if not len(X):
+        raise ValidationError([{'field': 'samples', 'message': 'No samples provided'}])
+    return ids, X
+
+
 # ============================================================================
 # HEALTH CHECK ENDPOINTS
 # ============================================================================
@@ -92,15 +289,26 @@ def api_status():
         'version': '1.0.0',
         'endpoints': {
             'crop_recommendation': '/api/predict_crop',
+            'crop_recommendation_batch': '/api/predict_crop/batch',
+            'similar_fields': '/api/similar_fields',
             'disease_detection': '/api/predict_disease',
             'iot_data': '/api/sensor_data',
+            'iot_stream': '/api/sensor_data/stream',
             'govt_mandi_prices': '/api/govt/mandi/prices',
             'govt_advisories': '/api/govt/advisories',
             'govt_schemes': '/api/govt/schemes',
             'govt_insurance': '/api/govt/insurance/calculate',
             'govt_dashboard': '/api/govt/dashboard',
             'documentation': '/docs'
-        }
+        },
+        'models': {
+            'crop': crop_recommender.model_status(),
+            'disease': disease_detector.model_status()
+        },
+        'crop_prediction_cache': crop_recommender.cache_stats(),
+        'field_index': field_index.stats(),
+        'json_backend': app.json.backend,
+        'compression': compressor.stats()
     }), 200
 
 
@@ -123,43 +331,68 @@ def predict_crop():
         "ph": 6.89,
         "rainfall": 202.9
     }
+    
+    Query params: top_k (return the k best crops as alternatives),
+    contributions=true (per-feature contributions for each ranked crop),
+    explain=true (why the recommended crop was chosen) and similar (the
+    k most similar past fields)
+    
+    Every request is stored for similar-field lookups; the response's
+    record_id can be used to report the outcome later.
     """
+    data = json_body()
+    inputs = CROP_INPUT.validate(data)
+    args = PREDICT_CROP_ARGS.validate(request.args)
+    top_k = args.get('top_k')
+    with_contributions = args['contributions']
+    explain = args['explain']
+    similar_k = args['similar']
+    
     try:
-        data = request.get_json()
-        
-        # Validate input
-        required_fields = ['nitrogen', 'phosphorus', 'potassium', 
-                          'temperature', 'humidity', 'ph', 'rainfall']
-        
-        if not all(field in data for field in required_fields):
-            return jsonify({
-                'error': 'Missing required fields',
-                'required': required_fields
-            }), 400
-        
-        # Extract features
-        features = [
-            float(data['nitrogen']),
-            float(data['phosphorus']),
-            float(data['potassium']),
-            float(data['temperature']),
-            float(data['humidity']),
-            float(data['ph']),
-            float(data['rainfall'])
-        ]
+        features = [inputs[name] for name in CropRecommender.FEATURES]
         
-        # Get prediction
-        recommendation = crop_recommender.predict(features)
+        # Get prediction (one predict_proba for the whole ranking)
+        ranked = crop_recommender.rank(features, k=top_k or 1,
+                                       contributions=with_contributions or explain)
+        recommendation = ranked[0]
         
         logger.info(f"✅ Crop prediction successful: {recommendation['crop']}")
         
-        return jsonify({
+        response = {
             'success': True,
             'crop': recommendation['crop'],
             'confidence': recommendation['confidence'],
             'input': data,
             'timestamp': datetime.now().isoformat()
-        }), 200
+        }
+        if top_k:
+            response['alternatives'] = ranked
+        if with_contributions and 'contributions' in recommendation:
+            response['contributions'] = recommendation['contributions']
+        if explain and 'contributions' in recommendation:
+            # Largest effects first; positive values pushed towards this crop
+            ordered = sorted(recommendation['contributions'].items(), key=lambda kv: -abs(kv[1]))
+            response['explanation'] = {
+                'crop': recommendation['crop'],
+                'method': 'decision_path',
+                'baseline': recommendation['baseline'],
+                'contributions': [{'feature': name, 'contribution': value} for name, value in ordered],
+                'supporting': [name for name, value in ordered if value > 0],
+                'opposing': [name for name, value in ordered if value < 0]
+            }
+        if similar_k > 0:
+            response['similar_fields'] = field_index.query(features, k=similar_k)
+        
+        try:
+            response['record_id'] = field_index.add(
+                features, recommendation['crop'], recommendation['confidence'],
+                field_id=inputs.get('field_id')
+            )
+        except Exception as e:
+            # History is best effort; the prediction itself succeeded
+            logger.warning(f"⚠️ Could not store field record: {str(e)}")
+        
+        return jsonify(response), 200
         
     except ValueError as e:
         logger.error(f"❌ Invalid input values: {str(e)}")
@@ -177,6 +410,130 @@ def predict_crop():
         }), 500
 
 
+@app.route('/api/similar_fields', methods=['GET'])
+def similar_fields():
+    """
+    Past fields with the most similar soil and climate
+    
+    Query params: nitrogen, phosphorus, potassium, temperature, humidity,
+    ph, rainfall (all required), k (default 5, max 100)
+    
+    Distance is Euclidean over standardized features; each match has the
+    crop predicted then and the reported outcome, if any.
+    """
+    args = SIMILAR_FIELDS_ARGS.validate(request.args)
+    
+    try:
+        features = [args[name] for name in FIELD_FEATURES]
+        k = args['k']
+        matches = field_index.query(features, k=k)
+        
+        return jsonify({
+            'success': True,
+            'query': dict(zip(FIELD_FEATURES, features)),
+            'similar_fields': matches,
+            'count': len(matches),
+            'timestamp': datetime.now().isoformat()
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid query parameters',
+            'message': str(e)
+        }), 400
+    
+    except Exception as e:
+        logger.error(f"❌ Similar fields error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to find similar fields',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/api/similar_fields/outcome', methods=['POST'])
+def similar_fields_outcome():
+    """
+    Report what was grown on a field after a recommendation
+    
+    Expected JSON: {"record_id": 123, "crop": "rice", "yield": 42.5}
+    (yield optional)
+    """
+    data = OUTCOME_INPUT.validate(json_body())
+    try:
+        updated = field_index.record_outcome(data['record_id'], data['crop'], data.get('yield'))
+        if not updated:
+            return jsonify({
+                'error': 'Not Found',
+                'message': f"No field record {data['record_id']}"
+            }), 404
+        
+        return jsonify({'success': True, 'record_id': data['record_id']}), 200
+        
+    except Exception as e:
+        logger.error(f"❌ Field outcome error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to record outcome',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/api/predict_crop/batch', methods=['POST'])
+def predict_crop_batch():
+    """
+    Batch crop recommendation for a whole sample sheet
+    
+    Send a CSV file/body with nitrogen (or N), phosphorus (P), potassium
+    (K), temperature, humidity, ph, rainfall columns, or JSON
+    {"samples": [{...}, ...]}. All samples are scored in one model call.
+    
+    Query params: contributions=true (per-feature contributions to each
+    sample's predicted crop, computed for the whole batch at once)
+    """
+    args = BATCH_ARGS.validate(request.args)
+    ids, X = parse_crop_samples()
+    
+    try:
+        results = crop_recommender.predict_batch(X, contributions=args['contributions'])
+        if ids is not None:
+            for sample_id, result in zip(ids, results):
+                result['sample_id'] = sample_id
+        
+        summary = {}
+        for result in results:
+            # crop is None where the rule-based fallback found no suitable crop
+            crop = result['crop'] or 'unsuitable'
+            summary[crop] = summary.get(crop, 0) + 1
+        
+        logger.info(f"✅ Batch crop prediction successful: {len(results)} samples")
+        
+        body = {
+            'success': True,
+            'count': len(results),
+            'results': results,
+            'summary': summary,
+            'timestamp': datetime.now().isoformat()
+        }
+        if len(results) > JSON_STREAM_MIN_ITEMS:
+            return app.json.stream_response(body)
+        return jsonify(body), 200
+        
+    except ValueError as e:
+        logger.error(f"❌ Invalid batch input: {str(e)}")
+        return jsonify({
+            'error': 'Invalid input values',
+            'message': str(e),
+            'required': CropRecommender.FEATURES
+        }), 400
+    
+    except Exception as e:
+        logger.error(f"❌ Batch crop prediction error: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            'error': 'Batch prediction failed',
+            'message': str(e)
+        }), 500
+
+
 # ============================================================================
 # DISEASE DETECTION ENDPOINTS
 # ============================================================================
@@ -251,28 +608,156 @@ def predict_disease():
 # ============================================================================
 
 @app.route('/api/sensor_data', methods=['GET'])
+@conditional(lambda: iot_simulator.snapshot.etag, max_age=int(SENSOR_TICK_SECONDS))
 def get_sensor_data():
     """
     Get current IoT sensor data with alerts
     
-    Returns current sensor readings and active alerts
+    Returns the latest published snapshot. Reads have no side effects, so
+    the response carries an ETag and may be cached for one sensor tick.
+    
+    Query params: alerts=full (default, every active alert), alerts=changes
+    (only alert transitions after ?cursor=, see /api/sensor_data/alerts/events)
+    or alerts=none.
     """
     try:
-        sensor_data = iot_simulator.get_current_data()
-        alerts = iot_simulator.get_alerts()
+        snapshot = iot_simulator.snapshot
+        alerts_mode = request.args.get('alerts', 'full')
+        
+        body = {
+            'success': True,
+            'current_data': snapshot.reading,
+            'alerts_count': snapshot.evaluation.alert_count(),
+            'timestamp': snapshot.created_at
+        }
+        if alerts_mode == 'full':
+            body['alerts'] = snapshot.alerts
+        elif alerts_mode == 'changes':
+            cursor = request.args.get('cursor', 0, type=int)
+            events, next_cursor, has_more = alert_tracker.events(
+                cursor, device_id=iot_simulator.device_id)
+            body['alert_events'] = events
+            body['next_cursor'] = next_cursor
+            body['has_more'] = has_more
+        
+        # ETag, 304s and Cache-Control come from @conditional, which also
+        # matches the -gz/-br tags of compressed responses
+        return jsonify(body)
+        
+    except Exception as e:
+        logger.error(f"❌ Sensor data error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to retrieve sensor data',
+            'message': str(e)
+        }), 500
+
+
+def holds_worker(environ):
+    """
+    Whether a long-lived response would occupy a whole server process
+    
+    True only under gunicorn's sync worker (or gthread with one thread):
+    there each open stream blocks every other request to that worker
+    until the worker timeout kills it. Threaded and gevent/eventlet
+    workers, and the development server, serve other requests meanwhile.
+    """
+    if not environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        return False
+    if environ.get('wsgi.multithread'):
+        return False
+    # gevent/eventlet workers monkey-patch socket and run requests on green threads
+    import socket
+    return not getattr(socket.socket, '__module__', '').startswith(('gevent', 'eventlet'))
+
+
+@app.route('/api/sensor_data/stream', methods=['GET'])
+def stream_sensor_data():
+    """
+    Live sensor readings as Server-Sent Events
+    
+    Query params: devices (comma-separated, default all). Slow clients
+    receive only the latest reading per device. Needs a gthread or gevent
+    gunicorn worker; a sync worker gets 503 instead of being tied up.
+    """
+    if holds_worker(request.environ):
+        logger.warning("⚠️ Sensor stream refused: run gunicorn with --worker-class gthread or gevent")
+        return jsonify({
+            'error': 'Live stream unavailable',
+            'message': 'The server runs blocking workers; poll /api/sensor_data instead'
+        }), 503
+    
+    devices = request.args.get('devices')
+    devices = [d for d in devices.split(',') if d] if devices else None
+    sub = sensor_hub.subscribe(devices=devices)
+    
+    return Response(
+        stream_with_context(sensor_hub.sse_events(sub)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        }
+    )
+
+
+@app.route('/api/sensor_data/alerts/events', methods=['GET'])
+def get_alert_events():
+    """
+    Get alert state transitions (raised, escalated, resolved)
+    
+    Query params: cursor (last event id seen, default 0), limit (default
+    100, 1-1000), optional device. Pass next_cursor back to fetch the next
+    page.
+    """
+    args = ALERT_EVENTS_ARGS.validate(request.args)
+    try:
+        events, next_cursor, has_more = alert_tracker.events(
+            args['cursor'], args['limit'], args.get('device'))
         
         return jsonify({
             'success': True,
-            'current_data': sensor_data,
-            'alerts': alerts,
-            'alerts_count': len(alerts),
+            'events': events,
+            'count': len(events),
+            'next_cursor': next_cursor,
+            'has_more': has_more,
             'timestamp': datetime.now().isoformat()
         }), 200
         
     except Exception as e:
-        logger.error(f"❌ Sensor data error: {str(e)}")
+        logger.error(f"❌ Alert events error: {str(e)}")
         return jsonify({
-            'error': 'Failed to retrieve sensor data',
+            'error': 'Failed to retrieve alert events',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/api/sensor_data/anomalies', methods=['GET'])
+def get_sensor_anomalies():
+    """
+    Get detected sensor anomalies (spike, flatline, drift)
+    
+    Query params: cursor (last event id seen, default 0), limit (default
+    100, 1-1000), optional device and type (spike/flatline/drift) filters.
+    """
+    args = ANOMALY_ARGS.validate(request.args)
+    try:
+        events, next_cursor, has_more = anomaly_detector.events(
+            args['cursor'], args['limit'], args.get('device'), args.get('type'))
+        
+        return jsonify({
+            'success': True,
+            'anomalies': events,
+            'count': len(events),
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'detector': anomaly_detector.stats(),
+            'timestamp': datetime.now().isoformat()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"❌ Sensor anomalies error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to retrieve sensor anomalies',
             'message': str(e)
         }), 500
 
@@ -299,10 +784,17 @@ def get_sensor_analytics():
 
 @app.route('/api/sensor_data/history', methods=['GET'])
 def get_sensor_history():
-    """Get sensor data history"""
+    """
+    Get sensor data history
+    
+    Query params: limit (default 10, 1-10000), optional device, and
+    optional ISO start/end timestamps for a range read from the persistent
+    sensor log
+    """
+    args = SENSOR_HISTORY_ARGS.validate(request.args)
     try:
-        limit = request.args.get('limit', 10, type=int)
-        history = iot_simulator.get_history(limit)
+        history = iot_simulator.get_history(
+            args['limit'], start=args.get('start'), end=args.get('end'), device_id=args.get('device'))
         
         return jsonify({
             'success': True,
@@ -311,6 +803,12 @@ def get_sensor_history():
             'timestamp': datetime.now().isoformat()
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid query parameters',
+            'message': str(e)
+        }), 400
+    
     except Exception as e:
         logger.error(f"❌ Sensor history error: {str(e)}")
         return jsonify({
@@ -361,6 +859,113 @@ def get_daily_summary():
         }), 500
 
 
+@app.route('/api/sensor_data/timeseries', methods=['GET'])
+def get_sensor_timeseries():
+    """
+    Get min/max/mean sensor rollups over a time range
+    
+    Query params: hours (default 24, at most 366 days), resolution
+    (raw/minute/hour/day, picked automatically when omitted), max_points
+    (default 500, 1-10000)
+    """
+    args = TIMESERIES_ARGS.validate(request.args)
+    try:
+        # The simulator's clock: simulated or replayed readings aren't "now"
+        end = iot_simulator.clock()
+        start = end - timedelta(hours=args['hours'])
+        resolution, points = iot_simulator.get_timeseries(
+            start, end, resolution=args.get('resolution'), max_points=args['max_points'])
+        
+        return jsonify({
+            'success': True,
+            'resolution': resolution,
+            'data': points,
+            'count': len(points),
+            'late_dropped': iot_simulator.timeseries.stats()['late_dropped'],
+            'timestamp': datetime.now().isoformat()
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid query parameters',
+            'message': str(e)
+        }), 400
+    
+    except Exception as e:
+        logger.error(f"❌ Sensor timeseries error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to retrieve sensor time series',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/api/sensor_data/export', methods=['GET'])
+def export_sensor_data():
+    """
+    Stream sensor readings from the persistent log
+    
+    Query params: format (csv/ndjson/arrow/parquet/raw, default csv),
+    devices (comma separated, default all), optional ISO start/end, and a
+    resume cursor after (ISO timestamp) + after_device from the last row
+    received. format=raw needs a single device and honours HTTP Range.
+    """
+    args = EXPORT_ARGS.validate(request.args)
+    try:
+        fmt = args['format']
+        devices = [d for d in args['devices'].split(',') if d]
+        start, end, after = args.get('start'), args.get('end'), args.get('after')
+        filename = f"sensor_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+        headers = {'Content-Disposition': f'attachment; filename={filename}'}
+        
+        if fmt == 'raw':
+            if len(devices) != 1:
+                raise ValueError('format=raw needs exactly one device')
+            total = sensor_export.raw_length(sensor_log, devices[0], start, end)
+            byte_range = request.range.range_for_length(total) if request.range else None
+            if request.range and byte_range is None and len(request.range.ranges) == 1:
+                # Starts past the end: a resuming client already has everything
+                response = Response(status=416)
+                response.headers['Content-Range'] = f'bytes */{total}'
+                response.headers['Accept-Ranges'] = 'bytes'
+                return response
+            first, stop = byte_range or (0, total)
+            response = Response(
+                stream_with_context(sensor_export.export_raw(
+                    sensor_log, devices[0], start, end, offset=first, length=stop - first)),
+                status=206 if byte_range else 200,
+                mimetype=sensor_export.MIMETYPES[fmt],
+                headers=headers
+            )
+            response.headers['Accept-Ranges'] = 'bytes'
+            response.headers['X-Record-Dtype'] = json.dumps(sensor_log.dtype.descr)
+            response.content_length = stop - first
+            if byte_range:
+                response.headers['Content-Range'] = f'bytes {first}-{stop - 1}/{total}'
+            return response
+        
+        chunks = sensor_export.export(
+            sensor_log, fmt, devices=devices or None, start=start, end=end,
+            after=after, after_device=args.get('after_device'))
+        return Response(
+            stream_with_context(chunks),
+            mimetype=sensor_export.MIMETYPES[fmt],
+            headers=headers
+        )
+        
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid query parameters',
+            'message': str(e)
+        }), 400
+    
+    except Exception as e:
+        logger.error(f"❌ Sensor export error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to export sensor data',
+            'message': str(e)
+        }), 500
+
+
 @app.route('/api/sensor_scenarios', methods=['GET'])
 def get_scenarios():
     """Get available demo scenarios"""
@@ -390,6 +995,9 @@ def set_scenario(scenario_name):
         success = iot_simulator.set_scenario(scenario_name)
         
         if success:
+            # Tick through the ingestor so alerts, the SSE stream and the
+            # anomaly detector see the new scenario's first reading too
+            sensor_ingestor.tick_once([iot_simulator])
             new_data = iot_simulator.get_current_data()
             return jsonify({
                 'success': True,
@@ -422,40 +1030,108 @@ def smart_recommendation():
     """
     Smart recommendation endpoint
     
-    Combines crop recommendation and disease detection
-    Also considers IoT sensor data
+    Combines the field's latest sensor snapshot with any values in the
+    request body (optional field_id selects the device), then runs crop
+    prediction, disease-risk rules and market price lookup concurrently.
+    Results are cached briefly per (field, inputs).
     """
+    overrides = SMART_INPUT.validate(json_body())
+    field_id = overrides.pop('field_id', None)
+    
     try:
-        data = request.get_json()
+        result = recommendation_pipeline.recommend(field_id, overrides=overrides)
+        result['success'] = True
+        result['timestamp'] = datetime.now().isoformat()
         
-        # Get crop recommendation
-        crop_features = [
-            float(data.get('nitrogen', 0)),
-            float(data.get('phosphorus', 0)),
-            float(data.get('potassium', 0)),
-            float(data.get('temperature', 0)),
-            float(data.get('humidity', 0)),
-            float(data.get('ph', 0)),
-            float(data.get('rainfall', 0))
-        ]
+        return jsonify(result), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid recommendation input',
+            'message': str(e)
+        }), 400
+    
+    except Exception as e:
+        logger.error(f"❌ Smart recommendation error: {str(e)}")
+        return jsonify({
+            'error': 'Recommendation failed',
+            'message': str(e)
+        }), 500
+
+
+# ============================================================================
+# ADMIN ENDPOINTS
+# ============================================================================
+
+def admin_authorized():
+    """
+    ADMIN_TOKEN must be sent as X-Admin-Token or a Bearer token. Without
+    it nothing is authorized: behind a reverse proxy on the same host
+    every request would look local.
+    """
+    if not ADMIN_TOKEN:
+        return False
+    
+    token = request.headers.get('X-Admin-Token', '')
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        token = auth[len('Bearer '):]
+    return hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+
+@app.route('/api/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Reload models without a restart
+    
+    Query params: model (crop|disease, default both), force (true reloads
+    even if the files are unchanged)
+    
+    The new model is loaded and warmed up while requests keep being served
+    by the current one, then swapped in. Each worker process reloads on
+    its own; the file watcher (MODEL_WATCH_SECONDS) covers all workers.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({
+            'error': 'Forbidden',
+            'message': 'Admin endpoints are disabled; set ADMIN_TOKEN to enable them'
+        }), 403
+    if not admin_authorized():
+        return jsonify({
+            'error': 'Unauthorized',
+            'message': 'A valid admin token is required'
+        }), 401
+    
+    try:
+        services = {'crop': crop_recommender, 'disease': disease_detector}
+        target = request.args.get('model')
+        if target and target not in services:
+            raise ValueError(f"model must be one of {sorted(services)}")
+        force = request.args.get('force', 'false').lower() == 'true'
         
-        crop_result = crop_recommender.predict(crop_features)
-        current_sensors = iot_simulator.get_current_data()
+        results = {
+            name: service.reload(force=force)
+            for name, service in services.items() if target in (None, name)
+        }
+        failed = any('error' in r for r in results.values())
         
         return jsonify({
-            'success': True,
-            'recommendation': {
-                'crop': crop_result['crop'],
-                'confidence': crop_result['confidence'],
-                'current_conditions': current_sensors
-            },
+            'success': not failed,
+            'results': results,
+            'models': {name: service.model_status() for name, service in services.items()},
             'timestamp': datetime.now().isoformat()
-        }), 200
+        }), 500 if failed else 200
         
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid query parameters',
+            'message': str(e)
+        }), 400
+    
     except Exception as e:
-        logger.error(f"❌ Smart recommendation error: {str(e)}")
+        logger.error(f"❌ Model reload error: {str(e)}")
         return jsonify({
-            'error': 'Recommendation failed',
+            'error': 'Reload failed',
             'message': str(e)
         }), 500
 
@@ -464,6 +1140,13 @@ def smart_recommendation():
 # ERROR HANDLERS
 # ============================================================================
 
+@app.errorhandler(ValidationError)
+def validation_error(error):
+    """Uniform 400 for request validation failures (any endpoint)"""
+    logger.warning(f"⚠️ {request.path}: {str(error)}")
+    return jsonify(error.to_dict()), 400
+
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
@@ -230,6 +230,18 @@ def get_mandi_prices(state=None, commodity=None, mandi=None, limit=50):
     return rows
 
 
+def get_data_version():
+    """
+    Version of the cached price table; changes whenever it is reseeded.
+    Runs the same staleness refresh as get_mandi_prices first.
+    """
+    _seed_if_empty()
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute('SELECT COUNT(*), MAX(id), MAX(fetched_at) FROM mandi_prices').fetchone()
+    conn.close()
+    return ':'.join(str(v) for v in row)
+
+
 def get_price_comparison(commodity):
     """Get price comparison across mandis for a commodity."""
     _seed_if_empty()
@@ -7,6 +7,9 @@ import logging
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 
+from services.validation import Field, Schema
+from services.http_cache import conditional, content_version
+
 logger = logging.getLogger(__name__)
 
 govt_bp = Blueprint('govt', __name__, url_prefix='/api/govt')
@@ -30,26 +33,51 @@ def init_all():
     logger.info("✅ Government Portal integrations initialized")
 
 
+# Static response data versions for ETags (see services/http_cache.py)
+CALENDAR_VERSION = content_version(agmarknet_scraper.COMMODITY_TRENDS)
+
+# Query/body schemas, compiled once; invalid input is a 400 via the app's ValidationError handler
+MANDI_PRICES_ARGS = Schema(
+    Field('state', str, required=False),
+    Field('commodity', str, required=False),
+    Field('mandi', str, required=False),
+    Field('limit', int, default=50, min=1, max=500),
+    message='Invalid query parameters',
+)
+TREND_ARGS = Schema(Field('months', int, default=6, min=1, max=24), message='Invalid query parameters')
+ADVISORY_ARGS = Schema(
+    Field('category', str, required=False),
+    Field('state', str, required=False),
+    Field('crop', str, required=False),
+    Field('limit', int, default=30, min=1, max=200),
+    message='Invalid query parameters',
+)
+INSURANCE_INPUT = Schema(
+    Field('season', str, default='Kharif'),
+    Field('crop', str),
+    Field('area_hectares', float, default=1.0, min=0.01, max=10000),
+)
+
+
 # ============================================================================
 # eNAM — Mandi Prices
 # ============================================================================
 
 @govt_bp.route('/mandi/prices', methods=['GET'])
+@conditional(enam_scraper.get_data_version)
 def mandi_prices():
     """Get mandi prices with optional filters."""
+    args = MANDI_PRICES_ARGS.validate(request.args)
     try:
-        state = request.args.get('state')
-        commodity = request.args.get('commodity')
-        mandi = request.args.get('mandi')
-        limit = int(request.args.get('limit', 50))
-
-        prices = enam_scraper.get_mandi_prices(state=state, commodity=commodity, mandi=mandi, limit=limit)
+        prices = enam_scraper.get_mandi_prices(state=args.get('state'), commodity=args.get('commodity'),
+                                               mandi=args.get('mandi'), limit=args['limit'])
+        # When the data was fetched, not when it was served: the body must match its ETag
         return jsonify({
             'success': True,
             'source': 'eNAM',
             'count': len(prices),
             'data': prices,
-            'last_updated': datetime.now().isoformat(),
+            'last_updated': max((p['fetched_at'] for p in prices if p.get('fetched_at')), default=None),
         })
     except Exception as e:
         logger.error(f"Mandi prices error: {e}")
@@ -91,9 +119,9 @@ def mandi_list(state):
 @govt_bp.route('/market/trend/<commodity>', methods=['GET'])
 def market_trend(commodity):
     """Get commodity price trend."""
+    args = TREND_ARGS.validate(request.args)
     try:
-        months = int(request.args.get('months', 6))
-        result = agmarknet_scraper.get_commodity_trend(commodity, months=months)
+        result = agmarknet_scraper.get_commodity_trend(commodity, months=args['months'])
         return jsonify({'success': True, 'source': 'Agmarknet', **result})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -111,6 +139,7 @@ def market_alerts():
 
 
 @govt_bp.route('/market/calendar', methods=['GET'])
+@conditional(lambda: CALENDAR_VERSION)
 def seasonal_calendar():
     """Get crop seasonal buy/sell calendar."""
     return jsonify({'success': True, 'calendar': agmarknet_scraper.get_seasonal_calendar()})
@@ -123,13 +152,10 @@ def seasonal_calendar():
 @govt_bp.route('/advisories', methods=['GET'])
 def advisories():
     """Get government advisories with optional filters."""
+    args = ADVISORY_ARGS.validate(request.args)
     try:
-        category = request.args.get('category')
-        state = request.args.get('state')
-        crop = request.args.get('crop')
-        limit = int(request.args.get('limit', 30))
-
-        advs = mkisan_fetcher.get_advisories(category=category, state=state, crop=crop, limit=limit)
+        advs = mkisan_fetcher.get_advisories(category=args.get('category'), state=args.get('state'),
+                                             crop=args.get('crop'), limit=args['limit'])
         return jsonify({
             'success': True,
             'source': 'mKisan',
@@ -175,54 +201,56 @@ def refresh_pib():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+PORTAL_LINKS = {
+    'enam': {
+        'name': 'eNAM — National Agriculture Market',
+        'url': 'https://enam.gov.in/web/guest/commodity-wise-daily',
+        'description': 'Live mandi commodity prices',
+    },
+    'agmarknet': {
+        'name': 'Agmarknet — Agricultural Marketing',
+        'url': 'https://agmarknet.gov.in/SearchCmmMkt.aspx',
+        'description': 'Commodity market data and trends',
+    },
+    'mkisan': {
+        'name': 'mKisan Portal',
+        'url': 'https://mkisan.gov.in/advisoryDetails.aspx',
+        'description': 'Government SMS advisories for farmers',
+    },
+    'myscheme': {
+        'name': 'myScheme — Agriculture Schemes',
+        'url': 'https://www.myscheme.gov.in/search/category/Agriculture,Rural%20&%20Environment',
+        'description': 'Search government schemes for agriculture',
+    },
+    'pmfby': {
+        'name': 'PMFBY — Crop Insurance',
+        'url': 'https://pmfby.gov.in',
+        'description': 'Pradhan Mantri Fasal Bima Yojana',
+    },
+    'pmfby_calculator': {
+        'name': 'PMFBY Premium Calculator',
+        'url': 'https://pmfby.gov.in/premiumCalculator',
+        'description': 'Calculate crop insurance premium',
+    },
+    'pib': {
+        'name': 'PIB — Agriculture Notifications',
+        'url': 'https://pib.gov.in/RssPage.aspx?strAction=Agriculture',
+        'description': 'Press Information Bureau agriculture feed',
+    },
+    'agricoop': {
+        'name': 'Agriculture Ministry Schemes',
+        'url': 'https://agricoop.gov.in/en/schemes',
+        'description': 'Ministry of Agriculture official schemes',
+    },
+}
+PORTAL_LINKS_VERSION = content_version(PORTAL_LINKS)
+
+
 @govt_bp.route('/portal-links', methods=['GET'])
+@conditional(lambda: PORTAL_LINKS_VERSION)
 def portal_links():
     """Get all real government portal URLs for direct linking."""
-    return jsonify({
-        'success': True,
-        'links': {
-            'enam': {
-                'name': 'eNAM — National Agriculture Market',
-                'url': 'https://enam.gov.in/web/guest/commodity-wise-daily',
-                'description': 'Live mandi commodity prices',
-            },
-            'agmarknet': {
-                'name': 'Agmarknet — Agricultural Marketing',
-                'url': 'https://agmarknet.gov.in/SearchCmmMkt.aspx',
-                'description': 'Commodity market data and trends',
-            },
-            'mkisan': {
-                'name': 'mKisan Portal',
-                'url': 'https://mkisan.gov.in/advisoryDetails.aspx',
-                'description': 'Government SMS advisories for farmers',
-            },
-            'myscheme': {
-                'name': 'myScheme — Agriculture Schemes',
-                'url': 'https://www.myscheme.gov.in/search/category/Agriculture,Rural%20&%20Environment',
-                'description': 'Search government schemes for agriculture',
-            },
-            'pmfby': {
-                'name': 'PMFBY — Crop Insurance',
-                'url': 'https://pmfby.gov.in',
-                'description': 'Pradhan Mantri Fasal Bima Yojana',
-            },
-            'pmfby_calculator': {
-                'name': 'PMFBY Premium Calculator',
-                'url': 'https://pmfby.gov.in/premiumCalculator',
-                'description': 'Calculate crop insurance premium',
-            },
-            'pib': {
-                'name': 'PIB — Agriculture Notifications',
-                'url': 'https://pib.gov.in/RssPage.aspx?strAction=Agriculture',
-                'description': 'Press Information Bureau agriculture feed',
-            },
-            'agricoop': {
-                'name': 'Agriculture Ministry Schemes',
-                'url': 'https://agricoop.gov.in/en/schemes',
-                'description': 'Ministry of Agriculture official schemes',
-            },
-        }
-    })
+    return jsonify({'success': True, 'links': PORTAL_LINKS})
 
 
 # ============================================================================
@@ -230,6 +258,7 @@ def portal_links():
 # ============================================================================
 
 @govt_bp.route('/schemes', methods=['GET'])
+@conditional(myscheme_scraper.get_data_version)
 def all_schemes():
     """Get all government schemes."""
     try:
@@ -280,16 +309,9 @@ def scheme_categories():
 @govt_bp.route('/insurance/calculate', methods=['POST'])
 def insurance_calculate():
     """Calculate crop insurance premium."""
+    data = INSURANCE_INPUT.validate(request.get_json(silent=True))
     try:
-        data = request.get_json() or {}
-        season = data.get('season', 'Kharif')
-        crop = data.get('crop')
-        area = float(data.get('area_hectares', 1))
-
-        if not crop:
-            return jsonify({'success': False, 'error': 'crop is required'}), 400
-
-        result = pmfby_checker.calculate_premium(season, crop, area)
+        result = pmfby_checker.calculate_premium(data['season'], data['crop'], data['area_hectares'])
         if 'error' in result:
             return jsonify({'success': False, **result}), 404
 
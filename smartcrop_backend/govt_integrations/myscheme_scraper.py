@@ -384,6 +384,14 @@ def get_all_schemes():
     return rows
 
 
+def get_data_version():
+    """Version of the schemes table; changes when schemes are added or reseeded."""
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute('SELECT COUNT(*), MAX(id), MAX(created_at) FROM govt_schemes').fetchone()
+    conn.close()
+    return ':'.join(str(v) for v in row)
+
+
 def check_eligibility(age=None, gender=None, land_hectares=None, state=None,
                       farmer_type=None, keywords=None):
     """
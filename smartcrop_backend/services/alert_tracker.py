@@ -0,0 +1,130 @@
+"""
+Sensor Alert Tracker
+Edge-triggered alerting with hysteresis and a cursor-paginated event log
+"""
+
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+from .sensor_rules import ALERT_ICONS, ALERT_STATUS
+
+logger = logging.getLogger(__name__)
+
+LEVEL_NAMES = {0: 'ok', **ALERT_STATUS}
+
+
+class AlertTracker:
+    """Keeps the alert level per (device, sensor) and logs only transitions.
+
+    Escalation is immediate. De-escalation requires the value to move back
+    inside the tighter band by ``hysteresis`` x the optimal range width, so
+    a reading hovering on a threshold does not flap between states.
+    Events are stored compactly as tuples in a bounded append-only log with
+    monotonically increasing ids; dicts are rendered when read.
+    """
+
+    def __init__(self, hysteresis=0.05, max_events=10000):
+        self.hysteresis = hysteresis
+        self._levels = {}  # device_id -> (rules, int8 per-sensor levels)
+        self._events = deque(maxlen=max_events)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def observe(self, device_id, snapshot):
+        """SensorIngestor listener: diff the snapshot's alerts against state"""
+        evaluation = snapshot.evaluation
+        rules = evaluation.rules
+        status = evaluation.alert_status[0]
+        values = evaluation.X[0, rules.alert_cols]
+
+        margin = self.hysteresis * (rules.opt_max - rules.opt_min)
+        outside_critical = (values < rules.alert_min + margin) | (values > rules.alert_max - margin)
+        outside_optimal = (values < rules.opt_min + margin) | (values > rules.opt_max - margin)
+
+        with self._lock:
+            previous = self._previous_levels(device_id, rules)
+
+            # Level the previous state is allowed to hold on to
+            retained = np.where(
+                previous == 2,
+                np.where(outside_critical, 2, np.where(outside_optimal, 1, 0)),
+                np.where((previous == 1) & outside_optimal, 1, 0),
+            )
+            levels = np.maximum(status, retained).astype(np.int8)
+            self._levels[device_id] = (rules, levels)
+
+            changed = np.flatnonzero(levels != previous)
+            for k in changed:
+                self._events.append((
+                    self._next_id, snapshot.created_at, device_id, rules, int(k),
+                    int(previous[k]), int(levels[k]), float(values[k]),
+                ))
+                self._next_id += 1
+
+        if len(changed):
+            logger.info(f"{len(changed)} alert transitions for {device_id}")
+        return len(changed)
+
+    def _previous_levels(self, device_id, rules):
+        """Previous levels aligned to ``rules.alert_sensors``"""
+        state = self._levels.get(device_id)
+        if state is None:
+            return np.zeros(len(rules.alert_sensors), dtype=np.int8)
+        previous_rules, levels = state
+        if previous_rules is rules:
+            return levels
+        # Crop profile changed: carry levels over by sensor name
+        by_sensor = dict(zip(previous_rules.alert_sensors, levels.tolist()))
+        return np.array([by_sensor.get(s, 0) for s in rules.alert_sensors], dtype=np.int8)
+
+    @property
+    def last_id(self):
+        return self._next_id - 1
+
+    def events(self, cursor=0, limit=100, device_id=None):
+        """Events with id > cursor, oldest first; returns (events, next_cursor, has_more)"""
+        with self._lock:
+            log = list(self._events)
+
+        if log:
+            first_id = log[0][0]
+            log = log[max(0, cursor - first_id + 1):]
+        if device_id:
+            log = [e for e in log if e[2] == device_id]
+
+        page = log[:max(limit, 0)]
+        next_cursor = page[-1][0] if page else max(cursor, 0)
+        return [self._render(e) for e in page], next_cursor, len(log) > limit
+
+    def active(self, device_id):
+        """Sensors currently in warning/critical state for a device"""
+        state = self._levels.get(device_id)
+        if state is None:
+            return {}
+        rules, levels = state
+        return {rules.alert_sensors[k]: LEVEL_NAMES[int(levels[k])] for k in np.flatnonzero(levels)}
+
+    @staticmethod
+    def _render(event):
+        event_id, timestamp, device_id, rules, k, previous, level, value = event
+        sensor = rules.alert_sensors[k]
+        optimal = rules.optimal_ranges[k]
+        if level:
+            message = f'{ALERT_STATUS[level].upper()}: {sensor} at {value} (optimal: {optimal})'
+        else:
+            message = f'RESOLVED: {sensor} back to {value} (optimal: {optimal})'
+        return {
+            'id': event_id,
+            'device_id': device_id,
+            'sensor': sensor,
+            'from': LEVEL_NAMES[previous],
+            'to': LEVEL_NAMES[level],
+            'value': value,
+            'optimal_range': optimal,
+            'message': message,
+            'icon': ALERT_ICONS.get(level, '🟢'),
+            'timestamp': timestamp,
+        }
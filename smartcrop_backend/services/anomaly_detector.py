@@ -0,0 +1,243 @@
+"""
+Sensor Anomaly Detector
+Streaming spike, flatline and drift detection vectorized across devices
+"""
+
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SPIKE = 'spike'
+FLATLINE = 'flatline'
+DRIFT = 'drift'
+
+# Scales MAD to the standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+
+
+def _median_last(a):
+    """Median over the last axis; for short windows a full sort beats
+    ``np.median``'s per-row partition by several times"""
+    s = np.sort(a, axis=-1)
+    n = a.shape[-1]
+    return (s[..., (n - 1) // 2] + s[..., n // 2]) / 2
+
+
+class AnomalyDetector:
+    """Batch anomaly stage run once per ingestion tick for all devices.
+
+    Each device owns a fixed slot in preallocated arrays: a ring buffer
+    of the last ``window`` readings plus flatline run lengths and CUSUM
+    accumulators, so state stays bounded however long the stream runs.
+    ``update`` processes one reading per device for many devices in a
+    handful of NumPy operations:
+
+    * spike - robust z-score ``|x - median| / (1.4826 * MAD)`` over the
+      window exceeds ``z_threshold``; the scale is floored at
+      ``min_rel_sigma`` x the median so quantized or very smooth series
+      don't turn rounding steps into spikes
+    * flatline - the value has not changed for ``flatline_steps`` readings
+    * drift - two-sided CUSUM of the standardized residual against a
+      reference level taken when the window first fills exceeds
+      ``cusum_h``; the reference is re-taken after each alarm. The CUSUM
+      slack is at least ``drift_tolerance`` x the reference level so
+      normal daily swings are not reported; metrics in ``drift_exempt``
+      (strongly cyclic ones such as light) are not checked for drift
+
+    Missing values (NaN, e.g. sensor dropouts) are skipped.
+    """
+
+    def __init__(self, metrics, window=30, z_threshold=6.0, flatline_steps=12,
+                 cusum_k=0.5, cusum_h=8.0, drift_tolerance=0.25,
+                 min_rel_sigma=0.01, drift_exempt=('light_intensity',),
+                 max_events=10000, capacity=64):
+        self.metrics = tuple(metrics)
+        self.window = window
+        self.z_threshold = z_threshold
+        self.flatline_steps = flatline_steps
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.drift_tolerance = drift_tolerance
+        self.min_rel_sigma = min_rel_sigma
+        self._drift_checked = np.array([m not in drift_exempt for m in self.metrics])
+
+        self._index = {}  # device_id -> row
+        self._device_ids = []
+        self._events = deque(maxlen=max_events)
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.ticks = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        M = len(self.metrics)
+        self._buffer = np.zeros((capacity, M, self.window))  # window axis contiguous
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._last = np.full((capacity, M), np.nan)
+        self._run = np.zeros((capacity, M), dtype=np.int64)
+        self._ref_mean = np.zeros((capacity, M))
+        self._ref_sigma = np.ones((capacity, M))
+        self._cusum_pos = np.zeros((capacity, M))
+        self._cusum_neg = np.zeros((capacity, M))
+
+    def _grow(self, capacity):
+        old = (self._buffer, self._count, self._last, self._run,
+               self._ref_mean, self._ref_sigma, self._cusum_pos, self._cusum_neg)
+        n = len(self._count)
+        self._allocate(capacity)
+        new = (self._buffer, self._count, self._last, self._run,
+               self._ref_mean, self._ref_sigma, self._cusum_pos, self._cusum_neg)
+        for src, dst in zip(old, new):
+            dst[:n] = src
+
+    def _rows(self, device_ids):
+        rows = np.empty(len(device_ids), dtype=np.intp)
+        for i, device_id in enumerate(device_ids):
+            row = self._index.get(device_id)
+            if row is None:
+                row = len(self._device_ids)
+                if row >= len(self._count):
+                    self._grow(2 * len(self._count))
+                self._index[device_id] = row
+                self._device_ids.append(device_id)
+            rows[i] = row
+        return rows
+
+    # ------------------------------------------------------------------
+    # Detection
+    # ------------------------------------------------------------------
+
+    def update(self, device_ids, X, timestamp=None):
+        """Process one reading per device; X is (n_devices, n_metrics).
+
+        Returns the number of anomaly events emitted.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        with self._lock:
+            rows = self._rows(device_ids)
+            valid = ~np.isnan(X)
+            count = self._count[rows]
+            warm = count >= self.window  # window full: statistics are usable
+
+            # Robust statistics over the current window (before this reading)
+            window = self._buffer[rows]
+            median = _median_last(window)
+            mad = _median_last(np.abs(window - median[:, :, None]))
+            sigma = np.maximum(MAD_SCALE * mad, self.min_rel_sigma * np.abs(median) + 1e-9)
+            z = (X - median) / sigma
+            spikes = warm[:, None] & valid & (np.abs(z) > self.z_threshold)
+
+            # Flatline: consecutive identical readings
+            same = valid & (X == self._last[rows])
+            run = np.where(same, self._run[rows] + 1, np.where(valid, 0, self._run[rows]))
+            flatline = run == self.flatline_steps
+
+            # CUSUM against the reference level; reference set when warm
+            first_warm = count == self.window
+            ref_mean = np.where(first_warm[:, None], median, self._ref_mean[rows])
+            ref_sigma = np.where(first_warm[:, None], sigma, self._ref_sigma[rows])
+            checked = valid & warm[:, None] & ~spikes & self._drift_checked
+            r = np.where(checked, (X - ref_mean) / ref_sigma, 0.0)
+            slack = np.maximum(self.cusum_k, self.drift_tolerance * np.abs(ref_mean) / ref_sigma)
+            pos = np.maximum(0.0, self._cusum_pos[rows] + r - slack)
+            neg = np.maximum(0.0, self._cusum_neg[rows] - r - slack)
+            drift = (pos > self.cusum_h) | (neg > self.cusum_h)
+            drift_score = np.where(pos > neg, pos, -neg)
+            # Re-baseline after an alarm so a level shift is reported once
+            ref_mean = np.where(drift, median, ref_mean)
+            ref_sigma = np.where(drift, sigma, ref_sigma)
+            pos[drift] = 0.0
+            neg[drift] = 0.0
+
+            # Append to the ring buffer; missing values repeat the median
+            slot = count % self.window
+            self._buffer[rows, :, slot] = np.where(valid, X, median)
+            self._count[rows] = count + 1
+            self._last[rows] = np.where(valid, X, self._last[rows])
+            self._run[rows] = run
+            self._ref_mean[rows] = ref_mean
+            self._ref_sigma[rows] = ref_sigma
+            self._cusum_pos[rows] = pos
+            self._cusum_neg[rows] = neg
+            self.ticks += 1
+
+            emitted = 0
+            for kind, mask, score in ((SPIKE, spikes, z), (FLATLINE, flatline, run),
+                                      (DRIFT, drift, drift_score)):
+                hit_rows, hit_cols = np.nonzero(mask)
+                for i, j in zip(hit_rows.tolist(), hit_cols.tolist()):
+                    self._events.append((
+                        self._next_id, timestamp, device_ids[i], kind, j,
+                        float(X[i, j]), float(score[i, j]), float(median[i, j]),
+                    ))
+                    self._next_id += 1
+                emitted += len(hit_rows)
+
+        if emitted:
+            logger.info(f"{emitted} sensor anomalies detected")
+        return emitted
+
+    def observe_batch(self, device_ids, snapshots):
+        """SensorIngestor batch listener: one row per device snapshot"""
+        X = np.array([[s.reading.get(m, np.nan) for m in self.metrics] for s in snapshots],
+                     dtype=np.float64)
+        return self.update(device_ids, X, snapshots[0].created_at if snapshots else None)
+
+    def feed(self, device_ids, timestamps, values):
+        """FleetGenerator sink: values is (T, n_devices, n_metrics)"""
+        emitted = 0
+        for t, ts in enumerate(timestamps):
+            emitted += self.update(device_ids, values[t], float(ts))
+        return emitted
+
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
+
+    @property
+    def last_id(self):
+        return self._next_id - 1
+
+    def events(self, cursor=0, limit=100, device_id=None, kind=None):
+        """Events with id > cursor, oldest first; returns (events, next_cursor, has_more)"""
+        with self._lock:
+            log = list(self._events)
+
+        if log:
+            first_id = log[0][0]
+            log = log[max(0, cursor - first_id + 1):]
+        if device_id:
+            log = [e for e in log if e[2] == device_id]
+        if kind:
+            log = [e for e in log if e[3] == kind]
+
+        page = log[:max(limit, 0)]
+        next_cursor = page[-1][0] if page else max(cursor, 0)
+        return [self._render(e) for e in page], next_cursor, len(log) > limit
+
+    def stats(self):
+        return {
+            'devices': len(self._device_ids),
+            'ticks': self.ticks,
+            'events': self.last_id,
+        }
+
+    def _render(self, event):
+        event_id, timestamp, device_id, kind, j, value, score, baseline = event
+        if isinstance(timestamp, float):
+            timestamp = datetime.fromtimestamp(timestamp).isoformat()
+        return {
+            'id': event_id,
+            'device_id': device_id,
+            'sensor': self.metrics[j],
+            'type': kind,
+            'value': round(value, 2),
+            'baseline': round(baseline, 2),
+            'score': round(score, 2),
+            'timestamp': timestamp,
+        }
@@ -0,0 +1,123 @@
+"""
+Crop Prediction Explainer
+Decision-path feature attributions for the compiled crop forest, with the
+per-leaf path sums precomputed so explaining is a table lookup
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Largest precomputed leaf table; bigger forests walk the paths per request
+MAX_TABLE_BYTES = 256 * 1024 * 1024
+
+# Samples explained per gather in the batch path
+CHUNK_ROWS = 1024
+
+
+class CropExplainer:
+    """Decision-path (Saabas) attributions for a CompiledForest.
+
+    Walking a tree from the root to a leaf, the change in the class
+    distribution at each split is credited to the split feature, so for
+    every class ``baseline + sum(contributions) == predict_proba``. The
+    sum along a path depends only on the leaf reached, so it is computed
+    once per leaf when the explainer is built: a (leaves, features,
+    classes) table. Explaining a sample is then one ``apply`` plus a
+    gather and a mean over trees, vectorized across samples. When the
+    table would exceed ``max_table_bytes`` the same attribution is
+    computed by walking the paths level by level instead.
+    """
+
+    def __init__(self, forest, max_table_bytes=MAX_TABLE_BYTES):
+        self.forest = forest
+        self.n_features = forest.n_features_in_
+        self.n_classes = forest.value.shape[1]
+        self.baseline = forest.value[forest.roots].mean(axis=0)
+
+        children = np.asarray(forest.children)
+        self._is_leaf = children[:, 0] == np.arange(len(children))
+        n_leaves = int(self._is_leaf.sum())
+        self._leaf_index = np.full(len(children), -1, dtype=np.intp)
+        self._leaf_index[self._is_leaf] = np.arange(n_leaves)
+
+        table_bytes = n_leaves * self.n_features * self.n_classes * 8
+        self.table = self._build_table(n_leaves) if table_bytes <= max_table_bytes else None
+        if self.table is None:
+            logger.warning(f"⚠️ Explainer table would need {table_bytes >> 20} MB; "
+                           f"explaining by path walk instead")
+
+    def _build_table(self, n_leaves):
+        """Path contribution sums per leaf, built breadth-first one level at a time"""
+        forest = self.forest
+        feature = np.asarray(forest.feature, dtype=np.intp)
+        children = np.asarray(forest.children, dtype=np.intp)
+        value = np.asarray(forest.value)
+        table = np.zeros((n_leaves, self.n_features, self.n_classes))
+
+        frontier = np.asarray(forest.roots, dtype=np.intp)
+        path_sum = np.zeros((len(frontier), self.n_features, self.n_classes))
+        while len(frontier):
+            leaf = self._is_leaf[frontier]
+            table[self._leaf_index[frontier[leaf]]] = path_sum[leaf]
+
+            nodes, path_sum = frontier[~leaf], path_sum[~leaf]
+            rows, split = np.arange(len(nodes)), feature[nodes]
+            next_nodes, next_sums = [], []
+            for side in (0, 1):
+                child = children[nodes, side]
+                child_sum = path_sum.copy()
+                child_sum[rows, split] += value[child] - value[nodes]
+                next_nodes.append(child)
+                next_sums.append(child_sum)
+            frontier = np.concatenate(next_nodes)
+            path_sum = np.concatenate(next_sums)
+
+        table.setflags(write=False)
+        return table
+
+    def contributions(self, X):
+        """Per-feature contributions to every class, shape (n, features, classes)"""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        if self.table is None:
+            return self._walk(X)
+
+        out = np.empty((len(X), self.n_features, self.n_classes))
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self._leaf_index[self.forest.apply(X[start:start + CHUNK_ROWS])]
+            out[start:start + CHUNK_ROWS] = self.table[leaves].mean(axis=1)
+        return out
+
+    def contributions_for(self, X, classes):
+        """Contributions to one class per sample (e.g. the predicted one), shape (n, features)"""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        classes = np.asarray(classes, dtype=np.intp)
+        if self.table is None:
+            return self._walk(X)[np.arange(len(X)), :, classes]
+
+        out = np.zeros((len(X), self.n_features))
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self._leaf_index[self.forest.apply(X[start:start + CHUNK_ROWS])]
+            cls = classes[start:start + CHUNK_ROWS, None]
+            # Only the requested class column of each leaf row is gathered
+            out[start:start + CHUNK_ROWS] = self.table[leaves, :, cls].sum(axis=1)
+        return out / self.forest.n_trees
+
+    def _walk(self, X):
+        """Same attribution computed along the decision paths, for huge forests"""
+        forest = self.forest
+        out = np.zeros((len(X), self.n_features, self.n_classes))
+        rows = np.arange(len(X))[:, None]
+        Xf = X.astype(np.float32).astype(np.float64)
+        nodes = np.broadcast_to(forest._roots, (len(X), forest.n_trees))
+        for _ in range(forest.max_depth):
+            go_right = Xf[rows, forest._feature[nodes]] > forest.threshold[nodes]
+            child = forest._next[2 * nodes + go_right]
+            moved = child != nodes
+            r, t = np.nonzero(moved)
+            parent, kid = nodes[r, t], child[r, t]
+            np.add.at(out, (r, forest._feature[parent]), forest.value[kid] - forest.value[parent])
+            nodes = child
+        return out / forest.n_trees
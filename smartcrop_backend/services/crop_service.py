@@ -1,12 +1,20 @@
 """
 Crop Recommendation Service
-Loads and uses the trained RandomForestClassifier model
+Loads and uses the trained RandomForestClassifier model, served from its
+compiled flat-array form
 """
 
 import os
 import pickle
+import threading
 import numpy as np
 import logging
+from collections import OrderedDict
+
+from .forest_compiler import CompiledForest, ArtifactError, METADATA_FILE
+from .model_reloader import HotReloader, files_digest
+from .crop_suitability import CropSuitability, NoSuitableCrop, DEFAULT_REQUIREMENTS_PATH
+from .crop_explainer import CropExplainer
 
 logger = logging.getLogger(__name__)
 
@@ -14,36 +22,213 @@ logger = logging.getLogger(__name__)
 class CropRecommender:
     """Service for crop recommendation using ML model"""
     
-    def __init__(self):
-        """Initialize crop recommender with trained model"""
-        self.model = None
-        self.crops = [
-            'Rice', 'Maize', 'Chickpea', 'Kidneybeans', 'Pigeonpeas',
-            'Mothbeans', 'Mungbean', 'Blackgram', 'Lentil', 'Pomegranate',
-            'Banana', 'Mango', 'Grapes', 'Watermelon', 'Muskmelon',
-            'Apple', 'Orange', 'Papaya', 'Coconut', 'Cotton',
-            'Sugarcane', 'Tobacco', 'Arecanut', 'Turmeric', 'Pepper',
-            'Cardamom', 'Chick_pea', 'Corn', 'Wheat'
-        ]
-        
-        self.load_model()
+    # Model input order
+    FEATURES = ['nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall']
     
-    def load_model(self):
-        """Load trained crop model from pickle file"""
+    def __init__(self, model_path='models/crop_model.pkl', compiled_path='models/crop_forest',
+                 cache_size=4096, cache_precision=2, watch_interval=None, verify_artifact=True,
+                 requirements_path=DEFAULT_REQUIREMENTS_PATH):
+        """
+        Initialize crop recommender with trained model
+        
+        Single-sample probabilities are kept in an LRU cache keyed on the
+        features rounded to ``cache_precision`` decimals; the model is
+        always evaluated on those rounded features so a cached answer is
+        exactly what a fresh call would return. The cache belongs to the
+        loaded model, so a reload starts with an empty one.
+        
+        ``compiled_path`` is a model artifact directory; it is memory-mapped
+        (shared by all workers on the host) and checked against its
+        SHA-256 checksums unless ``verify_artifact`` is off. With
+        ``watch_interval`` the model files are polled and a changed model
+        is loaded, warmed up and swapped in without a restart.
+        
+        Without a model, crops are ranked by the rule-based suitability
+        scorer over ``requirements_path`` instead.
+        """
+        self.model_path = model_path
+        self.compiled_path = compiled_path
+        self.verify_artifact = verify_artifact
+        self.cache_size = cache_size
+        self.cache_precision = cache_precision
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        
+        # Rule-based ranking from per-crop ranges, used when there is no model
         try:
-            model_path = 'models/crop_model.pkl'
-            
-            if os.path.exists(model_path):
-                with open(model_path, 'rb') as f:
-                    self.model = pickle.load(f)
-                logger.info("✅ Crop model loaded successfully")
-            else:
-                logger.warning(f"⚠️ Model not found at {model_path}, using mock model")
-                self.model = None
-                
-        except Exception as e:
-            logger.error(f"❌ Error loading crop model: {str(e)}")
-            self.model = None
+            self.suitability = CropSuitability(requirements_path)
+            self.crops = self.suitability.all_crops
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"⚠️ Crop requirements unavailable, using mock fallback: {str(e)}")
+            self.suitability = None
+            self.crops = []
+        
+        self._reloader = HotReloader(
+            'crop', self._model_files, self._load_bundle,
+            warm_up=self._warm_up, fallback=self._mock_bundle
+        )
+        self.reload(force=True)
+        self._reloader.watch(watch_interval)
+    
+    @property
+    def model(self):
+        """Model currently serving requests (None when using the mock)"""
+        return self._reloader.bundle.model
+    
+    @property
+    def model_version(self):
+        """Version of the model currently serving requests"""
+        return self._reloader.bundle.version
+    
+    def reload(self, force=False):
+        """Reload the model if its files changed (or always with ``force``)"""
+        return self._reloader.reload(force=force)
+    
+    def model_status(self):
+        """Serving model version, load time and reload counters"""
+        status = self._reloader.status()
+        model = self.model
+        if model is not None:
+            status['type'] = type(model).__name__
+        else:
+            status['type'] = 'suitability-rules' if self.suitability is not None else 'mock'
+        return status
+    
+    def _model_files(self):
+        # The artifact's metadata is renamed into place last, so it marks a
+        # complete new version
+        metadata = os.path.join(self.compiled_path, METADATA_FILE) if self.compiled_path else None
+        return [self.model_path, metadata]
+    
+    def _mock_bundle(self):
+        return {'model': None, 'explainer': None, 'cache': OrderedDict(), 'explain_cache': OrderedDict()}
+    
+    def _load_bundle(self):
+        """
+        Load the crop model; returns (bundle parts, version)
+        
+        A compiled model artifact (``python -m services.forest_compiler``)
+        is used when present: it is memory-mapped and needs neither pickle
+        nor scikit-learn. Otherwise the pickled model is loaded and, if it
+        is a tree ensemble, compiled in memory so predictions use the
+        flat-array traversal.
+        """
+        model, version = None, 'mock'
+        if self.compiled_path and os.path.exists(os.path.join(self.compiled_path, METADATA_FILE)):
+            try:
+                model = self._load_artifact()
+                version = model.version
+            except ValueError as e:
+                logger.error(f"❌ Crop model artifact rejected, trying pickle: {str(e)}")
+        
+        if model is None and os.path.exists(self.model_path):
+            with open(self.model_path, 'rb') as f:
+                model = pickle.load(f)
+            try:
+                model = CompiledForest.from_sklearn(model)
+            except TypeError:
+                pass  # not a tree ensemble: serve it as is
+            version = files_digest([self.model_path])
+            logger.info("✅ Crop model loaded successfully")
+        elif model is None:
+            logger.warning(f"⚠️ Model not found at {self.model_path}, using mock model")
+        
+        # Path attributions are precomputed per leaf here, off the request path
+        explainer = CropExplainer(model) if isinstance(model, CompiledForest) else None
+        
+        bundle = {
+            'model': model,
+            'explainer': explainer,
+            'cache': OrderedDict(),
+            'explain_cache': OrderedDict(),
+        }
+        return bundle, version
+    
+    def _load_artifact(self):
+        model = CompiledForest.load(self.compiled_path, verify=self.verify_artifact)
+        if model.n_features_in_ != len(self.FEATURES):
+            raise ArtifactError(f"Artifact expects {model.n_features_in_} features, "
+                                f"not {len(self.FEATURES)}")
+        # Same count in another order would silently score the wrong columns
+        if model.feature_names is None:
+            logger.warning("⚠️ Crop model artifact has no feature order; assuming FEATURES order")
+        elif list(model.feature_names) != self.FEATURES:
+            raise ArtifactError(f"Artifact feature order {model.feature_names} "
+                                f"does not match {self.FEATURES}")
+        logger.info(f"✅ Crop model artifact {model.version} loaded "
+                    f"({model.n_trees} trees, memory-mapped)")
+        return model
+    
+    def _warm_up(self, bundle):
+        """Run a new model before it serves, and reject one that misbehaves"""
+        model = bundle.model
+        if model is None:
+            return
+        
+        # Spread over typical soil/climate ranges; also pages in mapped artifacts
+        rng = np.random.default_rng(0)
+        low = [0, 5, 5, 8, 14, 3.5, 20]
+        high = [140, 145, 205, 44, 100, 9.9, 300]
+        X = np.round(rng.uniform(low, high, (32, len(self.FEATURES))), self.cache_precision)
+        
+        probabilities = model.predict_proba(X)
+        if probabilities.shape != (len(X), len(model.classes_)) or \
+                not np.allclose(probabilities.sum(axis=1), 1.0):
+            raise ValueError(f"Warm-up produced invalid probabilities, shape {probabilities.shape}")
+        model.predict_proba(X[:1])
+        if bundle.explainer is not None:
+            bundle.explainer.contributions(X[:1])
+    
+    def clear_cache(self):
+        bundle = self._reloader.bundle
+        with self._cache_lock:
+            bundle.cache.clear()
+            bundle.explain_cache.clear()
+    
+    def cache_stats(self):
+        """Prediction cache size and hit-rate metrics"""
+        lookups = self.cache_hits + self.cache_misses
+        bundle = self._reloader.bundle
+        return {
+            'size': len(bundle.cache),
+            'explanations': len(bundle.explain_cache),
+            'max_size': self.cache_size,
+            'precision': self.cache_precision,
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'evictions': self.cache_evictions,
+            'hit_rate': round(self.cache_hits / lookups, 4) if lookups else 0.0
+        }
+    
+    def _probabilities(self, bundle, features):
+        """
+        Class probabilities for one sample, served from the LRU cache
+        
+        Returns (rounded features array, probabilities)
+        """
+        key = tuple(round(float(f), self.cache_precision) for f in features)
+        cache = bundle.cache
+        
+        with self._cache_lock:
+            probabilities = cache.get(key)
+            if probabilities is not None:
+                cache.move_to_end(key)
+                self.cache_hits += 1
+                return np.array(key), probabilities
+            self.cache_misses += 1
+        
+        x = np.array(key)
+        probabilities = bundle.model.predict_proba(x.reshape(1, -1))[0]
+        probabilities.setflags(write=False)
+        
+        with self._cache_lock:
+            cache[key] = probabilities
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+                self.cache_evictions += 1
+        return x, probabilities
     
     def predict(self, features):
         """
@@ -56,62 +241,198 @@ class CropRecommender:
             Dict with crop name and confidence
         """
         try:
-            if self.model is None:
-                # Return mock prediction
-                return {
-                    'crop': 'Rice',
-                    'confidence': 0.92
-                }
+            best = self.rank(features, k=1)[0]
             
-            # Prepare features
-            X = np.array([features])
+            logger.info(f"Crop prediction: {best['crop']} (confidence: {best['confidence']:.2%})")
             
-            # Get prediction and probability
-            prediction = self.model.predict(X)[0]
-            probabilities = self.model.predict_proba(X)[0]
-            confidence = float(max(probabilities))
-            
-            logger.info(f"Crop prediction: {prediction} (confidence: {confidence:.2%})")
-            
-            return {
-                'crop': str(prediction),
-                'confidence': round(confidence, 4)
-            }
+            return best
             
+        except NoSuitableCrop:
+            raise  # an answer about the inputs, not a failure
         except Exception as e:
             logger.error(f"Error in crop prediction: {str(e)}")
             raise
     
+    def rank(self, features, k=3, contributions=False):
+        """
+        Rank the top-k crops for one sample from a single predict_proba call
+        
+        Args:
+            features: List of [N, P, K, temperature, humidity, pH, rainfall]
+            k: Number of crops to return
+            contributions: Also return per-feature contributions to each
+                crop's probability (tree ensembles only)
+        
+        Returns:
+            List of dicts with crop name and confidence, best first
+        """
+        bundle = self._reloader.bundle  # one model for the whole request
+        if bundle.model is None:
+            if self.suitability is not None:
+                return self.suitability.rank(features, k)
+            # Return mock prediction
+            return [{'crop': 'Rice', 'confidence': 0.92}]
+        
+        x, probabilities = self._probabilities(bundle, features)
+        
+        k = max(1, min(int(k), len(probabilities)))
+        top = np.argpartition(-probabilities, k - 1)[:k]
+        # Ties at the cut-off go to the lowest class index, as in argmax
+        top = np.flatnonzero(probabilities >= probabilities[top].min())
+        top = top[np.lexsort((top, -probabilities[top]))][:k]
+        
+        ranked = [
+            {'crop': str(bundle.model.classes_[i]), 'confidence': round(float(probabilities[i]), 4)}
+            for i in top
+        ]
+        
+        if contributions:
+            explained = self._explanation(bundle, x)
+            if explained is not None:
+                baseline, deltas = bundle.explainer.baseline[top], explained[:, top].T
+                for entry, base, delta in zip(ranked, baseline, deltas):
+                    entry['baseline'] = round(float(base), 4)
+                    entry['contributions'] = {
+                        name: round(float(d), 4) for name, d in zip(self.FEATURES, delta)
+                    }
+        
+        return ranked
+    
+    def _explanation(self, bundle, x):
+        """
+        Per-feature contributions to every class for one (rounded) sample
+        
+        Cached next to the prediction cache, under the same key, so a
+        repeated explain costs one dict lookup. Returns a read-only
+        (features, classes) array, or None if the model can't be explained.
+        """
+        if bundle.explainer is None:
+            return None
+        key = tuple(x.tolist())
+        cache = bundle.explain_cache
+        
+        with self._cache_lock:
+            contributions = cache.get(key)
+            if contributions is not None:
+                cache.move_to_end(key)
+                return contributions
+        
+        contributions = bundle.explainer.contributions(x)[0]
+        contributions.setflags(write=False)
+        
+        with self._cache_lock:
+            cache[key] = contributions
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return contributions
+    
+    def predict_batch(self, X, contributions=False):
+        """
+        Predict recommended crops for many samples in one model call
+        
+        Args:
+            X: (n_samples, 7) array-like in FEATURES order
+            contributions: Also return per-feature contributions to each
+                sample's predicted crop, computed for the whole batch at once
+        
+        Returns:
+            List of dicts with crop name and confidence, one per sample
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.FEATURES):
+            raise ValueError(f"Expected an (n, {len(self.FEATURES)}) feature matrix, got shape {X.shape}")
+        
+        # Sample sheets are mostly unique rows, so they bypass the cache
+        bundle = self._reloader.bundle
+        model = bundle.model
+        if model is None:
+            if self.suitability is not None:
+                crops, scores = self.suitability.best(X)
+                return [
+                    {'crop': crop, 'confidence': conf}
+                    for crop, conf in zip(crops, np.round(scores, 4).tolist())
+                ]
+            return [{'crop': 'Rice', 'confidence': 0.92} for _ in range(len(X))]
+        
+        # One ensemble traversal; the class is the argmax, as in model.predict
+        probabilities = model.predict_proba(X)
+        best = probabilities.argmax(axis=1)
+        crops = model.classes_[best].tolist()
+        confidence = np.round(probabilities[np.arange(len(X)), best], 4).tolist()
+        
+        logger.info(f"Batch crop prediction: {len(X)} samples")
+        
+        results = [
+            {'crop': str(crop), 'confidence': conf}
+            for crop, conf in zip(crops, confidence)
+        ]
+        if contributions and bundle.explainer is not None:
+            deltas = np.round(bundle.explainer.contributions_for(X, best), 4).tolist()
+            for result, delta in zip(results, deltas):
+                result['contributions'] = dict(zip(self.FEATURES, delta))
+        return results
+    
+    def class_scores(self, X):
+        """
+        Score matrix for many samples, for bulk jobs that need every crop
+    
+        Args:
+            X: (n_samples, 7) array-like in FEATURES order
+    
+        Returns:
+            (crop labels, (n_samples, n_crops) scores, model version).
+            Scores are class probabilities, or suitability scores when
+            there is no model.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.FEATURES):
+            raise ValueError(f"Expected an (n, {len(self.FEATURES)}) feature matrix, got shape {X.shape}")
+    
+        bundle = self._reloader.bundle
+        if bundle.model is not None:
+            labels = [str(label) for label in bundle.model.classes_]
+            return labels, bundle.model.predict_proba(X), bundle.version
+        if self.suitability is not None:
+            return list(self.suitability.crops), self.suitability.score(X), 'suitability-rules'
+        raise RuntimeError('No crop model or crop requirements available')
+    
+    def class_choices(self, X):
+        """
+        Like class_scores, plus the crop each sample is assigned
+        
+        Returns (crop labels, scores, chosen index per sample, model
+        version). The choice is the one predict_batch makes: the model's
+        argmax, or without a model the suitability ranking, where -1
+        marks samples no crop is suitable for.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        bundle = self._reloader.bundle
+        if bundle.model is None and self.suitability is not None:
+            if X.ndim != 2 or X.shape[1] != len(self.FEATURES):
+                raise ValueError(f"Expected an (n, {len(self.FEATURES)}) feature matrix, got shape {X.shape}")
+            scores, choice = self.suitability.choose(X)
+            return list(self.suitability.crops), scores, choice, 'suitability-rules'
+        labels, scores, version = self.class_scores(X)
+        return labels, scores, scores.argmax(axis=1), version
+    
     def get_crop_info(self, crop_name):
-        """Get information about a specific crop"""
-        crop_info = {
-            'Rice': {
-                'nitrogen': '80-100',
-                'phosphorus': '40-60',
-                'potassium': '40-60',
-                'ideal_temperature': '20-30°C',
-                'ideal_humidity': '70-80%',
-                'ideal_ph': '6.0-7.0',
-                'min_rainfall': '100-200cm'
-            },
-            'Maize': {
-                'nitrogen': '100-150',
-                'phosphorus': '60-80',
-                'potassium': '40-60',
-                'ideal_temperature': '20-27°C',
-                'ideal_humidity': '60-70%',
-                'ideal_ph': '6.0-7.5',
-                'min_rainfall': '50-100cm'
-            },
-            'Wheat': {
-                'nitrogen': '80-120',
-                'phosphorus': '60-90',
-                'potassium': '40-70',
-                'ideal_temperature': '15-25°C',
-                'ideal_humidity': '60-70%',
-                'ideal_ph': '6.0-7.5',
-                'min_rainfall': '40-100cm'
-            }
-        }
+        """Get ideal growing ranges for a crop from the requirements data"""
+        if self.suitability is None:
+            return {}
+        ranges = self.suitability.requirements(crop_name)
+        if ranges is None:
+            return {}
         
-        return crop_info.get(crop_name, {})
+        def span(feature, fmt='{:g}', unit=''):
+            lo, hi = ranges[feature]
+            return f"{fmt.format(lo)}-{fmt.format(hi)}{unit}"
+        
+        return {
+            'nitrogen': span('nitrogen'),
+            'phosphorus': span('phosphorus'),
+            'potassium': span('potassium'),
+            'ideal_temperature': span('temperature', unit='°C'),
+            'ideal_humidity': span('humidity', unit='%'),
+            'ideal_ph': span('ph', fmt='{:.1f}'),
+            'min_rainfall': span('rainfall', unit='mm')
+        }
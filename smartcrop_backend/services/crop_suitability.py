@@ -0,0 +1,175 @@
+"""
+Crop Suitability Scorer
+Rule-based crop ranking from per-crop N/P/K/climate/pH/rainfall ranges,
+scored for all crops and samples in one broadcast operation
+"""
+
+import os
+import csv
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUIREMENTS_PATH = os.path.join(
+    os.path.dirname(__file__), '..', 'datasets', 'crop_requirements.csv')
+
+FEATURES = ('nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall')
+
+# Rows scored per broadcast, bounding the (rows, crops, features) temporary
+CHUNK_ROWS = 4096
+
+
+class NoSuitableCrop(ValueError):
+    """No crop's ranges come close to the sample; ranking it would be arbitrary"""
+
+    def __init__(self, closest, limiting):
+        self.closest = closest
+        self.limiting = limiting
+        super().__init__(f"Inputs are outside every crop's requirements (closest: {closest}; "
+                         f"out of range: {', '.join(limiting)})")
+
+
+class CropSuitability:
+    """Scores samples against every crop's ideal ranges.
+
+    The requirements file gives a ``<feature>_min``/``<feature>_max`` pair
+    per crop; rows with ``alias_of`` set (alternative names such as Corn
+    for Maize) share the target's ranges and are not ranked separately.
+    Ranges are held as (crops, features) ``low``/``high`` matrices.
+
+    A value inside its range scores 1. Outside it, the distance to the
+    range is measured in units of ``tolerance`` x the range width, and a
+    crop's score is ``exp(-0.5 * sum(distance ** 2))``, the product of
+    Gaussian fall-offs, so every limiting factor counts. Crops are ordered
+    by the log of that score; among crops whose ranges all contain the
+    sample, the one whose range centres are closest wins.
+
+    When even the best crop scores below ``min_score`` the sample fits
+    nothing (typically inputs on another scale, such as rainfall per
+    reading instead of per season), and the order of the near-zero
+    scores means nothing: ``rank`` raises NoSuitableCrop and ``best``
+    returns None for that sample.
+    """
+
+    # Weight of the distance-to-centre tie-break in the ranking key
+    CENTER_WEIGHT = 1e-3
+    # About one feature 0.75 range widths outside, or several a little outside
+    MIN_SCORE = 0.01
+
+    def __init__(self, path=DEFAULT_REQUIREMENTS_PATH, features=FEATURES, tolerance=0.25,
+                 min_score=MIN_SCORE):
+        self.path = path
+        self.features = tuple(features)
+        self.tolerance = tolerance
+        self.min_score = min_score
+        self.load()
+
+    def load(self):
+        """Read the requirements file into bound matrices"""
+        names, aliases, low, high, all_crops = [], {}, [], [], []
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                crop = row['crop'].strip()
+                all_crops.append(crop)
+                if row.get('alias_of'):
+                    aliases[crop] = row['alias_of'].strip()
+                    continue
+                names.append(crop)
+                low.append([float(row[f"{feature}_min"]) for feature in self.features])
+                high.append([float(row[f"{feature}_max"]) for feature in self.features])
+
+        self.crops = names
+        self.all_crops = all_crops  # file order, aliases included
+        self.aliases = aliases
+        self.low = np.array(low)
+        self.high = np.array(high)
+        if np.any(self.low > self.high):
+            raise ValueError(f"Crop requirements in {self.path} have min > max")
+        # Fall-off scale per crop and feature; a degenerate range still gets some slack
+        width = self.high - self.low
+        width = np.maximum(width, 0.05 * np.abs(self.high) + 1e-6)
+        self._scale = self.tolerance * width
+        self._center = (self.low + self.high) / 2
+        self._half_width = width / 2
+        self._index = {name.lower(): i for i, name in enumerate(names)}
+        for alias, target in aliases.items():
+            self._index[alias.lower()] = self._index[target.lower()]
+        logger.info(f"✅ Crop requirements loaded: {len(names)} crops, {len(aliases)} aliases")
+
+    def _log_scores(self, X):
+        """(log suitability, ranking key), each of shape (n, n_crops)"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != len(self.features):
+            raise ValueError(f"Expected {len(self.features)} features, got {X.shape[1]}")
+
+        log_scores = np.empty((len(X), len(self.crops)))
+        keys = np.empty_like(log_scores)
+        for start in range(0, len(X), CHUNK_ROWS):
+            x = X[start:start + CHUNK_ROWS, None, :]
+            distance = (np.maximum(self.low - x, 0.0) + np.maximum(x - self.high, 0.0)) / self._scale
+            log_score = -0.5 * np.sum(distance ** 2, axis=-1)
+            off_center = np.mean(np.abs(x - self._center) / self._half_width, axis=-1)
+            log_scores[start:start + CHUNK_ROWS] = log_score
+            keys[start:start + CHUNK_ROWS] = log_score - self.CENTER_WEIGHT * off_center
+        return log_scores, keys
+
+    def score(self, X):
+        """Suitability in [0, 1] for every sample and crop, shape (n, n_crops)"""
+        return np.exp(self._log_scores(X)[0])
+
+    def limiting(self, x, crop_index):
+        """Features of one sample outside a crop's range, furthest first"""
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        low, high = self.low[crop_index], self.high[crop_index]
+        distance = (np.maximum(low - x, 0.0) + np.maximum(x - high, 0.0)) / self._scale[crop_index]
+        return [self.features[j] for j in np.argsort(-distance, kind='stable') if distance[j] > 0]
+
+    def rank(self, features, k=3):
+        """Top-k crops for one sample: [{'crop', 'confidence'}], best first"""
+        log_scores, keys = self._log_scores(features)
+        k = max(1, min(int(k), len(self.crops)))
+        top = np.argsort(-keys[0], kind='stable')[:k]
+        if np.exp(log_scores[0, top[0]]) < self.min_score:
+            raise NoSuitableCrop(self.crops[top[0]], self.limiting(features, top[0]))
+        return [
+            {'crop': self.crops[i], 'confidence': round(float(np.exp(log_scores[0, i])), 4)}
+            for i in top
+        ]
+
+    def _pick(self, X):
+        """(all scores, ranking-key argmax, its score) per sample"""
+        log_scores, keys = self._log_scores(X)
+        best = keys.argmax(axis=1)
+        scores = np.exp(log_scores)
+        return scores, best, scores[np.arange(len(best)), best]
+
+    def choose(self, X):
+        """
+        Scores of every crop and the chosen crop index per sample
+
+        Returns ((n, n_crops) scores, (n,) index into ``crops``), with the
+        index -1 where even the best crop scores below ``min_score``. Ties
+        are broken by the ranking key, as in ``rank``.
+        """
+        scores, best, top = self._pick(X)
+        return scores, np.where(top >= self.min_score, best, -1)
+
+    def best(self, X):
+        """Best crop (None if below min_score) and its score for each sample"""
+        _, best, top = self._pick(X)
+        suitable = (top >= self.min_score).tolist()
+        return [self.crops[i] if ok else None for i, ok in zip(best.tolist(), suitable)], top
+
+    def requirements(self, crop_name):
+        """{feature: (min, max)} for a crop or alias (case-insensitive), or None"""
+        i = self._index.get(str(crop_name).lower())
+        if i is None:
+            return None
+        return {
+            feature: (float(lo), float(hi))
+            for feature, lo, hi in zip(self.features, self.low[i], self.high[i])
+        }
@@ -13,80 +13,128 @@ import traceback
 from scipy import ndimage
 import cv2
 
+from .model_reloader import HotReloader, files_digest
+
 logger = logging.getLogger(__name__)
 
 
 class DiseaseDetector:
     """Service for plant disease detection using CNN model"""
     
-    def __init__(self):
-        """Initialize disease detector with trained model"""
-        self.model = None
-        self.treatment_data = {}
-        self.disease_classes = []
+    def __init__(self, model_path='models/disease_model.h5',
+                 treatment_path='datasets/treatment_data.csv', watch_interval=None):
+        """
+        Initialize disease detector with trained model
+        
+        The model and treatment database are held in one immutable bundle;
+        with ``watch_interval`` both files are polled and a changed set is
+        loaded, warmed up and swapped in without a restart.
+        """
+        self.model_path = model_path
+        self.treatment_path = treatment_path
         
-        self.load_model()
-        self.load_treatment_data()
+        self._reloader = HotReloader(
+            'disease', lambda: [self.model_path, self.treatment_path], self._load_bundle,
+            warm_up=self._warm_up,
+            fallback=lambda: {'model': None, 'disease_classes': [], 'treatment_data': {}}
+        )
+        self.reload(force=True)
+        self._reloader.watch(watch_interval)
+    
+    @property
+    def model(self):
+        return self._reloader.bundle.model
+    
+    @property
+    def disease_classes(self):
+        return self._reloader.bundle.disease_classes
+    
+    @property
+    def treatment_data(self):
+        return self._reloader.bundle.treatment_data
+    
+    def reload(self, force=False):
+        """Reload the model and treatment data if their files changed"""
+        return self._reloader.reload(force=force)
+    
+    def model_status(self):
+        """Serving version, load time and reload counters"""
+        status = self._reloader.status()
+        status['type'] = 'cnn' if self.model is not None else 'image-analysis'
+        status['treatments'] = len(self.treatment_data)
+        return status
+    
+    def _load_bundle(self):
+        model, disease_classes = self.load_model()
+        treatment_data = self.load_treatment_data()
+        version = files_digest([self.model_path, self.treatment_path])
+        bundle = {
+            'model': model,
+            'disease_classes': disease_classes,
+            'treatment_data': treatment_data,
+        }
+        return bundle, version
+    
+    def _warm_up(self, bundle):
+        """Run a new CNN once before it serves so the first request isn't slow"""
+        if bundle.model is not None:
+            bundle.model.predict(np.zeros((1, 224, 224, 3), dtype=np.float32), verbose=0)
     
     def load_model(self):
-        """Load trained disease detection model"""
-        try:
-            model_path = 'models/disease_model.h5'
+        """Load trained disease detection model; returns (model, disease classes)"""
+        model_path = self.model_path
+        
+        if os.path.exists(model_path):
+            try:
+                import tensorflow as tf
+            except ImportError:
+                logger.warning("⚠️ TensorFlow not available, using image-analysis fallback")
+                return None, []
             
-            if os.path.exists(model_path):
-                try:
-                    import tensorflow as tf
-                    self.model = tf.keras.models.load_model(model_path)
-                    self.disease_classes = [
-                        'Apple_scab', 'Apple_black_rot', 'Apple_cedar_apple_rust', 'Apple_healthy',
-                        'Background_with_healthy_leaves', 'Background_without_leaves',
-                        'Blueberry_healthy', 'Cherry_powdery_mildew', 'Cherry_healthy',
-                        'Corn_cercospora_leaf_spot', 'Corn_common_rust', 'Corn_northern_leaf_blight',
-                        'Corn_healthy', 'Grape_black_rot', 'Grape_esca', 'Grape_leaf_blight',
-                        'Grape_healthy', 'Orange_haunglongbing', 'Peach_bacterial_spot',
-                        'Peach_healthy', 'Pepper_pepper_bell_bacterial_spot', 'Pepper_bell_healthy',
-                        'Potato_early_blight', 'Potato_late_blight', 'Potato_healthy',
-                        'Raspberry_healthy', 'Soybean_frogeye_leaf_spot', 'Soybean_healthy',
-                        'Squash_powdery_mildew', 'Strawberry_leaf_scorch', 'Strawberry_healthy',
-                        'Tomato_bacterial_spot', 'Tomato_early_blight', 'Tomato_late_blight',
-                        'Tomato_leaf_mold', 'Tomato_septoria_leaf_spot', 'Tomato_spider_mites',
-                        'Tomato_target_spot', 'Tomato_tomato_mosaic_virus', 'Tomato_yellow_leaf_curl_virus',
-                        'Tomato_healthy'
-                    ]
-                    logger.info("✅ Disease model loaded successfully")
-                except ImportError:
-                    logger.warning("⚠️ TensorFlow not available, using image-analysis fallback")
-                    self.model = None
-            else:
-                logger.warning(f"⚠️ Model not found at {model_path}, using image-analysis fallback")
-                self.model = None
-                
-        except Exception as e:
-            logger.error(f"❌ Error loading disease model: {str(e)}")
-            logger.error(traceback.format_exc())
-            self.model = None
+            # Load errors propagate so a reload keeps the model already serving
+            model = tf.keras.models.load_model(model_path)
+            disease_classes = [
+                'Apple_scab', 'Apple_black_rot', 'Apple_cedar_apple_rust', 'Apple_healthy',
+                'Background_with_healthy_leaves', 'Background_without_leaves',
+                'Blueberry_healthy', 'Cherry_powdery_mildew', 'Cherry_healthy',
+                'Corn_cercospora_leaf_spot', 'Corn_common_rust', 'Corn_northern_leaf_blight',
+                'Corn_healthy', 'Grape_black_rot', 'Grape_esca', 'Grape_leaf_blight',
+                'Grape_healthy', 'Orange_haunglongbing', 'Peach_bacterial_spot',
+                'Peach_healthy', 'Pepper_pepper_bell_bacterial_spot', 'Pepper_bell_healthy',
+                'Potato_early_blight', 'Potato_late_blight', 'Potato_healthy',
+                'Raspberry_healthy', 'Soybean_frogeye_leaf_spot', 'Soybean_healthy',
+                'Squash_powdery_mildew', 'Strawberry_leaf_scorch', 'Strawberry_healthy',
+                'Tomato_bacterial_spot', 'Tomato_early_blight', 'Tomato_late_blight',
+                'Tomato_leaf_mold', 'Tomato_septoria_leaf_spot', 'Tomato_spider_mites',
+                'Tomato_target_spot', 'Tomato_tomato_mosaic_virus', 'Tomato_yellow_leaf_curl_virus',
+                'Tomato_healthy'
+            ]
+            logger.info("✅ Disease model loaded successfully")
+            return model, disease_classes
+        
+        logger.warning(f"⚠️ Model not found at {model_path}, using image-analysis fallback")
+        return None, []
     
     def load_treatment_data(self):
-        """Load treatment data from CSV"""
-        try:
-            csv_path = 'datasets/treatment_data.csv'
-            
-            if os.path.exists(csv_path):
-                with open(csv_path, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        disease_name = row.get('disease_name', '').lower()
-                        self.treatment_data[disease_name] = {
-                            'symptoms': row.get('symptoms', ''),
-                            'treatment': row.get('treatment', ''),
-                            'prevention': row.get('prevention', '')
-                        }
-                logger.info(f"✅ Treatment data loaded: {len(self.treatment_data)} diseases")
-            else:
-                logger.warning(f"⚠️ Treatment data not found at {csv_path}")
-                
-        except Exception as e:
-            logger.error(f"❌ Error loading treatment data: {str(e)}")
+        """Load treatment data from CSV; returns {disease name: treatment info}"""
+        csv_path = self.treatment_path
+        treatment_data = {}
+        
+        if os.path.exists(csv_path):
+            with open(csv_path, 'r', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    disease_name = row.get('disease_name', '').lower()
+                    treatment_data[disease_name] = {
+                        'symptoms': row.get('symptoms', ''),
+                        'treatment': row.get('treatment', ''),
+                        'prevention': row.get('prevention', '')
+                    }
+            logger.info(f"✅ Treatment data loaded: {len(treatment_data)} diseases")
+        else:
+            logger.warning(f"⚠️ Treatment data not found at {csv_path}")
+        
+        return treatment_data
     
     def preprocess_image(self, image_path):
         """Preprocess image for model prediction"""
@@ -185,8 +233,8 @@ class DiseaseDetector:
             'grey_pct':   round(np.sum(grey_hue) / pixels * 100, 2),
             'white_pct':  round(np.sum(white_hue) / pixels * 100, 2),
             'dark_pct':   round(np.sum(dark_hue) / pixels * 100, 2),
-            'avg_saturation': round(float(np.mean(s)), 2),
-            'avg_value': round(float(np.mean(v)), 2),
+            'avg_saturation': round(np.mean(s), 2),
+            'avg_value': round(np.mean(v), 2),
         }
     
     def _analyze_texture(self, img_array):
@@ -809,6 +857,9 @@ class DiseaseDetector:
             if not os.path.exists(image_path):
                 raise FileNotFoundError(f"Image not found: {image_path}")
             
+            # Treatment lookups for this request use one consistent table
+            treatment_data = self.treatment_data
+            
             # Extract features from image
             features = self.analyze_image_features(image_path)
             
@@ -846,13 +897,13 @@ class DiseaseDetector:
             # Get treatment info from database
             treatment_info = None
             disease_lower = disease_name.lower()
-            for key, info in self.treatment_data.items():
+            for key, info in treatment_data.items():
                 if disease_lower == key.replace(' ', '_') or disease_lower.replace('_', ' ') == key:
                     treatment_info = info
                     break
             if not treatment_info:
                 # Partial match
-                for key, info in self.treatment_data.items():
+                for key, info in treatment_data.items():
                     if disease_lower in key.replace(' ', '_') or key.replace(' ', '_') in disease_lower:
                         treatment_info = info
                         break
@@ -0,0 +1,279 @@
+"""
+Similar Field Index
+Nearest-neighbour search over past crop prediction requests and outcomes
+in the standardized 7-D soil and climate feature space
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ('nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall')
+
+
+class _IndexSnapshot:
+    """KD-tree over the records known at build time; replaced, never mutated"""
+
+    __slots__ = ('tree', 'ids', 'mean', 'scale', 'max_id', 'built_at', 'build_seconds')
+
+    def __init__(self, ids, X, build_seconds=0.0):
+        self.ids = ids
+        if len(X):
+            self.mean = X.mean(axis=0)
+            scale = X.std(axis=0)
+            self.scale = np.where(scale > 0, scale, 1.0)
+        else:
+            self.mean = np.zeros(len(FEATURES))
+            self.scale = np.ones(len(FEATURES))
+        self.tree = cKDTree((X - self.mean) / self.scale) if len(X) else None
+        self.max_id = int(ids.max()) if len(ids) else 0
+        self.built_at = datetime.now().isoformat()
+        self.build_seconds = build_seconds
+
+
+class FieldIndex:
+    """k-nearest similar fields over stored prediction requests.
+
+    Records live in SQLite (one row per request: features, predicted crop,
+    optional observed outcome). Searching uses a ``cKDTree`` over the
+    features standardized to zero mean / unit variance at build time, plus
+    a small delta buffer of records added since the last build that is
+    scanned with one vectorized distance computation. The tree is rebuilt
+    from the database on a background thread when the buffer reaches
+    ``rebuild_fraction`` of the indexed records (at least 16, at most
+    ``rebuild_threshold``, so a young index re-standardizes often and a
+    large one keeps the scan short) or the index is older than
+    ``rebuild_interval`` seconds; rebuilding from the database also picks
+    up records written by other worker processes. Queries never wait for
+    a rebuild: the finished tree is swapped in with one assignment.
+    """
+
+    def __init__(self, db_path='data/field_history.db', rebuild_threshold=1024,
+                 rebuild_fraction=0.1, rebuild_interval=300.0):
+        self.db_path = db_path
+        self.rebuild_threshold = rebuild_threshold
+        self.rebuild_fraction = rebuild_fraction
+        self.rebuild_interval = rebuild_interval
+
+        self._lock = threading.Lock()  # delta buffer and the connection
+        self._rebuilding = False
+        self._delta_ids = np.zeros(rebuild_threshold, dtype=np.int64)
+        self._delta_X = np.zeros((rebuild_threshold, len(FEATURES)))
+        self._delta_count = 0
+        self._last_build = 0.0
+        self.rebuilds = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._init_db()
+        self._snapshot = _IndexSnapshot(np.zeros(0, dtype=np.int64), np.zeros((0, len(FEATURES))))
+        self.rebuild()
+
+    def _init_db(self):
+        with self._lock:
+            c = self._conn
+            # WAL: readers in other workers don't block the per-request inserts
+            c.execute('PRAGMA journal_mode=WAL')
+            c.execute('PRAGMA synchronous=NORMAL')
+            c.execute(f'''CREATE TABLE IF NOT EXISTS field_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL,
+                field_id TEXT,
+                {', '.join(f'{name} REAL NOT NULL' for name in FEATURES)},
+                predicted_crop TEXT,
+                confidence REAL,
+                outcome_crop TEXT,
+                outcome_yield REAL,
+                outcome_at TEXT
+            )''')
+            c.commit()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add(self, features, predicted_crop=None, confidence=None, field_id=None):
+        """Store one prediction request; returns its record id"""
+        x = np.asarray(features, dtype=np.float64)
+        if x.shape != (len(FEATURES),) or not np.all(np.isfinite(x)):
+            raise ValueError(f"Expected {len(FEATURES)} finite feature values")
+
+        with self._lock:
+            cursor = self._conn.execute(
+                f'''INSERT INTO field_records
+                    (created_at, field_id, {', '.join(FEATURES)}, predicted_crop, confidence)
+                    VALUES (?, ?, {', '.join('?' * len(FEATURES))}, ?, ?)''',
+                (datetime.now().isoformat(), field_id, *x.tolist(), predicted_crop, confidence)
+            )
+            self._conn.commit()
+            record_id = cursor.lastrowid
+
+            if self._delta_count == len(self._delta_ids):
+                # A rebuild is slow to catch up; grow rather than drop records
+                self._delta_ids = np.concatenate([self._delta_ids, np.zeros_like(self._delta_ids)])
+                self._delta_X = np.concatenate([self._delta_X, np.zeros_like(self._delta_X)])
+            self._delta_ids[self._delta_count] = record_id
+            self._delta_X[self._delta_count] = x
+            self._delta_count += 1
+
+        self._maybe_rebuild()
+        return record_id
+
+    def record_outcome(self, record_id, crop, yield_=None):
+        """Attach what was actually grown (and optionally the yield) to a record"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE field_records SET outcome_crop = ?, outcome_yield = ?, outcome_at = ? '
+                'WHERE id = ?',
+                (crop, yield_, datetime.now().isoformat(), int(record_id))
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    def _maybe_rebuild(self):
+        # Check-and-set under the lock: concurrent inserts start one rebuild, not one each
+        with self._lock:
+            if self._rebuilding or not self._delta_count:
+                return
+            threshold = min(self.rebuild_threshold, max(16, self.rebuild_fraction * len(self._snapshot.ids)))
+            stale = time.monotonic() - self._last_build > self.rebuild_interval
+            if self._delta_count < threshold and not stale:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, name='field-index-rebuild',
+                         daemon=True).start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def rebuild(self):
+        """Rebuild the KD-tree from every record in the database"""
+        started = time.perf_counter()
+        try:
+            # Own connection: with WAL the full read doesn't block inserts or queries
+            conn = sqlite3.connect(self.db_path)
+            try:
+                rows = conn.execute(
+                    f'SELECT id, {", ".join(FEATURES)} FROM field_records ORDER BY id'
+                ).fetchall()
+            finally:
+                conn.close()
+            data = np.array(rows, dtype=np.float64).reshape(-1, len(FEATURES) + 1)
+            snapshot = _IndexSnapshot(data[:, 0].astype(np.int64), data[:, 1:])
+
+            with self._lock:
+                # Records added while building stay in the delta buffer
+                keep = self._delta_ids[:self._delta_count] > snapshot.max_id
+                n = int(keep.sum())
+                self._delta_ids[:n] = self._delta_ids[:self._delta_count][keep]
+                self._delta_X[:n] = self._delta_X[:self._delta_count][keep]
+                self._delta_count = n
+                snapshot.build_seconds = round(time.perf_counter() - started, 4)
+                self._snapshot = snapshot
+                self._last_build = time.monotonic()
+                self.rebuilds += 1
+            logger.info(f"Field index rebuilt: {len(snapshot.ids)} records "
+                        f"in {snapshot.build_seconds:.3f}s")
+        except Exception as e:
+            logger.error(f"❌ Field index rebuild failed: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(self, features, k=5):
+        """The k most similar stored records, nearest first.
+
+        Distances are Euclidean in standardized units (1.0 is one standard
+        deviation along one feature).
+        """
+        x = np.asarray(features, dtype=np.float64)
+        if x.shape != (len(FEATURES),):
+            raise ValueError(f"Expected {len(FEATURES)} feature values")
+        k = max(1, int(k))
+
+        snapshot = self._snapshot
+        z = (x - snapshot.mean) / snapshot.scale
+        ids, distances = [], []
+        if snapshot.tree is not None:
+            kk = min(k, len(snapshot.ids))
+            dist, idx = snapshot.tree.query(z, k=kk)
+            dist, idx = np.atleast_1d(dist), np.atleast_1d(idx)
+            ids.append(snapshot.ids[idx])
+            distances.append(dist)
+
+        with self._lock:
+            delta_ids = self._delta_ids[:self._delta_count].copy()
+            delta_X = self._delta_X[:self._delta_count].copy()
+        if len(delta_ids):
+            # Skip buffered records the snapshot already indexes
+            fresh = delta_ids > snapshot.max_id
+            delta_ids, delta_X = delta_ids[fresh], delta_X[fresh]
+            ids.append(delta_ids)
+            distances.append(np.sqrt((((delta_X - snapshot.mean) / snapshot.scale - z) ** 2).sum(axis=1)))
+
+        if not ids:
+            return []
+        ids = np.concatenate(ids)
+        distances = np.concatenate(distances)
+        order = np.lexsort((ids, distances))[:k]
+        return self._records(ids[order].tolist(), distances[order].tolist())
+
+    def _records(self, ids, distances):
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f'''SELECT id, created_at, field_id, {', '.join(FEATURES)}, predicted_crop,
+                           confidence, outcome_crop, outcome_yield
+                    FROM field_records WHERE id IN ({', '.join('?' * len(ids))})''',
+                ids
+            ).fetchall()
+        by_id = {row[0]: row for row in rows}
+
+        results = []
+        for record_id, distance in zip(ids, distances):
+            row = by_id.get(record_id)
+            if row is None:
+                continue
+            values = row[3:3 + len(FEATURES)]
+            predicted_crop, confidence, outcome_crop, outcome_yield = row[3 + len(FEATURES):]
+            results.append({
+                'record_id': record_id,
+                'field_id': row[2],
+                'created_at': row[1],
+                'distance': round(distance, 4),
+                'features': dict(zip(FEATURES, values)),
+                'predicted_crop': predicted_crop,
+                'confidence': confidence,
+                'outcome': {'crop': outcome_crop, 'yield': outcome_yield} if outcome_crop else None,
+            })
+        return results
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'indexed': len(snapshot.ids),
+            'buffered': self._delta_count,
+            'rebuilds': self.rebuilds,
+            'built_at': snapshot.built_at,
+            'build_seconds': snapshot.build_seconds,
+        }
@@ -0,0 +1,230 @@
+"""
+Synthetic Sensor Fleet Generator
+Vectorized, seeded generation of scenario-driven readings for N devices
+over T hours, for benchmarking analytics, storage and alerting
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from .iot_service import IOTSimulator
+
+logger = logging.getLogger(__name__)
+
+# Relative amplitude of the 24h sine cycle per metric (default 0.05, the
+# same daily variation IOTSimulator applies). Humidity runs opposite to
+# temperature; light drops towards zero at night.
+DIURNAL_AMPLITUDE = {
+    'temperature': 0.12,
+    'humidity': -0.10,
+    'soil_moisture': -0.03,
+    'light_intensity': 0.8,
+}
+
+FAULT_STUCK = 1
+FAULT_SPIKE = 2
+FAULT_DROPOUT = 3
+
+
+class FleetGenerator:
+    """Generates readings for a fleet of simulated devices in time chunks.
+
+    Each device draws a baseline inside the scenario range and then
+    follows a diurnal sine pattern, Gaussian noise, a slow per-device
+    linear drift and occasional faults (stuck values, spikes, dropouts
+    reported as NaN). Everything is driven by one seeded
+    ``numpy.random.Generator`` so runs are reproducible.
+    """
+
+    def __init__(self, scenario='healthy_crop', n_devices=100, hours=24, interval=60,
+                 seed=None, start=None, noise=0.03, drift_per_day=0.02, fault_rate=0.0005,
+                 stuck_steps=(10, 120), chunk_steps=256, device_prefix='sim'):
+        if scenario not in IOTSimulator.SCENARIOS:
+            raise ValueError(f"Unknown scenario: {scenario}")
+
+        self.scenario = scenario
+        self.metrics = IOTSimulator.METRICS
+        self.n_devices = int(n_devices)
+        self.interval = float(interval)
+        self.n_steps = int(hours * 3600 // self.interval)
+        self.start = start or datetime.now().replace(second=0, microsecond=0)
+        self.noise = noise
+        self.fault_rate = fault_rate
+        self.stuck_steps = stuck_steps
+        self.chunk_steps = chunk_steps
+        self.device_ids = [f'{device_prefix}-{i:05d}' for i in range(self.n_devices)]
+        self.rng = np.random.default_rng(seed)
+
+        params = IOTSimulator.SCENARIOS[scenario]
+        self.lo = np.array([params[m][0] for m in self.metrics], dtype=np.float64)
+        self.hi = np.array([params[m][1] for m in self.metrics], dtype=np.float64)
+        self.span = self.hi - self.lo
+        self.amplitude = np.array([DIURNAL_AMPLITUDE.get(m, 0.05) for m in self.metrics])
+        self.decimals = np.array([0 if m == 'light_intensity' else 2 for m in self.metrics])
+
+        # Per-device state
+        M = len(self.metrics)
+        self.baseline = self.rng.uniform(self.lo, self.hi, size=(self.n_devices, M))
+        self.drift = self.rng.normal(0.0, drift_per_day, size=(self.n_devices, M)) * self.span
+        self._stuck_left = np.zeros((self.n_devices, M), dtype=np.int64)
+        self._stuck_value = np.zeros((self.n_devices, M))
+        self._last = self.baseline.copy()
+
+    @property
+    def total_readings(self):
+        return self.n_steps * self.n_devices
+
+    def chunks(self):
+        """Yield (timestamps, values, faults) per block of time steps.
+
+        ``timestamps`` has shape (T,) in epoch seconds, ``values`` and
+        ``faults`` have shape (T, n_devices, n_metrics).
+        """
+        t0 = self.start.timestamp()
+        N, M = self.n_devices, len(self.metrics)
+
+        for first in range(0, self.n_steps, self.chunk_steps):
+            steps = np.arange(first, min(first + self.chunk_steps, self.n_steps))
+            T = len(steps)
+            ts = t0 + steps * self.interval
+
+            first_dt = datetime.fromtimestamp(ts[0])
+            hours = first_dt.hour + first_dt.minute / 60.0 + (ts - ts[0]) / 3600.0
+            # Peak in early afternoon, trough before dawn
+            phase = np.sin((hours - 8.0) * np.pi / 12.0)[:, None, None]
+            days = ((ts - t0) / 86400.0)[:, None, None]
+
+            values = self.baseline[None] * (1 + self.amplitude * phase)
+            values += self.drift[None] * days
+            values += self.rng.normal(0.0, 1.0, size=(T, N, M)) * (self.span * self.noise)
+            values = np.maximum(values, 0.0)
+
+            faults = np.zeros((T, N, M), dtype=np.int8)
+            if self.fault_rate:
+                draws = self.rng.random((T, N, M))
+                faults[draws < self.fault_rate] = FAULT_STUCK
+                faults[(draws >= self.fault_rate) & (draws < 2 * self.fault_rate)] = FAULT_SPIKE
+                faults[(draws >= 2 * self.fault_rate) & (draws < 3 * self.fault_rate)] = FAULT_DROPOUT
+                spikes = faults == FAULT_SPIKE
+                values[spikes] *= self.rng.choice([0.2, 3.0], size=int(spikes.sum()))
+                self._apply_stuck(values, faults)
+                values[faults == FAULT_DROPOUT] = np.nan
+
+            values = np.round(values, 2)
+            values[..., self.decimals == 0] = np.round(values[..., self.decimals == 0], 0)
+            self._last = values[-1].copy()
+            yield ts, values, faults
+
+    def _apply_stuck(self, values, faults):
+        """Freeze a channel at its last value for a random number of steps"""
+        lo, hi = self.stuck_steps
+        for t in range(values.shape[0]):
+            starting = (faults[t] == FAULT_STUCK) & (self._stuck_left == 0)
+            if starting.any():
+                previous = values[t - 1] if t else self._last
+                self._stuck_value[starting] = previous[starting]
+                self._stuck_left[starting] = self.rng.integers(lo, hi, size=int(starting.sum()))
+            active = self._stuck_left > 0
+            if active.any():
+                values[t][active] = self._stuck_value[active]
+                faults[t][active] = FAULT_STUCK
+                self._stuck_left[active] -= 1
+
+    # ------------------------------------------------------------------
+    # Sinks
+    # ------------------------------------------------------------------
+
+    def run(self, sink):
+        """Feed every chunk to ``sink(device_ids, timestamps, values)``; returns stats"""
+        started = time.perf_counter()
+        produced = 0
+        for ts, values, _ in self.chunks():
+            sink(self.device_ids, ts, values)
+            produced += values.shape[0] * values.shape[1]
+        elapsed = time.perf_counter() - started
+        rate = produced / elapsed if elapsed else float('inf')
+        logger.info(f"Generated {produced} readings in {elapsed:.2f}s ({rate:,.0f}/s)")
+        return {'readings': produced, 'seconds': round(elapsed, 3), 'readings_per_sec': round(rate)}
+
+    def write_ndjson(self, path):
+        """One JSON object per reading, ordered by time step then device"""
+        with open(path, 'w', encoding='utf-8') as f:
+            def sink(device_ids, ts, values):
+                iso = [datetime.fromtimestamp(t).isoformat() for t in ts]
+                rows = values.tolist()
+                lines = []
+                for t, stamp in enumerate(iso):
+                    for d, device_id in enumerate(device_ids):
+                        reading = {'device_id': device_id, 'scenario': self.scenario, 'timestamp': stamp}
+                        for m, v in zip(self.metrics, rows[t][d]):
+                            reading[m] = None if v != v else v
+                        lines.append(json.dumps(reading))
+                f.write('\n'.join(lines) + '\n')
+            return self.run(sink)
+
+    def write_binary(self, path):
+        """Flat structured records: device index, epoch ts and float32 metrics"""
+        dtype = np.dtype([('device', '<u4'), ('ts', '<f8')] + [(m, '<f4') for m in self.metrics])
+        with open(path, 'wb') as f:
+            def sink(device_ids, ts, values):
+                T, N, _ = values.shape
+                records = np.empty(T * N, dtype=dtype)
+                records['device'] = np.tile(np.arange(N, dtype=np.uint32), T)
+                records['ts'] = np.repeat(ts, N)
+                flat = values.reshape(T * N, -1)
+                for j, m in enumerate(self.metrics):
+                    records[m] = flat[:, j]
+                f.write(records.tobytes())
+            stats = self.run(sink)
+        with open(path + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'dtype': dtype.descr, 'devices': self.device_ids,
+                       'scenario': self.scenario}, f, indent=2)
+        return stats
+
+    def write_sensor_log(self, sensor_log):
+        """Bulk-append straight into a SensorLog (the ingestion storage path)"""
+        scenario_index = sensor_log.scenarios.index(self.scenario) if self.scenario in sensor_log.scenarios else 0
+
+        def sink(device_ids, ts, values):
+            for d, device_id in enumerate(device_ids):
+                sensor_log.append_records(device_id, ts, values[:, d, :], scenario_index)
+        return self.run(sink)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic IoT sensor fleet')
+    parser.add_argument('--scenario', default='healthy_crop', choices=list(IOTSimulator.SCENARIOS))
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--interval', type=float, default=60, help='seconds between readings')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--fault-rate', type=float, default=0.0005)
+    parser.add_argument('--format', choices=['ndjson', 'binary', 'log'], default='ndjson')
+    parser.add_argument('--out', required=True, help='output file, or sensor log directory for --format log')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    generator = FleetGenerator(args.scenario, args.devices, args.hours, args.interval,
+                               seed=args.seed, fault_rate=args.fault_rate)
+
+    if args.format == 'ndjson':
+        stats = generator.write_ndjson(args.out)
+    elif args.format == 'binary':
+        stats = generator.write_binary(args.out)
+    else:
+        from .sensor_log import SensorLog
+        os.makedirs(args.out, exist_ok=True)
+        log = SensorLog(args.out, IOTSimulator.METRICS, list(IOTSimulator.SCENARIOS))
+        stats = generator.write_sensor_log(log)
+        log.close()
+    print(json.dumps(stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""
+Forest Compiler
+Flattens a fitted scikit-learn random forest into contiguous NumPy node
+arrays, evaluates it with a vectorized level-by-level traversal and
+persists it as a memory-mappable, checksummed artifact directory
+"""
+
+import os
+import sys
+import json
+import pickle
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LEAF = -1
+
+# Artifact layout version; bump when the arrays or metadata change meaning
+ARTIFACT_FORMAT = 1
+METADATA_FILE = 'metadata.json'
+ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots', 'depths')
+
+
+class ArtifactError(ValueError):
+    """Compiled model artifact is missing, incompatible or corrupt"""
+
+
+def _sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CompiledForest:
+    """Tree ensemble stored as flat node arrays; needs only NumPy to serve.
+
+    All trees share one node index space: ``roots[t]`` is the first node
+    of tree ``t``. For every node ``feature``/``threshold`` give the split
+    (samples go right when ``x[feature] > threshold``), ``children`` holds
+    the (left, right) node ids and ``value`` the normalized class
+    distribution. Leaves point to themselves and have an infinite
+    threshold, so a traversal can run a fixed number of steps with no
+    branching and finished trees simply stay put.
+
+    ``predict_proba`` mirrors ``RandomForestClassifier.predict_proba``:
+    inputs are cast to float32 before comparison like sklearn does, and
+    per-tree probabilities are summed in tree order before averaging, so
+    results match bit for bit.
+
+    Node arrays are kept in the dtypes the traversal indexes with, so a
+    forest loaded with ``load(..., mmap=True)`` serves straight from the
+    mapped files without private copies.
+    """
+
+    # Up to this many samples all trees advance together level by level;
+    # larger batches walk one tree at a time over every sample.
+    SMALL_BATCH = 64
+
+    def __init__(self, feature, threshold, children, value, roots, depths, classes,
+                 n_features, feature_names=None, metadata=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.depths = depths
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.metadata = metadata or {}
+        self.max_depth = int(depths.max()) if len(depths) else 0
+
+        # Index-typed views used by the traversal loops (no copy when the
+        # arrays already are intp, as compiled and saved)
+        self._feature = np.asarray(feature, dtype=np.intp)
+        self._next = np.asarray(children, dtype=np.intp).reshape(-1)  # node * 2 + go_right
+        self._roots = np.asarray(roots, dtype=np.intp)
+
+    @property
+    def version(self):
+        return self.metadata.get('version')
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted RandomForestClassifier / ExtraTreesClassifier"""
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators or not hasattr(estimators[0], 'tree_'):
+            raise TypeError(f"Expected a fitted tree ensemble, got {type(model).__name__}")
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise TypeError('Multi-output forests are not supported')
+
+        features, thresholds, children, values, roots, depths = [], [], [], [], [], []
+        offset = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            n = tree.node_count
+            ids = np.arange(n, dtype=np.intp) + offset
+            leaf = tree.children_left == LEAF
+
+            left = np.where(leaf, ids, tree.children_left + offset).astype(np.intp)
+            right = np.where(leaf, ids, tree.children_right + offset).astype(np.intp)
+            features.append(np.where(leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            children.append(np.stack([left, right], axis=1))
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            depths.append(tree.max_depth)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.ascontiguousarray(np.concatenate(children)),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.array(roots, dtype=np.intp),
+            depths=np.array(depths, dtype=np.intp),
+            classes=np.asarray(model.classes_),
+            n_features=model.n_features_in_,
+            feature_names=getattr(model, 'feature_names_in_', None),
+        )
+
+    def _prepare(self, X):
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        # float32 like sklearn's tree input, widened once so the comparisons
+        # against float64 thresholds don't convert on every level
+        return X.astype(np.float32).astype(np.float64)
+
+    def _apply_levels(self, X):
+        """All trees for a few samples, one level per step -> (n, n_trees)"""
+        if len(X) == 1:
+            x = X[0]
+            nodes = self._roots
+            for _ in range(self.max_depth):
+                nodes = self._next[2 * nodes + (x[self._feature[nodes]] > self.threshold[nodes])]
+            return nodes.reshape(1, -1)
+
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self._roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            nodes = self._next[2 * nodes + (X[rows, self._feature[nodes]] > self.threshold[nodes])]
+        return nodes
+
+    def _apply_tree(self, flat, column, t):
+        """Leaf of tree ``t`` for every sample -> (n,)
+
+        ``flat`` is the feature-major (transposed, raveled) input and
+        ``column`` the sample index, so one gather fetches each split value.
+        """
+        n = len(column)
+        nodes = np.full(n, self._roots[t])
+        for _ in range(self.depths[t]):
+            go_right = flat[self._feature[nodes] * n + column] > self.threshold[nodes]
+            nodes = self._next[2 * nodes + go_right]
+        return nodes
+
+    def apply(self, X):
+        """Leaf node id per (sample, tree), shape (n_samples, n_trees)"""
+        X = self._prepare(X)
+        if len(X) <= self.SMALL_BATCH:
+            return self._apply_levels(X)
+        flat, column = np.ascontiguousarray(X.T).reshape(-1), np.arange(len(X))
+        return np.stack([self._apply_tree(flat, column, t) for t in range(self.n_trees)], axis=1)
+
+    def predict_proba(self, X):
+        """Mean of the per-tree leaf class distributions"""
+        X = self._prepare(X)
+        if len(X) <= self.SMALL_BATCH:
+            # Reducing over the tree axis adds tree by tree, matching sklearn
+            return np.add.reduce(self.value[self._apply_levels(X)], axis=1) / self.n_trees
+
+        flat, column = np.ascontiguousarray(X.T).reshape(-1), np.arange(len(X))
+        proba = np.zeros((len(X), self.value.shape[1]))
+        for t in range(self.n_trees):
+            proba += self.value[self._apply_tree(flat, column, t)]
+        return proba / self.n_trees
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def decision_paths(self, x):
+        """Node ids visited per tree for one sample, shape (max_depth + 1, n_trees)"""
+        x = self._prepare(x)[0]
+        nodes = self._roots
+        path = [nodes]
+        for _ in range(self.max_depth):
+            nodes = self._next[2 * nodes + (x[self._feature[nodes]] > self.threshold[nodes])]
+            path.append(nodes)
+        return np.stack(path)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path, source=None):
+        """Write the forest as an artifact directory; returns its metadata.
+
+        Each node array is a ``<name>.<version>.npy`` file; ``metadata.json``
+        holds the class labels, feature order, shapes, dtypes and SHA-256
+        of every array. A save never overwrites the arrays of another
+        version: the new files are complete before the metadata is renamed
+        into place, and that rename is the switch-over. A loader therefore
+        reads either the old metadata and old arrays or the new ones, never
+        a mix. Arrays of the version before the previous one are deleted
+        (processes that still map them keep their unlinked files).
+        """
+        os.makedirs(path, exist_ok=True)
+        previous = self._referenced_files(path)
+
+        arrays, staged = {}, []
+        for name in ARRAYS:
+            array = np.ascontiguousarray(getattr(self, name))
+            tmp = os.path.join(path, f".{name}.npy.tmp")
+            with open(tmp, 'wb') as f:
+                np.save(f, array, allow_pickle=False)
+            staged.append((name, tmp))
+            arrays[name] = {
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'sha256': _sha256(tmp),
+            }
+
+        content = hashlib.sha256(
+            ''.join(arrays[name]['sha256'] for name in ARRAYS).encode('ascii'))
+        version = content.hexdigest()[:12]
+        for name, tmp in staged:
+            arrays[name]['file'] = f"{name}.{version}.npy"
+            os.replace(tmp, os.path.join(path, arrays[name]['file']))
+
+        metadata = {
+            'format': ARTIFACT_FORMAT,
+            'kind': 'random_forest_classifier',
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'source': source,
+            'classes': [str(c) for c in self.classes_],
+            'n_features': self.n_features_in_,
+            'feature_names': self.feature_names,
+            'n_trees': self.n_trees,
+            'n_nodes': self.n_nodes,
+            'max_depth': self.max_depth,
+            'arrays': arrays,
+        }
+        tmp = os.path.join(path, f".{METADATA_FILE}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp, os.path.join(path, METADATA_FILE))
+        self.metadata = metadata
+
+        keep = previous | {spec['file'] for spec in arrays.values()}
+        for filename in os.listdir(path):
+            if filename.endswith('.npy') and filename not in keep:
+                try:
+                    os.remove(os.path.join(path, filename))
+                except OSError as e:
+                    logger.warning(f"Could not remove old artifact file {filename}: {e}")
+        return metadata
+
+    @staticmethod
+    def _referenced_files(path):
+        """Array files named by the current metadata (empty if unreadable)"""
+        try:
+            with open(os.path.join(path, METADATA_FILE)) as f:
+                return {spec['file'] for spec in json.load(f)['arrays'].values()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return set()
+
+    @classmethod
+    def load(cls, path, mmap=True, verify=True):
+        """Load an artifact directory written by ``save``.
+
+        With ``mmap`` the arrays are memory-mapped read-only, so loading
+        is near-instant and every process on the host shares the same
+        page-cache pages. ``verify`` checks each file's SHA-256 against the
+        metadata first. Raises ArtifactError if anything does not match.
+        """
+        try:
+            with open(os.path.join(path, METADATA_FILE)) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ArtifactError(f"Cannot read artifact metadata in {path}: {e}") from e
+        if metadata.get('format') != ARTIFACT_FORMAT:
+            raise ArtifactError(f"Unsupported artifact format {metadata.get('format')!r} in {path}")
+
+        try:
+            arrays = {}
+            for name in ARRAYS:
+                spec = metadata['arrays'][name]
+                filename = os.path.join(path, spec['file'])
+                if verify and _sha256(filename) != spec['sha256']:
+                    raise ArtifactError(f"Checksum mismatch for {filename}")
+                # allow_pickle stays off: artifacts hold plain numeric arrays only
+                array = np.load(filename, mmap_mode='r' if mmap else None, allow_pickle=False)
+                if array.dtype.str != spec['dtype'] or list(array.shape) != spec['shape']:
+                    raise ArtifactError(f"{filename} does not match its metadata")
+                arrays[name] = array
+
+            return cls(
+                classes=np.array(metadata['classes'], dtype=object),
+                n_features=metadata['n_features'],
+                feature_names=metadata.get('feature_names'),
+                metadata=metadata,
+                **arrays,
+            )
+        except ArtifactError:
+            raise
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            # Missing or truncated files, incomplete metadata: callers fall
+            # back on ArtifactError, so nothing else may escape
+            raise ArtifactError(f"Cannot load artifact {path}: {e!r}") from e
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compile a pickled random forest into a model artifact')
+    parser.add_argument('model', help='pickled sklearn forest, e.g. models/crop_model.pkl')
+    parser.add_argument('out', help='artifact directory, e.g. models/crop_forest')
+    parser.add_argument('--features', help='comma-separated feature order recorded in the metadata '
+                                           '(default: the model\'s feature_names_in_)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    with open(args.model, 'rb') as f:
+        model = pickle.load(f)
+    forest = CompiledForest.from_sklearn(model)
+    if args.features:
+        names = [name.strip() for name in args.features.split(',')]
+        if len(names) != forest.n_features_in_:
+            parser.error(f"--features lists {len(names)} names, the model has {forest.n_features_in_}")
+        forest.feature_names = names
+    metadata = forest.save(args.out, source=os.path.basename(args.model))
+    logger.info(f"Compiled {forest.n_trees} trees, {forest.n_nodes} nodes, "
+                f"depth {forest.max_depth} -> {args.out} (version {metadata['version']})")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
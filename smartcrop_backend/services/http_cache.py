@@ -0,0 +1,229 @@
+"""
+HTTP Caching
+Response compression (gzip, brotli when installed) and strong ETags with
+304 handling for endpoints whose data rarely changes
+"""
+
+import gzip
+import json
+import zlib
+import marshal
+import hashlib
+import logging
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Content-Encoding -> ETag suffix; the same data compressed is another representation
+ENCODING_SUFFIXES = {'br': '-br', 'gzip': '-gz'}
+
+COMPRESSIBLE_TYPES = frozenset((
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+))
+
+
+def content_version(obj):
+    """Version string of static data (a dict or list defined in code)"""
+    payload = json.dumps(obj, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def _base_tag(tag):
+    """ETag with any content-coding suffix removed"""
+    for suffix in ENCODING_SUFFIXES.values():
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def conditional(version, max_age=0):
+    """
+    Strong ETag and If-None-Match handling for a GET view
+
+    ``version()`` returns a string that changes whenever the data behind
+    the view does (a row count and last update time, a content hash);
+    it must be much cheaper than building the response. The ETag hashes
+    it with the request path, the query string and the view's own code,
+    so a deploy that changes the view's output also changes the tag
+    without the data moving. A matching If-None-Match is answered with a
+    bodyless 304 before the view runs, so repeat fetches cost neither the
+    query nor the serialization. ``max_age`` > 0 additionally lets
+    clients reuse the response for that many seconds without asking.
+    """
+    def decorator(view):
+        code = view.__code__
+        salt = hashlib.sha256(marshal.dumps((code.co_code, code.co_consts, code.co_names)))
+        salt = salt.hexdigest()[:16]
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            query = sorted(request.args.items(multi=True))
+            key = json.dumps([salt, str(version()), request.path, query]).encode('utf-8')
+            tag = hashlib.sha256(key).hexdigest()[:32]
+            cache_control = f"max-age={max_age}" if max_age > 0 else 'no-cache'
+
+            candidates = request.if_none_match
+            matched = None
+            if candidates:
+                matched = tag if candidates.star_tag else next(
+                    (t for t in candidates.as_set(include_weak=True) if _base_tag(t) == tag), None)
+            if matched is not None:
+                # Echo the client's tag: it carries the encoding it was sent with
+                response = current_app.response_class(status=304)
+                response.set_etag(matched)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(tag)
+            response.headers['Cache-Control'] = cache_control
+            response.vary.add('Accept-Encoding')
+            return response
+        return wrapper
+    return decorator
+
+
+class Compressor:
+    """Compresses responses for clients that accept it.
+
+    Applied in ``after_request`` to successful text/JSON responses of at
+    least ``min_size`` bytes. Streamed responses (large batch results,
+    exports) are compressed chunk by chunk as they are sent, so they stay
+    streamed. Brotli is preferred when the
+    module is installed and the client ranks it at least as high as gzip.
+    Bodies with a strong ETag are compressed once and kept in a small LRU
+    keyed by (ETag, encoding), so a popular unchanged response is not
+    recompressed for every client. An ETag gets an encoding suffix, since
+    the compressed bytes are a different representation.
+    """
+
+    def __init__(self, app=None, min_size=1024, gzip_level=6, brotli_quality=5, cache_size=64):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.cache_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+
+    @property
+    def encodings(self):
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def _negotiate(self, accept):
+        best, best_q = None, 0
+        for encoding in self.encodings:
+            q = accept.quality(encoding)
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def _compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _compress_stream(self, chunks, encoding):
+        """Compress an iterable body incrementally; memory stays one chunk"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            compress, finish = compressor.process, compressor.finish
+        else:
+            # wbits 16+: gzip framing, with a zero mtime as in _compress
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            compress, finish = compressor.compress, compressor.flush
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                self.bytes_in += len(chunk)
+                out = compress(chunk)
+                if out:
+                    self.bytes_out += len(out)
+                    yield out
+            out = finish()
+            self.bytes_out += len(out)
+            yield out
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def after_request(self, response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers):
+            return response
+        if not (response.mimetype.startswith('text/') or response.mimetype in COMPRESSIBLE_TYPES):
+            return response
+        if response.mimetype == 'text/event-stream':
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self._negotiate(request.accept_encodings)
+        if encoding is not None and response.is_streamed:
+            # Size unknown up front; streams are large by construction
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Length', None)
+            self.compressed += 1
+            return response
+        if encoding is None or response.content_length is not None and \
+                response.content_length < self.min_size:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        etag, weak = response.get_etag()
+        # The length guards against a view reusing a tag for a different body
+        key = (etag, encoding, len(body)) if etag and not weak else None
+        compressed = None
+        if key is not None:
+            with self._lock:
+                compressed = self._cache.get(key)
+                if compressed is not None:
+                    self._cache.move_to_end(key)
+                    self.cache_hits += 1
+        if compressed is None:
+            compressed = self._compress(body, encoding)
+            if key is not None:
+                with self._lock:
+                    self._cache[key] = compressed
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        if len(compressed) >= len(body):
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag + ENCODING_SUFFIXES[encoding], weak=weak)
+        self.compressed += 1
+        self.bytes_in += len(body)
+        self.bytes_out += len(compressed)
+        return response
+
+    def stats(self):
+        return {
+            'encodings': self.encodings,
+            'min_size': self.min_size,
+            'compressed_responses': self.compressed,
+            'cache_hits': self.cache_hits,
+            'ratio': round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+        }
@@ -3,18 +3,92 @@ IoT Sensor Simulator Service
 Generates realistic IoT sensor data with comprehensive analytics and demo scenarios
 """
 
-import random
+import zlib
+import json
+import hashlib
 import logging
+import threading
 from datetime import datetime, timedelta
 from collections import deque
 import math
 
+import numpy as np
+
+from .sensor_stats import SensorStats
+from .timeseries_store import TimeSeriesStore
+from .sensor_rules import SensorRules
+
 logger = logging.getLogger(__name__)
 
 
+class SensorSnapshot:
+    """Immutable latest reading published by ``IOTSimulator.tick``.
+
+    Request handlers read the current snapshot without locking; the reading
+    dict and rendered alerts are shared and must be treated as read-only.
+    Alert dicts are rendered from the rule evaluation on first access.
+    """
+
+    __slots__ = ('device_id', 'version', 'reading', 'evaluation', 'created_at', '_alerts', '_etag')
+
+    def __init__(self, device_id, version, reading, evaluation):
+        object.__setattr__(self, 'device_id', device_id)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'reading', reading)
+        object.__setattr__(self, 'evaluation', evaluation)
+        object.__setattr__(self, 'created_at', reading['timestamp'])
+        object.__setattr__(self, '_alerts', None)
+        object.__setattr__(self, '_etag', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SensorSnapshot is immutable')
+
+    @property
+    def alerts(self):
+        if self._alerts is None:
+            object.__setattr__(self, '_alerts', tuple(self.evaluation.alerts()))
+        return self._alerts
+
+    @property
+    def etag(self):
+        """Hash of the reading (alerts are derived from it).
+
+        ``version`` is a per-process counter, so it cannot be used: gunicorn
+        workers each run their own simulator and would send the same tag
+        for different bodies.
+        """
+        if self._etag is None:
+            payload = json.dumps([self.device_id, self.reading], sort_keys=True).encode('utf-8')
+            object.__setattr__(self, '_etag', hashlib.sha256(payload).hexdigest()[:24])
+        return self._etag
+
+
+class SimulatedClock:
+    """Manually advanced clock for replayable, faster-than-real-time runs"""
+
+    def __init__(self, start=None, step=timedelta(minutes=1)):
+        self.now = start or datetime(2024, 1, 1)
+        self.step = step
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, delta=None):
+        self.now += delta if delta is not None else self.step
+        return self.now
+
+
 class IOTSimulator:
     """Simulates IoT sensor data with advanced analytics and scenario management"""
     
+    # Numeric sensor channels tracked by the analytics accumulators
+    METRICS = (
+        'nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity',
+        'ph', 'rainfall', 'soil_moisture', 'light_intensity',
+    )
+    
+    _BOUNDS = {}  # scenario -> (lows, highs) arrays, see _scenario_bounds
+    
     # Demo scenarios with realistic parameters
     SCENARIOS = {
         'healthy_crop': {
@@ -89,20 +163,44 @@ class IOTSimulator:
         },
     }
     
-    def __init__(self, scenario='healthy_crop'):
-        """Initialize IoT simulator with selected scenario"""
+    def __init__(self, scenario='healthy_crop', device_id='default', sensor_log=None,
+                 seed=None, clock=None):
+        """
+        Initialize IoT simulator with selected scenario
+        
+        Args:
+            seed: Optional integer seed. Each device gets its own
+                numpy Generator derived from (seed, device_id), so runs are
+                replayable and simulators never share RNG state.
+            clock: Optional zero-argument callable returning a datetime
+                (e.g. SimulatedClock); defaults to datetime.now
+        """
         self.scenario = scenario if scenario in self.SCENARIOS else 'healthy_crop'
+        self.device_id = device_id
+        self.seed = seed
+        self.rng = self._make_rng(seed, device_id)
+        self.clock = clock or datetime.now
+        self.sensor_log = sensor_log  # optional persistent SensorLog
+        self._log_day = None
         self.history = deque(maxlen=100)  # Keep last 100 readings
-        self.hourly_history = deque(maxlen=24)  # Keep last 24 hours
-        self.daily_history = deque(maxlen=30)  # Keep last 30 days
-        self.current_data = self._generate_sensor_data()
+        self.timeseries = TimeSeriesStore(self.METRICS, clock=self.clock)  # raw/minute/hour/day rollups
+        self.stats = SensorStats(self.METRICS, window=self.history.maxlen)
+        self.rules = SensorRules(self.METRICS)
+        self._tick_lock = threading.Lock()
+        self._version = 0
+        self.snapshot = None
+        self.tick()
         logger.info(f"IoT Simulator initialized with scenario: {self.scenario}")
     
     def set_scenario(self, scenario_name):
-        """Switch to different demo scenario"""
+        """Switch to different demo scenario
+        
+        Readings follow the new scenario from the next tick; callers that
+        want one immediately should tick through SensorIngestor, so the
+        reading reaches its listeners.
+        """
         if scenario_name in self.SCENARIOS:
             self.scenario = scenario_name
-            self.current_data = self._generate_sensor_data()
             logger.info(f"Scenario switched to: {scenario_name}")
             return True
         return False
@@ -118,101 +216,128 @@ class IOTSimulator:
             for name, info in self.SCENARIOS.items()
         }
     
+    @staticmethod
+    def _make_rng(seed, device_id):
+        """Independent Generator per device; unseeded uses fresh OS entropy"""
+        if seed is None:
+            return np.random.default_rng()
+        return np.random.default_rng([int(seed), zlib.crc32(str(device_id).encode('utf-8'))])
+    
+    def simulate(self, hours=24, interval=60):
+        """Generate ``hours`` of readings ``interval`` seconds apart.
+        
+        Requires a SimulatedClock; the clock is advanced between ticks so
+        simulated days are produced as fast as ticks can run.
+        """
+        if not isinstance(self.clock, SimulatedClock):
+            raise ValueError('simulate() requires a SimulatedClock')
+        
+        steps = int(hours * 3600 // interval)
+        for _ in range(steps):
+            self.clock.advance(timedelta(seconds=interval))
+            self.tick()
+        logger.info(f"Simulated {steps} readings ({hours}h at {interval}s)")
+        return self.snapshot
+    
+    @classmethod
+    def _scenario_bounds(cls, scenario):
+        """(lows, highs) arrays in METRICS order for a scenario, built once"""
+        bounds = cls._BOUNDS.get(scenario)
+        if bounds is None:
+            params = cls.SCENARIOS[scenario]
+            lows = np.array([params[m][0] for m in cls.METRICS], dtype=np.float64)
+            highs = np.array([params[m][1] for m in cls.METRICS], dtype=np.float64)
+            bounds = cls._BOUNDS[scenario] = (lows, highs)
+        return bounds
+    
     def _generate_sensor_data(self):
         """Generate realistic sensor data based on current scenario"""
         scenario_params = self.SCENARIOS[self.scenario]
         
-        def get_value(param):
-            min_val, max_val = scenario_params[param]
-            # Add realistic variation
-            base = random.uniform(min_val, max_val)
-            # Add time-based patterns (sine wave for daily cycle)
-            hour = datetime.now().hour
-            daily_variation = 0.05 * math.sin(hour * math.pi / 12)
-            return base * (1 + daily_variation)
+        now = self.clock()
+        # Realistic variation plus a time-based pattern (sine wave for daily cycle)
+        daily_variation = 0.05 * math.sin(now.hour * math.pi / 12)
+        lows, highs = self._scenario_bounds(self.scenario)
+        values = (self.rng.uniform(lows, highs) * (1 + daily_variation)).tolist()
+        reading = dict(zip(self.METRICS, values))
         
         return {
             'scenario': self.scenario,
             'crop': scenario_params['crop'],
             'stage': scenario_params['stage'],
-            'nitrogen': round(get_value('nitrogen'), 2),
-            'phosphorus': round(get_value('phosphorus'), 2),
-            'potassium': round(get_value('potassium'), 2),
-            'temperature': round(get_value('temperature'), 2),
-            'humidity': round(get_value('humidity'), 2),
-            'ph': round(get_value('ph'), 2),
-            'rainfall': round(get_value('rainfall'), 2),
-            'soil_moisture': round(get_value('soil_moisture'), 2),
-            'light_intensity': round(get_value('light_intensity'), 0),
-            'timestamp': datetime.now().isoformat()
+            'nitrogen': round(reading['nitrogen'], 2),
+            'phosphorus': round(reading['phosphorus'], 2),
+            'potassium': round(reading['potassium'], 2),
+            'temperature': round(reading['temperature'], 2),
+            'humidity': round(reading['humidity'], 2),
+            'ph': round(reading['ph'], 2),
+            'rainfall': round(reading['rainfall'], 2),
+            'soil_moisture': round(reading['soil_moisture'], 2),
+            'light_intensity': round(reading['light_intensity'], 0),
+            'timestamp': now.isoformat()
         }
     
-    def get_current_data(self):
-        """Get current sensor readings with analytics"""
+    @property
+    def current_data(self):
+        """Latest reading (read-only, shared with the snapshot)"""
+        return self.snapshot.reading
+    
+    def tick(self):
+        """Generate, record and publish a new reading; the only write path"""
         try:
-            self.current_data = self._generate_sensor_data()
-            self.history.append(self.current_data.copy())
-            
-            # Add hourly and daily summaries
-            if len(self.hourly_history) < 24:
-                self.hourly_history.append(self.current_data.copy())
-            
-            if len(self.daily_history) < 30:
-                self.daily_history.append(self.current_data.copy())
+            with self._tick_lock:
+                reading = self._generate_sensor_data()
+                self.history.append(reading)
+                self.stats.push(reading)
+                self.timeseries.ingest(reading)
+                self._persist(reading)
+                
+                self._version += 1
+                evaluation = self.rules.for_crop(reading['crop']).evaluate(reading)
+                self.snapshot = SensorSnapshot(self.device_id, self._version, reading, evaluation)
             
             logger.info("Sensor data updated")
-            return self.current_data
+            return self.snapshot
             
         except Exception as e:
             logger.error(f"Error generating sensor data: {str(e)}")
             raise
     
+    def get_current_data(self):
+        """Get current sensor readings from the latest snapshot (no side effects)"""
+        return self.snapshot.reading
+    
+    def _persist(self, reading):
+        """Append a reading to the on-disk log, running maintenance once a day
+        
+        Only the log's elected writer process persists: other workers'
+        simulators produce unrelated readings for the same device id.
+        """
+        if self.sensor_log is None or not self.sensor_log.is_writer():
+            return
+        try:
+            self.sensor_log.append(self.device_id, reading)
+            day = reading['timestamp'][:10]
+            if day != self._log_day:
+                self._log_day = day
+                self.sensor_log.maintain(self.clock())
+        except Exception as e:
+            logger.error(f"Error persisting sensor reading: {str(e)}")
+    
     def get_analytics(self):
         """Get comprehensive analytics and insights"""
         try:
-            # Ensure history is populated
-            if not self.history:
-                self.get_current_data()
-            
-            # Calculate statistics
-            metrics = {
-                'nitrogen': [],
-                'phosphorus': [],
-                'potassium': [],
-                'temperature': [],
-                'humidity': [],
-                'ph': [],
-                'rainfall': [],
-                'soil_moisture': [],
-                'light_intensity': [],
-            }
-            
-            for entry in self.history:
-                for key in metrics.keys():
-                    metrics[key].append(entry[key])
-            
             analytics = {
                 'crop': self.current_data.get('crop'),
                 'stage': self.current_data.get('stage'),
                 'scenario': self.scenario,
                 'health_score': self._calculate_health_score(),
                 'trend': self._calculate_trend(),
-                'metrics_summary': {},
+                'metrics_summary': self.stats.summary(),
                 'alerts': self.get_alerts(),
                 'recommendations': self._generate_recommendations(),
             }
             
-            # Calculate statistics for each metric
-            for metric, values in metrics.items():
-                if values:
-                    analytics['metrics_summary'][metric] = {
-                        'current': values[-1],
-                        'average': round(sum(values) / len(values), 2),
-                        'min': round(min(values), 2),
-                        'max': round(max(values), 2),
-                        'trend': self._metric_trend(metric, values),
-                    }
-            
             logger.info("Analytics calculated successfully")
             return analytics
             
@@ -223,52 +348,7 @@ class IOTSimulator:
     def _calculate_health_score(self):
         """Calculate overall crop health score (0-100)"""
         try:
-            if not self.history:
-                return 50
-            
-            current = self.history[-1]
-            score = 100
-            
-            # Nitrogen check (ideal: 100-150)
-            n = current['nitrogen']
-            if n < 50:
-                score -= 20
-            elif n < 80:
-                score -= 10
-            elif n > 200:
-                score -= 5
-            
-            # Moisture check (ideal: 55-70)
-            m = current['soil_moisture']
-            if m < 30:
-                score -= 15
-            elif m < 50:
-                score -= 8
-            elif m > 85:
-                score -= 10
-            
-            # Temperature check (ideal: 20-28)
-            t = current['temperature']
-            if t < 15 or t > 35:
-                score -= 10
-            elif t < 18 or t > 30:
-                score -= 5
-            
-            # Humidity check (ideal: 60-75)
-            h = current['humidity']
-            if h > 90:  # Disease risk
-                score -= 10
-            elif h < 40:  # Stress
-                score -= 8
-            
-            # pH check (ideal: 6.5-7.2)
-            p = current['ph']
-            if p < 5.5 or p > 8.0:
-                score -= 15
-            elif p < 6.0 or p > 7.5:
-                score -= 8
-            
-            return max(0, min(100, score))
+            return self.snapshot.evaluation.health_score()
             
         except Exception as e:
             logger.error(f"Error calculating health score: {str(e)}")
@@ -277,14 +357,14 @@ class IOTSimulator:
     def _calculate_trend(self):
         """Calculate overall trend: 'improving', 'stable', or 'declining'"""
         try:
-            if len(self.history) < 5:
+            if len(self.history) < 6:
                 return 'stable'
             
-            recent = [self.history[-1], self.history[-2], self.history[-3]]
-            older = [self.history[-5], self.history[-6]]
+            entries = [self.history[i] for i in (-1, -2, -3, -5, -6)]
+            scores = self._health_rules().evaluate(entries).health
             
-            recent_health = sum(self._calculate_health_score_for_entry(e) for e in recent) / 3
-            older_health = sum(self._calculate_health_score_for_entry(e) for e in older) / 2
+            recent_health = scores[:3].mean()
+            older_health = scores[3:].mean()
             
             diff = recent_health - older_health
             if diff > 5:
@@ -298,172 +378,38 @@ class IOTSimulator:
             logger.error(f"Error calculating trend: {str(e)}")
             return 'stable'
     
+    def _health_rules(self):
+        """Compiled rules for the current scenario's crop"""
+        return self.rules.for_crop(self.SCENARIOS[self.scenario]['crop'])
+    
     def _calculate_health_score_for_entry(self, entry):
         """Helper to calculate health score for a specific entry"""
-        score = 100
-        
-        n = entry.get('nitrogen', 100)
-        if n < 50: score -= 20
-        elif n < 80: score -= 10
-        elif n > 200: score -= 5
-        
-        m = entry.get('soil_moisture', 60)
-        if m < 30: score -= 15
-        elif m < 50: score -= 8
-        elif m > 85: score -= 10
-        
-        t = entry.get('temperature', 25)
-        if t < 15 or t > 35: score -= 10
-        elif t < 18 or t > 30: score -= 5
-        
-        h = entry.get('humidity', 70)
-        if h > 90: score -= 10
-        elif h < 40: score -= 8
-        
-        p = entry.get('ph', 6.8)
-        if p < 5.5 or p > 8.0: score -= 15
-        elif p < 6.0 or p > 7.5: score -= 8
-        
-        return max(0, min(100, score))
-    
-    def _metric_trend(self, metric, values):
-        """Calculate trend for a specific metric"""
-        if len(values) < 3:
-            return 'stable'
-        
-        recent_avg = sum(values[-3:]) / 3
-        older_avg = sum(values[-6:-3]) / 3 if len(values) >= 6 else recent_avg
-        
-        diff = recent_avg - older_avg
-        threshold = max(abs(recent_avg), abs(older_avg)) * 0.02
-        
-        if abs(diff) < threshold:
-            return 'stable'
-        return 'increasing' if diff > 0 else 'decreasing'
+        return self._health_rules().evaluate(entry).health_score()
     
     def _generate_recommendations(self):
         """Generate actionable recommendations based on current conditions"""
         try:
-            recommendations = []
-            current = self.history[-1] if self.history else {}
-            
-            # Nitrogen recommendation
-            n = current.get('nitrogen', 100)
-            if n < 50:
-                recommendations.append({
-                    'type': 'nutrient',
-                    'severity': 'critical',
-                    'message': f'Critical nitrogen deficiency ({n} mg/kg). Apply nitrogen fertilizer immediately.',
-                    'action': 'Increase nitrogen fertilizer application',
-                    'icon': '🧬'
-                })
-            elif n < 80:
-                recommendations.append({
-                    'type': 'nutrient',
-                    'severity': 'warning',
-                    'message': f'Low nitrogen levels ({n} mg/kg). Consider nitrogen supplementation.',
-                    'action': 'Plan nitrogen fertilizer application',
-                    'icon': '🧬'
-                })
-            
-            # Moisture recommendation
-            m = current.get('soil_moisture', 60)
-            if m < 30:
-                recommendations.append({
-                    'type': 'irrigation',
-                    'severity': 'critical',
-                    'message': f'Severe drought stress ({m}% moisture). Irrigate immediately.',
-                    'action': 'Activate irrigation system urgently',
-                    'icon': '💧'
-                })
-            elif m < 50:
-                recommendations.append({
-                    'type': 'irrigation',
-                    'severity': 'warning',
-                    'message': f'Soil moisture low ({m}%). Plan irrigation soon.',
-                    'action': 'Schedule irrigation in next 1-2 days',
-                    'icon': '💧'
-                })
-            elif m > 85:
-                recommendations.append({
-                    'type': 'irrigation',
-                    'severity': 'warning',
-                    'message': f'High soil moisture ({m}%). Risk of waterlogging.',
-                    'action': 'Ensure proper drainage, reduce irrigation',
-                    'icon': '💧'
-                })
-            
-            # Temperature recommendation
-            t = current.get('temperature', 25)
-            if t < 15 or t > 35:
-                recommendations.append({
-                    'type': 'climate',
-                    'severity': 'warning',
-                    'message': f'Temperature outside optimal range ({t}°C).',
-                    'action': 'Monitor temperature, consider protective measures',
-                    'icon': '🌡️'
-                })
-            
-            # Disease risk (high humidity + warm temp)
-            h = current.get('humidity', 70)
-            if h > 85 and t > 24:
-                recommendations.append({
-                    'type': 'disease',
-                    'severity': 'warning',
-                    'message': f'High disease risk (humidity {h}%, temp {t}°C). Monitor for fungal infections.',
-                    'action': 'Increase fungicide application, improve ventilation',
-                    'icon': '🦠'
-                })
-            
-            # pH recommendation
-            p = current.get('ph', 6.8)
-            if p < 5.5:
-                recommendations.append({
-                    'type': 'soil',
-                    'severity': 'critical',
-                    'message': f'Soil too acidic (pH {p}). Apply lime to raise pH.',
-                    'action': 'Apply agricultural lime',
-                    'icon': '⚗️'
-                })
-            elif p > 8.0:
-                recommendations.append({
-                    'type': 'soil',
-                    'severity': 'critical',
-                    'message': f'Soil too alkaline (pH {p}). Apply sulfur to lower pH.',
-                    'action': 'Apply elemental sulfur',
-                    'icon': '⚗️'
-                })
-            
-            # Light recommendation
-            l = current.get('light_intensity', 800)
-            if l < 300:
-                recommendations.append({
-                    'type': 'light',
-                    'severity': 'warning',
-                    'message': f'Low light intensity ({l} lux). May affect photosynthesis.',
-                    'action': 'Prune shading plants or improve ventilation',
-                    'icon': '☀️'
-                })
-            
-            if not recommendations:
-                recommendations.append({
-                    'type': 'general',
-                    'severity': 'info',
-                    'message': 'All conditions optimal. Continue monitoring.',
-                    'action': 'Maintain current practices',
-                    'icon': '✅'
-                })
-            
-            return recommendations
+            return self.snapshot.evaluation.recommendations()
             
         except Exception as e:
             logger.error(f"Error generating recommendations: {str(e)}")
             return []
     
-    def get_history(self, limit=10):
-        """Get sensor data history with metadata"""
+    def get_history(self, limit=10, start=None, end=None, device_id=None):
+        """Get sensor data history, range-read from the sensor log when available"""
         try:
-            history_list = list(self.history)[-limit:]
+            if self.sensor_log is not None:
+                device_id = device_id or self.device_id
+                if start or end:
+                    history_list = self.sensor_log.read_range(device_id, start, end, limit=limit)
+                else:
+                    history_list = self.sensor_log.read_latest(device_id, limit)
+                for entry in history_list:
+                    params = self.SCENARIOS.get(entry.get('scenario'), {})
+                    entry['crop'] = params.get('crop')
+                    entry['stage'] = params.get('stage')
+            else:
+                history_list = list(self.history)[-limit:] if limit > 0 else []
             logger.info(f"Retrieves {len(history_list)} sensor readings from history")
             return history_list
             
@@ -474,17 +420,21 @@ class IOTSimulator:
     def get_hourly_summary(self):
         """Get hourly summary of last 24 hours"""
         try:
-            if not self.hourly_history:
+            since = (self.clock() - timedelta(hours=24)).replace(minute=0, second=0, microsecond=0)
+            buckets = [b for b in self.timeseries.latest('hour', 24) if b[0] >= since]
+            if not buckets:
                 return []
             
+            scores = self._health_rules().evaluate([means for _, _, means in buckets]).health
             summaries = []
-            for entry in self.hourly_history:
+            for (start, count, means), score in zip(buckets, scores.tolist()):
                 summaries.append({
-                    'timestamp': entry['timestamp'],
-                    'temperature': entry['temperature'],
-                    'humidity': entry['humidity'],
-                    'soil_moisture': entry['soil_moisture'],
-                    'health_score': self._calculate_health_score_for_entry(entry),
+                    'timestamp': start.isoformat(),
+                    'readings': count,
+                    'temperature': round(means['temperature'], 2),
+                    'humidity': round(means['humidity'], 2),
+                    'soil_moisture': round(means['soil_moisture'], 2),
+                    'health_score': score,
                 })
             
             return summaries
@@ -496,18 +446,22 @@ class IOTSimulator:
     def get_daily_summary(self):
         """Get daily summary of last 30 days"""
         try:
-            if not self.daily_history:
+            since = (self.clock() - timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+            buckets = [b for b in self.timeseries.latest('day', 30) if b[0] >= since]
+            if not buckets:
                 return []
             
+            scores = self._health_rules().evaluate([means for _, _, means in buckets]).health
             summaries = []
-            for entry in self.daily_history:
+            for (start, count, means), score in zip(buckets, scores.tolist()):
                 summaries.append({
-                    'timestamp': entry['timestamp'],
-                    'temperature': entry['temperature'],
-                    'humidity': entry['humidity'],
-                    'soil_moisture': entry['soil_moisture'],
-                    'nitrogen': entry['nitrogen'],
-                    'health_score': self._calculate_health_score_for_entry(entry),
+                    'timestamp': start.isoformat(),
+                    'readings': count,
+                    'temperature': round(means['temperature'], 2),
+                    'humidity': round(means['humidity'], 2),
+                    'soil_moisture': round(means['soil_moisture'], 2),
+                    'nitrogen': round(means['nitrogen'], 2),
+                    'health_score': score,
                 })
             
             return summaries
@@ -516,25 +470,23 @@ class IOTSimulator:
             logger.error(f"Error generating daily summary: {str(e)}")
             return []
     
+    def get_timeseries(self, start, end=None, resolution=None, max_points=500):
+        """Get min/max/mean rollups for a time range from the best-fitting tier"""
+        try:
+            end = end or self.clock()
+            return self.timeseries.query(start, end, resolution=resolution, max_points=max_points)
+            
+        except Exception as e:
+            logger.error(f"Error querying sensor time series: {str(e)}")
+            raise
+    
     def get_average_data(self):
         """Get average of sensor data from history"""
         try:
             if not self.history:
-                return self.get_current_data()
-            
-            num_readings = len(self.history)
+                return dict(self.get_current_data())
             
-            avg_data = {
-                'nitrogen': round(sum(d['nitrogen'] for d in self.history) / num_readings, 2),
-                'phosphorus': round(sum(d['phosphorus'] for d in self.history) / num_readings, 2),
-                'potassium': round(sum(d['potassium'] for d in self.history) / num_readings, 2),
-                'temperature': round(sum(d['temperature'] for d in self.history) / num_readings, 2),
-                'humidity': round(sum(d['humidity'] for d in self.history) / num_readings, 2),
-                'ph': round(sum(d['ph'] for d in self.history) / num_readings, 2),
-                'rainfall': round(sum(d['rainfall'] for d in self.history) / num_readings, 2),
-                'soil_moisture': round(sum(d['soil_moisture'] for d in self.history) / num_readings, 2),
-                'light_intensity': round(sum(d['light_intensity'] for d in self.history) / num_readings, 0),
-            }
+            avg_data = self.stats.averages(precision={'light_intensity': 0})
             
             return avg_data
             
@@ -543,50 +495,5 @@ class IOTSimulator:
             raise
     
     def get_alerts(self):
-        """Get sensor alerts based on thresholds with severity levels"""
-        try:
-            alerts = []
-            data = self.current_data
-            
-            # Define thresholds with optimal ranges
-            thresholds = {
-                'nitrogen': {'min': 50, 'optimal_min': 100, 'optimal_max': 150, 'max': 200},
-                'phosphorus': {'min': 10, 'optimal_min': 45, 'optimal_max': 70, 'max': 100},
-                'potassium': {'min': 20, 'optimal_min': 80, 'optimal_max': 120, 'max': 200},
-                'temperature': {'min': 10, 'optimal_min': 20, 'optimal_max': 28, 'max': 35},
-                'humidity': {'min': 30, 'optimal_min': 60, 'optimal_max': 80, 'max': 90},
-                'ph': {'min': 5.5, 'optimal_min': 6.5, 'optimal_max': 7.2, 'max': 8.5},
-                'rainfall': {'min': 0, 'optimal_min': 5, 'optimal_max': 50, 'max': 300},
-                'soil_moisture': {'min': 30, 'optimal_min': 55, 'optimal_max': 70, 'max': 85}
-            }
-            
-            for sensor, threshold in thresholds.items():
-                value = data.get(sensor, 0)
-                
-                # Critical alerts
-                if value < threshold['min'] or value > threshold['max']:
-                    alerts.append({
-                        'sensor': sensor,
-                        'status': 'critical',
-                        'value': value,
-                        'optimal_range': f"{threshold['optimal_min']}-{threshold['optimal_max']}",
-                        'message': f'CRITICAL: {sensor} at {value} (optimal: {threshold["optimal_min"]}-{threshold["optimal_max"]})',
-                        'icon': '🔴'
-                    })
-                # Warning alerts
-                elif value < threshold['optimal_min'] or value > threshold['optimal_max']:
-                    alerts.append({
-                        'sensor': sensor,
-                        'status': 'warning',
-                        'value': value,
-                        'optimal_range': f"{threshold['optimal_min']}-{threshold['optimal_max']}",
-                        'message': f'WARNING: {sensor} at {value} (optimal: {threshold["optimal_min"]}-{threshold["optimal_max"]})',
-                        'icon': '🟡'
-                    })
-            
-            logger.info(f"Generated {len(alerts)} sensor alerts")
-            return alerts
-            
-        except Exception as e:
-            logger.error(f"Error generating alerts: {str(e)}")
-            raise
+        """Get sensor alerts for the current snapshot"""
+        return list(self.snapshot.alerts)
@@ -0,0 +1,247 @@
+"""
+JSON Provider
+Flask JSON provider backed by orjson (or ujson) when installed, with
+native NumPy support and streamed serialization of long lists
+"""
+
+import sys
+import json
+import time
+import logging
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+    # default= (needed for NumPy and dates) arrived in ujson 5
+    if int(ujson.__version__.split('.')[0]) < 5:
+        ujson = None
+except (ImportError, ValueError, AttributeError):
+    ujson = None
+
+logger = logging.getLogger(__name__)
+
+# List items encoded per streamed piece
+STREAM_CHUNK = 1000
+
+
+def _default(o):
+    """NumPy scalars and arrays as plain JSON, everything else as Flask does"""
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    return DefaultJSONProvider.default(o)
+
+
+def available_backends():
+    return [name for name, module in (('orjson', orjson), ('ujson', ujson)) if module] + ['json']
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider using the fastest installed encoder.
+
+    Output matches Flask's default provider: sorted keys, compact
+    separators (indented in debug mode), dates as HTTP dates, plus NumPy
+    scalars and arrays, so routes can return model output as is. Text is
+    emitted as UTF-8 rather than ``\\u`` escapes (``ensure_ascii`` is off),
+    which is what lets orjson be used at all. Anything the fast encoder
+    rejects, such as integers beyond 64 bits, is encoded with the stdlib
+    instead, so the backend never changes whether a response can be built.
+    """
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+
+    def __init__(self, app, backend=None):
+        super().__init__(app)
+        backends = available_backends()
+        if backend and backend not in backends:
+            logger.warning(f"⚠️ JSON backend {backend} is not installed, using {backends[0]}")
+            backend = None
+        self.backend = backend or backends[0]
+
+    def _encode(self, obj, indent=False):
+        """obj as UTF-8 JSON bytes"""
+        if self.backend == 'orjson':
+            # NumPy values go through default() like with the stdlib: orjson's
+            # own NumPy support prints float32 at float32 precision
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=self.default, option=option)
+            except TypeError:
+                pass
+        elif self.backend == 'ujson':
+            try:
+                return ujson.dumps(
+                    obj, default=self.default, ensure_ascii=self.ensure_ascii,
+                    sort_keys=self.sort_keys, escape_forward_slashes=False, indent=2 if indent else 0
+                ).encode('utf-8')
+            except (TypeError, OverflowError):
+                pass
+
+        layout = {'indent': 2} if indent else {'separators': (',', ':')}
+        return json.dumps(obj, default=self.default, ensure_ascii=self.ensure_ascii,
+                          sort_keys=self.sort_keys, **layout).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Caller wants stdlib options (cls, separators, ...)
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # the stdlib error message is the one clients expect
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent) + b'\n', mimetype=self.mimetype)
+
+    def iter_encode(self, obj, chunk_size=STREAM_CHUNK):
+        """
+        Compact JSON of obj in pieces
+
+        A list, or the long list values of a top-level dict, is encoded
+        ``chunk_size`` items at a time, so the first bytes can be sent
+        before the whole list is serialized and no single buffer holds
+        all of it. Joined, the pieces equal the non-streamed body.
+        """
+        if isinstance(obj, (list, tuple)):
+            yield from self._iter_list(obj, chunk_size)
+            return
+        if not isinstance(obj, dict):
+            yield self._encode(obj)
+            return
+
+        keys = sorted(obj) if self.sort_keys else list(obj)
+        yield b'{'
+        for i, key in enumerate(keys):
+            head = (b',' if i else b'') + self._encode(str(key)) + b':'
+            value = obj[key]
+            if isinstance(value, (list, tuple)) and len(value) > chunk_size:
+                yield head
+                yield from self._iter_list(value, chunk_size)
+            else:
+                yield head + self._encode(value)
+        yield b'}'
+
+    def _iter_list(self, items, chunk_size):
+        if not items:
+            yield b'[]'
+            return
+        yield b'['
+        for start in range(0, len(items), chunk_size):
+            chunk = self._encode(list(items[start:start + chunk_size]))
+            yield (b',' if start else b'') + chunk[1:-1]
+        yield b']'
+
+    def stream_response(self, obj, status=200, chunk_size=STREAM_CHUNK):
+        """Response whose body is produced by iter_encode while it is sent"""
+        def generate():
+            yield from self.iter_encode(obj, chunk_size)
+            yield b'\n'
+        return self._app.response_class(generate(), status=status, mimetype=self.mimetype)
+
+
+# ----------------------------------------------------------------------
+# Benchmark: python -m services.json_provider
+# ----------------------------------------------------------------------
+
+def _sample_payloads(rng):
+    """Payloads shaped like the largest API responses"""
+    states = ['Punjab', 'Maharashtra', 'Uttar Pradesh', 'Karnataka', 'Tamil Nadu']
+    commodities = ['Wheat', 'Rice', 'Cotton', 'Onion', 'Tomato', 'Soybean']
+    prices = [{
+        'commodity': commodities[i % len(commodities)],
+        'state': states[i % len(states)],
+        'mandi': f"Mandi {i % 97}",
+        'min_price': round(float(rng.uniform(1000, 2000)), 2),
+        'max_price': round(float(rng.uniform(2000, 3000)), 2),
+        'modal_price': round(float(rng.uniform(1500, 2500)), 2),
+        'arrivals_tonnes': int(rng.integers(1, 500)),
+        'unit': 'Rs/Quintal',
+        'date': '2024-11-0' + str(1 + i % 9),
+    } for i in range(500)]
+    schemes = [{
+        'id': i,
+        'name': f"Pradhan Mantri Scheme {i} (प्रधानमंत्री योजना)",
+        'category': ['Income Support', 'Insurance', 'Credit', 'Irrigation'][i % 4],
+        'description': 'Financial assistance of ₹6,000 per year to eligible farmer families, '
+                       'paid in three equal instalments directly into bank accounts. ' * 6,
+        'eligibility': ['Small and marginal farmers', 'Land records in own name', 'Aadhaar linked'],
+        'benefits': {'amount': 6000, 'frequency': 'yearly', 'mode': 'DBT'},
+        'url': f"https://www.myscheme.gov.in/schemes/scheme-{i}",
+    } for i in range(200)]
+    analysis = {
+        'color_analysis': {name: np.float64(rng.uniform(0, 100)) for name in
+                           ('red', 'green', 'blue', 'yellow_spots_ratio', 'brown_spots_ratio')},
+        'hsv_analysis': {name: np.float32(rng.uniform(0, 100)) for name in
+                         ('green_pct', 'yellow_pct', 'brown_pct', 'avg_saturation')},
+        'spot_analysis': {'spot_count': np.int64(42), 'coverage_percentage': np.float64(12.5)},
+        'histogram': rng.integers(0, 1000, 256),
+        'health_score': np.float64(71.25),
+    }
+    batch = [{'crop': commodities[i % 6].lower(), 'confidence': round(float(c), 4)}
+             for i, c in enumerate(rng.uniform(0, 1, 50000))]
+    return {'mandi_prices': {'success': True, 'count': len(prices), 'data': prices},
+            'schemes': {'success': True, 'schemes': schemes},
+            'disease_analysis': {'success': True, 'detailed_analysis': analysis},
+            'crop_batch': {'success': True, 'count': len(batch), 'results': batch}}
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    from flask import Flask
+
+    repeat = int(argv[0]) if argv else 20
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    stdlib.default = _default  # the stock provider fails on NumPy values
+    providers = [FastJSONProvider(app, backend) for backend in available_backends()]
+
+    print(f"{'payload':18} {'encoder':8} {'ms':>9} {'speedup':>8} {'KB':>8}  output")
+    for name, payload in _sample_payloads(np.random.default_rng(0)).items():
+        reference = stdlib.dumps(payload, separators=(',', ':'))
+        utf8 = stdlib.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        base = _best_of(lambda: stdlib.dumps(payload, separators=(',', ':')), repeat)
+        print(f"{name:18} {'flask':8} {base * 1e3:9.3f} {1:8.1f} {len(reference) / 1024:8.1f}  reference")
+        for provider in providers:
+            body = provider._encode(payload)
+            elapsed = _best_of(lambda: provider._encode(payload), repeat)
+            if body == utf8:
+                output = 'identical bytes (UTF-8)'
+            elif json.loads(body) == json.loads(reference):
+                output = 'same values, different number formatting'
+            else:
+                output = 'DIFFERENT'
+            streamed = b''.join(provider.iter_encode(payload, chunk_size=100)) == body
+            print(f"{name:18} {provider.backend:8} {elapsed * 1e3:9.3f} {base / elapsed:8.1f} "
+                  f"{len(body) / 1024:8.1f}  {output}{'' if streamed else ', STREAM MISMATCH'}")
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,187 @@
+"""
+Model Hot Reload
+Loads new model files in the background, warms them up and swaps the
+serving state atomically
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def file_signature(paths):
+    """(mtime_ns, size) per path, None for missing files"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except (OSError, TypeError):
+            signature.append(None)
+    return tuple(signature)
+
+
+def files_digest(paths, block_size=1 << 20):
+    """Short SHA-256 over the contents of the existing files, or None"""
+    digest = hashlib.sha256()
+    found = False
+    for path in paths:
+        if not path or not os.path.isfile(path):
+            continue
+        found = True
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12] if found else None
+
+
+class ModelBundle:
+    """Immutable serving state: a loaded model plus everything derived from it.
+
+    Services read ``reloader.bundle`` once per request and use only that
+    bundle, so a request that started before a reload finishes on the old
+    model while new requests pick up the new one. The parts (model object,
+    label lists, lookup tables, caches) are exposed as attributes and must
+    be treated as read-only, except for caches that belong to the bundle.
+    """
+
+    __slots__ = ('version', 'signature', 'loaded_at', 'load_seconds', '_parts')
+
+    def __init__(self, parts, version, signature, load_seconds):
+        object.__setattr__(self, '_parts', dict(parts))
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'signature', signature)
+        object.__setattr__(self, 'loaded_at', datetime.now().isoformat())
+        object.__setattr__(self, 'load_seconds', load_seconds)
+
+    def __getattr__(self, name):
+        try:
+            return self._parts[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ModelBundle is immutable')
+
+
+class HotReloader:
+    """Keeps a service's current ModelBundle up to date with its files.
+
+    ``load()`` builds the parts of a new bundle and returns
+    ``(parts, version)``; it raises on a broken file, in which case the
+    current bundle stays in service (or ``fallback()`` parts are used if
+    nothing was loaded yet). ``warm_up(bundle)`` runs the new model once
+    before it is published and may raise to reject it. Publishing is a
+    single attribute assignment, so readers never need a lock.
+    """
+
+    def __init__(self, name, files, load, warm_up=None, fallback=None):
+        self.name = name
+        self.files = files  # callable -> paths whose changes trigger a reload
+        self.load = load
+        self.warm_up = warm_up
+        self.fallback = fallback
+        self._bundle = None
+        self._failed_signature = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+    @property
+    def bundle(self):
+        return self._bundle
+
+    def changed(self):
+        current = self._bundle
+        return current is None or file_signature(self.files()) != current.signature
+
+    def reload(self, force=False):
+        """Load, warm up and publish a new bundle.
+
+        Returns a dict with ``reloaded`` and the serving ``version``; on
+        failure ``error`` describes why and the previous bundle is kept.
+        """
+        with self._reload_lock:
+            if not force and not self.changed():
+                return {'reloaded': False, 'version': self._bundle.version}
+
+            # Taken before loading: a change made while loading is picked up next time
+            signature = file_signature(self.files())
+            started = time.perf_counter()
+            try:
+                parts, version = self.load()
+                bundle = ModelBundle(parts, version, signature, 0.0)
+                if self.warm_up is not None:
+                    self.warm_up(bundle)
+            except Exception as e:
+                self.failures += 1
+                self._failed_signature = signature
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"❌ {self.name} model reload failed: {str(e)}")
+                if self._bundle is None and self.fallback is not None:
+                    self._bundle = ModelBundle(self.fallback(), None, signature, 0.0)
+                return {
+                    'reloaded': False,
+                    'version': self._bundle.version if self._bundle else None,
+                    'error': self.last_error,
+                }
+
+            elapsed = round(time.perf_counter() - started, 4)
+            object.__setattr__(bundle, 'load_seconds', elapsed)
+            previous = self._bundle
+            self._bundle = bundle
+            if previous is not None:
+                self.reloads += 1
+                logger.info(f"🔄 {self.name} model reloaded: {previous.version} -> {version} "
+                            f"({elapsed:.3f}s)")
+            self.last_error = None
+            return {'reloaded': True, 'version': version, 'load_seconds': elapsed}
+
+    def check(self):
+        """Reload if any watched file changed since the current bundle was loaded.
+
+        Files that already failed to load are not retried until they change again.
+        """
+        if self.changed() and file_signature(self.files()) != self._failed_signature:
+            return self.reload()
+        return None
+
+    def watch(self, interval):
+        """Poll the files every ``interval`` seconds on a daemon thread"""
+        if self._watcher is not None or not interval or interval <= 0:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.check()
+                except Exception as e:
+                    logger.error(f"❌ {self.name} model watcher error: {str(e)}")
+
+        self._watcher = threading.Thread(target=run, name=f"{self.name}-model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        self._watcher = None
+
+    def status(self):
+        bundle = self._bundle
+        return {
+            'version': bundle.version if bundle else None,
+            'loaded_at': bundle.loaded_at if bundle else None,
+            'load_seconds': bundle.load_seconds if bundle else None,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'watching': self._watcher is not None,
+        }
@@ -0,0 +1,191 @@
+"""
+Smart Recommendation Pipeline
+Combines the latest sensor snapshot, user overrides, crop prediction,
+disease-risk rules and market prices, with a short-lived result cache
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .crop_suitability import NoSuitableCrop
+
+logger = logging.getLogger(__name__)
+
+CROP_FEATURES = ('nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall')
+
+# Severity of the disease rules that fired -> overall risk level
+DISEASE_RISK_LEVELS = {'critical': 'high', 'warning': 'moderate'}
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl=30.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class RecommendationPipeline:
+    """Builds the smart recommendation for a field.
+
+    Inputs are the field's latest published sensor snapshot with any user
+    supplied values layered on top, so fields the client omits come from
+    the sensors rather than defaulting to 0. Crop prediction, disease-risk
+    rules and the market price lookup for the field's current crop run
+    concurrently on a shared thread pool; the recommended crop's price is
+    looked up as soon as the prediction is known. Composites are cached
+    per (field, crop model version, input hash) for ``ttl`` seconds, so a
+    model reload is not masked by older results, and price lookups per
+    commodity for ``price_ttl`` seconds.
+    """
+
+    def __init__(self, crop_recommender, sources, rules, price_lookup=None,
+                 ttl=15.0, price_ttl=300.0, max_workers=4):
+        self.crop_recommender = crop_recommender
+        self.sources = {source.device_id: source for source in sources}
+        self.default_field = next(iter(self.sources))
+        self.rules = rules
+        self.price_lookup = price_lookup
+        self.cache = TTLCache(ttl)
+        self.price_cache = TTLCache(price_ttl, max_entries=256)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recommend')
+
+    def _inputs(self, snapshot, overrides):
+        inputs = {m: snapshot.reading[m] for m in self.rules.metrics if m in snapshot.reading}
+        for key, value in (overrides or {}).items():
+            if key in inputs and value is not None:
+                inputs[key] = float(value)
+        return inputs
+
+    @staticmethod
+    def _input_hash(inputs):
+        payload = json.dumps(inputs, sort_keys=True).encode('utf-8')
+        return hashlib.sha1(payload).hexdigest()
+
+    def recommend(self, field_id=None, overrides=None):
+        """Composite recommendation dict; ``cached`` tells if it was reused"""
+        field_id = field_id or self.default_field
+        source = self.sources.get(field_id)
+        if source is None:
+            raise ValueError(f"Unknown field: {field_id}")
+
+        snapshot = source.snapshot
+        inputs = self._inputs(snapshot, overrides)
+        key = (field_id, self.crop_recommender.model_version, self._input_hash(inputs))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        current_crop = snapshot.reading.get('crop')
+        crop_future = self.executor.submit(
+            self.crop_recommender.predict, [inputs[f] for f in CROP_FEATURES])
+        risk_future = self.executor.submit(self._disease_risk, current_crop, inputs)
+        price_future = self.executor.submit(self._market_price, current_crop)
+
+        try:
+            crop_result = crop_future.result()
+        except NoSuitableCrop as e:
+            # Flag it rather than name an arbitrary crop (rule-based fallback only)
+            crop_result = {'crop': None, 'confidence': 0.0, 'unsuitable': str(e),
+                           'closest_crop': e.closest, 'out_of_range': e.limiting}
+        recommended = crop_result['crop']
+        if recommended is None:
+            recommended_future = None
+        elif recommended == current_crop:
+            recommended_future = price_future
+        else:
+            # Runs alongside the risk and current-crop lookups still in flight
+            recommended_future = self.executor.submit(self._market_price, recommended)
+
+        result = {
+            'field_id': field_id,
+            'recommendation': {
+                'crop': recommended,
+                'confidence': crop_result['confidence'],
+                'current_conditions': snapshot.reading,
+                **{k: crop_result[k] for k in ('unsuitable', 'closest_crop', 'out_of_range')
+                   if k in crop_result},
+            },
+            'inputs': inputs,
+            'overridden': sorted(k for k in (overrides or {}) if k in inputs),
+            'disease_risk': risk_future.result(),
+            'market': {
+                'current_crop': price_future.result(),
+                'recommended_crop': recommended_future.result() if recommended_future else None,
+            },
+            'snapshot_version': snapshot.version,
+            'generated_at': datetime.now().isoformat(),
+        }
+        self.cache.put(key, result)
+        return dict(result, cached=False)
+
+    def _disease_risk(self, crop, inputs):
+        """Risk level and advice from the disease-type sensor rules"""
+        evaluation = self.rules.for_crop(crop).evaluate(inputs)
+        advice = [r for r in evaluation.recommendations() if r['type'] == 'disease']
+        level = 'low'
+        for severity in ('warning', 'critical'):
+            if any(r['severity'] == severity for r in advice):
+                level = DISEASE_RISK_LEVELS[severity]
+        return {'level': level, 'crop': crop, 'advice': advice}
+
+    def _market_price(self, crop):
+        """Mandi price summary for a crop, or None when unavailable"""
+        if not crop or self.price_lookup is None:
+            return None
+        cached = self.price_cache.get(crop)
+        if cached is not None:
+            return cached or None
+
+        try:
+            comparison = self.price_lookup(crop)
+        except Exception as e:
+            logger.warning(f"⚠️ Market price lookup failed for {crop}: {str(e)}")
+            return None
+
+        summary = {}
+        if comparison.get('records'):
+            summary = {
+                'commodity': comparison.get('commodity', crop),
+                'stats': comparison['stats'],
+                'best_mandis': comparison['records'][:3],
+            }
+        # Cache misses too ({}), so unknown commodities are not re-queried
+        self.price_cache.put(crop, summary)
+        return summary or None
+
+    def stats(self):
+        return {'cache': self.cache.stats(), 'price_cache': self.price_cache.stats()}
@@ -0,0 +1,307 @@
+"""
+Sensor Data Export
+Constant-memory CSV / NDJSON / Arrow / Parquet / raw exports streamed
+from the persistent sensor log
+"""
+
+import io
+import os
+import sys
+import json
+import logging
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 10000
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+    'raw': 'application/octet-stream',
+}
+ARROW_FORMATS = ('arrow', 'parquet')
+
+# Cursor timestamps round-trip through ISO strings (microsecond precision)
+_CURSOR_EPSILON = 1e-6
+
+
+def available_formats():
+    """Formats usable in this environment (Arrow/Parquet need pyarrow)"""
+    return [f for f in MIMETYPES if pa is not None or f not in ARROW_FORMATS]
+
+
+def iter_chunks(sensor_log, devices=None, start=None, end=None, after=None,
+                after_device=None, chunk_rows=CHUNK_ROWS):
+    """Yield (device_id, records) with at most ``chunk_rows`` records each.
+
+    Devices are exported one after the other in the given (or sorted)
+    order, each oldest first. ``after``/``after_device`` is a resume
+    cursor: the timestamp and device of the last row already received.
+    Records are zero-copy slices of the memory-mapped segments.
+    """
+    devices = list(devices) if devices else sensor_log.devices()
+    if after_device in devices:
+        # Devices before the cursor are complete; only the cursor device is partial
+        devices = devices[devices.index(after_device):]
+    after_ts = after.timestamp() + _CURSOR_EPSILON if after else None
+
+    for device_id in devices:
+        resume = after_ts is not None and (after_device is None or device_id == after_device)
+        for records in sensor_log.iter_range(device_id, start, end):
+            if resume:
+                records = records[np.searchsorted(records['ts'], after_ts, side='right'):]
+            for offset in range(0, len(records), chunk_rows):
+                yield device_id, records[offset:offset + chunk_rows]
+
+
+def _columns(sensor_log, records):
+    """Python-level columns for text formats, rounded like the JSON API"""
+    timestamps = [datetime.fromtimestamp(t).isoformat() for t in records['ts'].tolist()]
+    metrics = [np.round(records[m].astype(np.float64), 2).tolist() for m in sensor_log.metrics]
+    if sensor_log.scenarios:
+        scenarios = [sensor_log.scenarios[s] for s in records['scenario'].tolist()]
+    else:
+        scenarios = [''] * len(records)
+    return timestamps, scenarios, metrics, records['samples'].tolist()
+
+
+def export_csv(sensor_log, **query):
+    """CSV text chunks: header first, then one block per record chunk"""
+    yield ','.join(['device_id', 'timestamp', 'scenario', *sensor_log.metrics, 'samples']) + '\n'
+    for device_id, records in iter_chunks(sensor_log, **query):
+        timestamps, scenarios, metrics, samples = _columns(sensor_log, records)
+        lines = []
+        for i, ts in enumerate(timestamps):
+            values = ['' if col[i] != col[i] else str(col[i]) for col in metrics]
+            lines.append(','.join([device_id, ts, scenarios[i], *values, str(samples[i])]))
+        yield '\n'.join(lines) + '\n'
+
+
+def export_ndjson(sensor_log, **query):
+    """One JSON object per reading; dropouts (NaN) become null"""
+    for device_id, records in iter_chunks(sensor_log, **query):
+        timestamps, scenarios, metrics, samples = _columns(sensor_log, records)
+        lines = []
+        for i, ts in enumerate(timestamps):
+            row = {'device_id': device_id, 'timestamp': ts, 'scenario': scenarios[i]}
+            for m, col in zip(sensor_log.metrics, metrics):
+                row[m] = None if col[i] != col[i] else col[i]
+            row['samples'] = samples[i]
+            lines.append(json.dumps(row))
+        yield '\n'.join(lines) + '\n'
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_schema(sensor_log):
+    return pa.schema(
+        [('device_id', pa.string()), ('timestamp', pa.timestamp('us')), ('scenario', pa.string())]
+        + [(m, pa.float32()) for m in sensor_log.metrics]
+        + [('samples', pa.uint16())]
+    )
+
+
+def _arrow_batch(sensor_log, schema, device_id, records):
+    scenarios = np.array(sensor_log.scenarios or [''], dtype=object)
+    columns = [
+        pa.array([device_id] * len(records), pa.string()),
+        pa.array((records['ts'] * 1e6).astype(np.int64), pa.timestamp('us')),
+        pa.array(scenarios[np.minimum(records['scenario'], len(scenarios) - 1)], pa.string()),
+    ]
+    columns += [pa.array(records[m], pa.float32()) for m in sensor_log.metrics]
+    columns.append(pa.array(records['samples'], pa.uint16()))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def export_arrow(sensor_log, **query):
+    """Arrow IPC stream, one record batch per chunk"""
+    if pa is None:
+        raise RuntimeError('Arrow export requires pyarrow')
+    schema = _arrow_schema(sensor_log)
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for device_id, records in iter_chunks(sensor_log, **query):
+            writer.write_batch(_arrow_batch(sensor_log, schema, device_id, records))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_parquet(sensor_log, **query):
+    """Parquet file, one row group per chunk; the footer arrives last"""
+    if pq is None:
+        raise RuntimeError('Parquet export requires pyarrow')
+    schema = _arrow_schema(sensor_log)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression='snappy') as writer:
+        for device_id, records in iter_chunks(sensor_log, **query):
+            writer.write_batch(_arrow_batch(sensor_log, schema, device_id, records))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def raw_length(sensor_log, device_id, start=None, end=None):
+    """Byte length of the raw export, computed from the segment index alone"""
+    count = sum(len(r) for r in sensor_log.iter_range(device_id, start, end))
+    return count * sensor_log.dtype.itemsize
+
+
+def export_raw(sensor_log, device_id, start=None, end=None, offset=0, length=None):
+    """Fixed-width records (``record_dtype``) for one device.
+
+    Rows have a fixed size, so any byte range maps straight onto record
+    offsets; ``offset``/``length`` serve HTTP Range requests and resumed
+    downloads without reading the skipped data.
+    """
+    remaining = np.inf if length is None else length
+    for records in sensor_log.iter_range(device_id, start, end):
+        size = len(records) * records.dtype.itemsize
+        if offset >= size:
+            offset -= size
+            continue
+        data = records.view(np.uint8)
+        for first in range(offset, size, CHUNK_ROWS * records.dtype.itemsize):
+            if remaining <= 0:
+                return
+            last = int(min(size, first + CHUNK_ROWS * records.dtype.itemsize, first + remaining))
+            yield data[first:last].tobytes()
+            remaining -= last - first
+        offset = 0
+
+
+EXPORTERS = {
+    'csv': export_csv,
+    'ndjson': export_ndjson,
+    'arrow': export_arrow,
+    'parquet': export_parquet,
+}
+
+
+def export(sensor_log, fmt, **query):
+    """Generator of str/bytes chunks for a CSV, NDJSON, Arrow or Parquet export"""
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt in ARROW_FORMATS and pa is None:
+        raise ValueError(f"Format '{fmt}' requires pyarrow, which is not installed")
+    return EXPORTERS[fmt](sensor_log, **query)
+
+
+def _resume_cursor(path, fmt):
+    """(after, after_device) from the last complete line of a partial text export"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 65536))
+        tail = f.read()
+
+    # Drop a torn last line so it is fetched again
+    complete = tail[:tail.rfind(b'\n') + 1]
+    if len(complete) < len(tail):
+        with open(path, 'rb+') as f:
+            f.truncate(size - (len(tail) - len(complete)))
+    lines = complete.decode('utf-8').splitlines()
+    if not lines or (fmt == 'csv' and lines[-1].startswith('device_id,')):
+        return None, None
+
+    if fmt == 'ndjson':
+        row = json.loads(lines[-1])
+        return datetime.fromisoformat(row['timestamp']), row['device_id']
+    device_id, timestamp = lines[-1].split(',')[:2]
+    return datetime.fromisoformat(timestamp), device_id
+
+
+def main(argv=None):
+    from .iot_service import IOTSimulator
+    from .sensor_log import SensorLog
+
+    parser = argparse.ArgumentParser(description='Export sensor readings from the sensor log')
+    parser.add_argument('--root', default='data/sensor_log', help='sensor log directory')
+    parser.add_argument('--device', action='append', help='device id (repeatable, default all)')
+    parser.add_argument('--start', help='ISO start timestamp')
+    parser.add_argument('--end', help='ISO end timestamp')
+    parser.add_argument('--format', choices=list(MIMETYPES), default='csv')
+    parser.add_argument('--out', help='output file (default stdout)')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue a partial csv/ndjson/raw export in --out')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    log = SensorLog(args.root, IOTSimulator.METRICS, list(IOTSimulator.SCENARIOS))
+    query = {
+        'start': datetime.fromisoformat(args.start) if args.start else None,
+        'end': datetime.fromisoformat(args.end) if args.end else None,
+    }
+
+    resuming = args.resume and args.out and os.path.exists(args.out) and os.path.getsize(args.out) > 0
+    if resuming and args.format in ARROW_FORMATS:
+        parser.error('--resume supports csv, ndjson and raw')
+
+    if args.format == 'raw':
+        if not args.device or len(args.device) != 1:
+            parser.error('raw export needs exactly one --device')
+        offset = os.path.getsize(args.out) if resuming else 0
+        offset -= offset % log.dtype.itemsize
+        chunks = export_raw(log, args.device[0], offset=offset, **query)
+    else:
+        query['devices'] = args.device
+        if resuming:
+            query['after'], query['after_device'] = _resume_cursor(args.out, args.format)
+        chunks = export(log, args.format, **query)
+        if resuming and args.format == 'csv':
+            next(chunks)  # header already written
+
+    if args.out:
+        out = open(args.out, 'ab' if resuming else 'wb')
+    else:
+        out = sys.stdout.buffer
+    written = 0
+    try:
+        if args.format == 'raw' and resuming:
+            out.truncate(offset)
+        for chunk in chunks:
+            data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            out.write(data)
+            written += len(data)
+    finally:
+        if args.out:
+            out.close()
+    logger.info(f"Exported {written} bytes ({args.format})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Sensor Ingestor
+Background fixed-tick loop that generates readings and notifies listeners
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SensorIngestor:
+    """Ticks every registered simulator on a fixed interval.
+
+    This is the only place new readings are produced; request handlers
+    just read ``simulator.snapshot``. Listeners are called as
+    ``listener(device_id, snapshot)`` after each tick; batch listeners get
+    the whole tick at once as ``listener(device_ids, snapshots)`` so they
+    can process every device in one vectorized pass.
+    """
+
+    def __init__(self, sources, interval=5.0):
+        self.sources = list(sources)
+        self.interval = interval
+        self.ticks = 0
+        self._listeners = []
+        self._batch_listeners = []
+        self._thread = None
+        self._stop = threading.Event()
+        # Serializes ticks from the loop and from request handlers, so
+        # listeners see each device's snapshots one at a time and in order
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def add_batch_listener(self, listener):
+        self._batch_listeners.append(listener)
+
+    def tick_once(self, sources=None):
+        """Advance every source (or just ``sources``) by one reading and notify listeners"""
+        with self._lock:
+            self._tick(self.sources if sources is None else sources)
+
+    def _tick(self, sources):
+        device_ids, snapshots = [], []
+        for source in sources:
+            snapshot = source.tick()
+            device_ids.append(source.device_id)
+            snapshots.append(snapshot)
+            for listener in self._listeners:
+                try:
+                    listener(source.device_id, snapshot)
+                except Exception as e:
+                    logger.error(f"Sensor listener error: {str(e)}")
+        for listener in self._batch_listeners:
+            try:
+                listener(device_ids, snapshots)
+            except Exception as e:
+                logger.error(f"Sensor batch listener error: {str(e)}")
+        self.ticks += 1
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    self.tick_once()
+                except Exception as e:
+                    logger.error(f"Sensor ingestor tick failed: {str(e)}")
+                self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='sensor-ingestor', daemon=True)
+        self._thread.start()
+        logger.info(f"Sensor ingestor started (interval {self.interval}s, {len(self.sources)} sources)")
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,410 @@
+"""
+Persistent Sensor Log
+Append-only, fixed-width segment files (one per device per day) with
+memory-mapped range reads, compaction and retention
+"""
+
+import os
+import re
+import mmap
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no POSIX locks; the dev server is one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RAW_SUFFIX = '.seg'
+COMPACT_SUFFIX = '.c.seg'
+_SEGMENT_RE = re.compile(r'^(\d{8})(\.c)?\.seg$')
+_DEVICE_RE = re.compile(r'[^A-Za-z0-9_.-]')
+WRITER_LOCK = '.writer.lock'
+
+
+def record_dtype(metrics):
+    """Fixed-width little-endian record layout for the given metric names"""
+    fields = [('ts', '<f8')]
+    fields += [(m, '<f4') for m in metrics]
+    # scenario index and number of raw samples folded into the record
+    fields += [('scenario', '<u2'), ('samples', '<u2')]
+    return np.dtype(fields)
+
+
+class SensorLog:
+    """On-disk sensor history, written by one process and read by all.
+
+    Layout is ``<root>/<device_id>/<YYYYMMDD>.seg``. Records are appended
+    with a single ``write`` on an ``O_APPEND`` descriptor, and must not be
+    older than the last record of their segment: reads binary-search the
+    timestamps, so appends that would unsort a segment raise ValueError. Every gunicorn
+    worker runs its own simulator, so live readings are only persisted
+    by the process that holds the ``.writer.lock`` file lock
+    (``is_writer``); the others serve reads. The lock is per process and
+    released when its holder exits, so another worker takes over on its
+    next tick. Readers map the
+    segment read-only and binary-search the timestamp column, which acts
+    as the index for range scans: nothing outside the requested range is
+    copied into Python.
+
+    Segments older than ``compact_after_days`` are rewritten as
+    ``<YYYYMMDD>.c.seg`` with one averaged record per ``compact_bucket``
+    seconds; segments older than ``retention_days`` are deleted.
+    """
+
+    def __init__(self, root, metrics, scenarios=(), retention_days=180,
+                 compact_after_days=7, compact_bucket=60):
+        self.root = root
+        self.metrics = tuple(metrics)
+        self.scenarios = list(scenarios)
+        self._scenario_index = {name: i for i, name in enumerate(self.scenarios)}
+        self.dtype = record_dtype(self.metrics)
+        self.retention_days = retention_days
+        self.compact_after_days = compact_after_days
+        self.compact_bucket = compact_bucket
+        self._fds = {}  # device_id -> [day, fd, last ts written]
+        self._lock_fd = None
+        self._lock_pid = None
+        self._writer = False
+        os.makedirs(self.root, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _safe_device(device_id):
+        return _DEVICE_RE.sub('_', str(device_id)) or 'default'
+
+    def _device_dir(self, device_id):
+        return os.path.join(self.root, self._safe_device(device_id))
+
+    def devices(self):
+        """List device ids that have any stored segments"""
+        return sorted(
+            d for d in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, d))
+        )
+
+    def _segment_files(self, device_id):
+        """Sorted list of (day, raw path or None, compacted path or None)"""
+        device_dir = self._device_dir(device_id)
+        if not os.path.isdir(device_dir):
+            return []
+
+        by_day = {}
+        for name in os.listdir(device_dir):
+            match = _SEGMENT_RE.match(name)
+            if not match:
+                continue
+            files = by_day.setdefault(match.group(1), [None, None])
+            files[match.group(2) is not None] = os.path.join(device_dir, name)
+        return [(day, raw, compacted) for day, (raw, compacted) in sorted(by_day.items())]
+
+    def segments(self, device_id):
+        """Sorted list of (day, path) for a device; compacted wins over raw.
+
+        A raw segment next to a compacted one is left over from an
+        interrupted compaction (its data is in the compacted file); it is
+        never read, and the next ``compact`` or ``apply_retention``
+        deletes it.
+        """
+        return [(day, compacted or raw) for day, raw, compacted in self._segment_files(device_id)]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _to_record(self, reading):
+        ts = reading['timestamp']
+        if not isinstance(ts, datetime):
+            ts = datetime.fromisoformat(ts)
+
+        record = np.zeros(1, dtype=self.dtype)
+        record['ts'] = ts.timestamp()
+        for m in self.metrics:
+            record[m] = reading.get(m, 0.0)
+        record['scenario'] = self._scenario_index.get(reading.get('scenario'), 0)
+        record['samples'] = 1
+        return ts, record
+
+    def _tail_ts(self, path):
+        """Timestamp of the last complete record in a segment (-inf if none)"""
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        size -= size % self.dtype.itemsize
+        if size == 0:
+            return -np.inf
+        with open(path, 'rb') as f:
+            f.seek(size - self.dtype.itemsize)
+            return float(np.frombuffer(f.read(self.dtype.itemsize), dtype=self.dtype)['ts'][0])
+
+    def _raw_path(self, device_id, day):
+        """Raw segment path for appends; a day that was compacted is closed"""
+        device_dir = self._device_dir(device_id)
+        if os.path.exists(os.path.join(device_dir, day + COMPACT_SUFFIX)):
+            raise ValueError(f"Segment {device_id}/{day} is already compacted")
+        return os.path.join(device_dir, day + RAW_SUFFIX)
+
+    def _slot_for(self, device_id, day):
+        cached = self._fds.get(device_id)
+        if cached and cached[0] == day:
+            return cached
+        path = self._raw_path(device_id, day)
+        if cached:
+            os.close(cached[1])
+            del self._fds[device_id]
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._fds[device_id] = slot = [day, fd, self._tail_ts(path)]
+        return slot
+
+    def append(self, device_id, reading):
+        """Append one reading dict to its day's segment for the device"""
+        ts, record = self._to_record(reading)
+        slot = self._slot_for(device_id, ts.strftime('%Y%m%d'))
+        ts = float(record['ts'][0])
+        if ts < slot[2]:
+            raise ValueError(f"Out-of-order reading for {device_id} at {reading['timestamp']}: "
+                             f"older than the last one stored")
+        os.write(slot[1], record.tobytes())
+        slot[2] = ts
+
+    def append_records(self, device_id, timestamps, values, scenario=0):
+        """Bulk-append time-ordered readings for one device.
+
+        ``timestamps`` is an (n,) epoch array and ``values`` an
+        (n, n_metrics) array in metric order. Records are split at local
+        midnight and each day's slice is written with one ``write`` call;
+        descriptors are not cached so many devices can be loaded at once.
+        Nothing is written if the batch is unsorted or starts before the
+        tail of a segment it extends (ValueError).
+        """
+        records = np.zeros(len(timestamps), dtype=self.dtype)
+        records['ts'] = timestamps
+        for j, m in enumerate(self.metrics):
+            records[m] = values[:, j]
+        records['scenario'] = scenario
+        records['samples'] = 1
+        ts = records['ts']
+        if len(ts) > 1 and not (ts[1:] >= ts[:-1]).all():
+            raise ValueError(f"Readings for {device_id} are not in time order")
+
+        slices = []
+        i = 0
+        while i < len(records):
+            first = datetime.fromtimestamp(ts[i])
+            midnight = first.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            j = int(np.searchsorted(ts, midnight.timestamp(), side='left'))
+            path = self._raw_path(device_id, first.strftime('%Y%m%d'))
+            if ts[i] < self._tail_ts(path):
+                raise ValueError(f"Readings for {device_id} start before the end of {os.path.basename(path)}")
+            slices.append((path, records[i:j]))
+            i = j
+
+        os.makedirs(self._device_dir(device_id), exist_ok=True)
+        for path, chunk in slices:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, chunk.tobytes())
+            finally:
+                os.close(fd)
+
+    def is_writer(self):
+        """Whether this process persists live readings; takes the role if it is free"""
+        if fcntl is None:
+            return True
+        if self._lock_pid != os.getpid():
+            # Forked from the process that opened the lock: POSIX record
+            # locks are not inherited, so this process owns nothing yet
+            self._lock_fd = os.open(os.path.join(self.root, WRITER_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+            self._lock_pid = os.getpid()
+            self._writer = False
+        if not self._writer:
+            try:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+            self._writer = True
+            logger.info(f"Sensor log writer is pid {os.getpid()}")
+        return True
+
+    def close(self):
+        for _, fd, _ in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+        if self._lock_fd is not None and self._lock_pid == os.getpid():
+            os.close(self._lock_fd)  # also releases the writer lock
+        self._lock_fd = self._lock_pid = None
+        self._writer = False
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def _map_segment(self, path):
+        """Read-only structured view over a segment file (may be empty)"""
+        size = os.path.getsize(path)
+        usable = size - size % self.dtype.itemsize  # ignore a torn tail record
+        if usable == 0:
+            return np.empty(0, dtype=self.dtype)
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), usable, access=mmap.ACCESS_READ)
+        return np.frombuffer(mm, dtype=self.dtype)
+
+    def iter_range(self, device_id, start=None, end=None):
+        """Yield structured-array slices of records in [start, end]"""
+        start_ts = start.timestamp() if start else -np.inf
+        end_ts = end.timestamp() if end else np.inf
+        first_day = start.strftime('%Y%m%d') if start else None
+        last_day = end.strftime('%Y%m%d') if end else None
+
+        for day, path in self.segments(device_id):
+            if (first_day and day < first_day) or (last_day and day > last_day):
+                continue
+            records = self._map_segment(path)
+            if not len(records):
+                continue
+            ts = records['ts']
+            lo = np.searchsorted(ts, start_ts, side='left')
+            hi = np.searchsorted(ts, end_ts, side='right')
+            if hi > lo:
+                yield records[lo:hi]
+
+    def read_range(self, device_id, start=None, end=None, limit=None):
+        """Reading dicts in [start, end], oldest first, at most ``limit``"""
+        out = []
+        if limit is not None and limit <= 0:
+            return out
+        for chunk in self.iter_range(device_id, start, end):
+            if limit is not None:
+                chunk = chunk[:limit - len(out)]
+            out.extend(self.to_dicts(chunk))
+            if limit is not None and len(out) >= limit:
+                break
+        return out
+
+    def read_latest(self, device_id, limit=10):
+        """The newest ``limit`` readings, oldest first, scanning segments backwards"""
+        chunks = []
+        remaining = limit
+        if remaining <= 0:
+            return []  # records[-0:] would be the whole segment
+        for _, path in reversed(self.segments(device_id)):
+            records = self._map_segment(path)
+            if not len(records):
+                continue
+            chunks.append(records[-remaining:])
+            remaining -= len(chunks[-1])
+            if remaining <= 0:
+                break
+
+        out = []
+        for chunk in reversed(chunks):
+            out.extend(self.to_dicts(chunk))
+        return out
+
+    def to_dicts(self, records):
+        """Convert a structured slice to API-shaped reading dicts"""
+        columns = {m: np.round(records[m].astype(np.float64), 2).tolist() for m in self.metrics}
+        timestamps = records['ts'].tolist()
+        scenarios = records['scenario'].tolist()
+        samples = records['samples'].tolist()
+
+        out = []
+        for i, ts in enumerate(timestamps):
+            reading = {'timestamp': datetime.fromtimestamp(ts).isoformat()}
+            if self.scenarios:
+                reading['scenario'] = self.scenarios[scenarios[i]]
+            for m in self.metrics:
+                reading[m] = columns[m][i]
+            if samples[i] > 1:
+                reading['samples'] = samples[i]
+            out.append(reading)
+        return out
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def _compact_segment(self, day, path):
+        records = np.sort(self._map_segment(path), order='ts')
+        if len(records):
+            buckets = (records['ts'] // self.compact_bucket).astype(np.int64)
+            keys, starts, counts = np.unique(buckets, return_index=True, return_counts=True)
+
+            compacted = np.zeros(len(keys), dtype=self.dtype)
+            weights = records['samples'].astype(np.float64)
+            compacted['ts'] = np.add.reduceat(records['ts'] * weights, starts) / \
+                np.add.reduceat(weights, starts)
+            for m in self.metrics:
+                compacted[m] = np.add.reduceat(records[m] * weights, starts) / \
+                    np.add.reduceat(weights, starts)
+            # keep the dominant (first) scenario of each bucket
+            compacted['scenario'] = records['scenario'][starts]
+            compacted['samples'] = np.minimum(
+                np.add.reduceat(records['samples'].astype(np.int64), starts), 0xFFFF)
+        else:
+            compacted = records
+
+        target = os.path.join(os.path.dirname(path), day + COMPACT_SUFFIX)
+        tmp = target + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(compacted.tobytes())
+        os.replace(tmp, target)
+        if path != target:
+            os.remove(path)
+        return len(records), len(compacted)
+
+    def compact(self, now=None):
+        """Downsample raw segments older than ``compact_after_days``"""
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=self.compact_after_days)).strftime('%Y%m%d')
+        compacted = 0
+        for device_id in self.devices():
+            for day, raw, done in self._segment_files(device_id):
+                if raw is None:
+                    continue
+                if done is not None:
+                    # Interrupted after the compacted file was written
+                    os.remove(raw)
+                    logger.info(f"Removed orphaned raw segment {device_id}/{day}")
+                    continue
+                if day >= cutoff:
+                    continue
+                before, after = self._compact_segment(day, raw)
+                compacted += 1
+                logger.info(f"Compacted {device_id}/{day}: {before} -> {after} records")
+        return compacted
+
+    def apply_retention(self, now=None):
+        """Delete segments older than ``retention_days``"""
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=self.retention_days)).strftime('%Y%m%d')
+        removed = 0
+        for device_id in self.devices():
+            for day, *paths in self._segment_files(device_id):
+                if day >= cutoff:
+                    continue
+                # Both files of the day, including a raw one orphaned by compaction
+                for path in filter(None, paths):
+                    os.remove(path)
+                removed += 1
+        if removed:
+            logger.info(f"Sensor log retention removed {removed} segments")
+        return removed
+
+    def maintain(self, now=None):
+        """Run compaction and retention; safe to call periodically"""
+        try:
+            return {
+                'compacted': self.compact(now),
+                'removed': self.apply_retention(now),
+            }
+        except Exception as e:
+            logger.error(f"Sensor log maintenance failed: {str(e)}")
+            return {'compacted': 0, 'removed': 0}
@@ -0,0 +1,319 @@
+"""
+Sensor Rule Engine
+Declarative alert, recommendation and health-score rules compiled into
+vectorized threshold comparisons
+"""
+
+import os
+import copy
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), '..', 'datasets', 'sensor_rules.json')
+
+ALERT_ICONS = {1: '🟡', 2: '🔴'}
+ALERT_STATUS = {1: 'warning', 2: 'critical'}
+ALERT_PREFIX = {1: 'WARNING', 2: 'CRITICAL'}
+
+CLAUSE_OPERATORS = frozenset(('gt', 'ge', 'lt', 'le', 'outside'))
+ALERT_KEYS = ('min', 'optimal_min', 'optimal_max', 'max')
+RECOMMENDATION_KEYS = ('type', 'severity', 'message', 'action', 'icon')
+
+
+def _check_clause(spec):
+    """Raise ValueError unless ``spec`` is a usable threshold clause"""
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError('empty or malformed condition')
+    unknown = set(spec) - CLAUSE_OPERATORS
+    if unknown:
+        raise ValueError(f"unknown operator {', '.join(sorted(unknown))}")
+    if 'outside' in spec and (not isinstance(spec['outside'], list) or len(spec['outside']) != 2):
+        raise ValueError("'outside' needs [low, high]")
+    _clause_bounds(spec)  # non-numeric thresholds raise here
+
+
+def _clause_bounds(spec):
+    """Turn {'lt': x, 'ge': y} / {'outside': [lo, hi]} into interval bounds.
+
+    Returns (lo, hi, lo_inclusive, hi_inclusive, negate): the clause holds
+    when the value lies inside the interval, or outside it when negated.
+    """
+    if 'outside' in spec:
+        lo, hi = spec['outside']
+        return float(lo), float(hi), True, True, True
+
+    lo, hi, lo_incl, hi_incl = -np.inf, np.inf, False, False
+    if 'gt' in spec:
+        lo, lo_incl = float(spec['gt']), False
+    if 'ge' in spec:
+        lo, lo_incl = float(spec['ge']), True
+    if 'lt' in spec:
+        hi, hi_incl = float(spec['lt']), False
+    if 'le' in spec:
+        hi, hi_incl = float(spec['le']), True
+    return lo, hi, lo_incl, hi_incl, False
+
+
+class _ClauseSet:
+    """A flat list of interval clauses evaluated in one NumPy pass"""
+
+    def __init__(self, columns, specs):
+        bounds = [_clause_bounds(spec) for spec in specs]
+        self.columns = np.asarray(columns, dtype=np.intp)
+        self.lo = np.array([b[0] for b in bounds], dtype=np.float64)
+        self.hi = np.array([b[1] for b in bounds], dtype=np.float64)
+        self.lo_incl = np.array([b[2] for b in bounds], dtype=bool)
+        self.hi_incl = np.array([b[3] for b in bounds], dtype=bool)
+        self.negate = np.array([b[4] for b in bounds], dtype=bool)
+
+    def evaluate(self, X):
+        """(n_samples, n_clauses) boolean matrix"""
+        if not len(self.columns):
+            return np.zeros((X.shape[0], 0), dtype=bool)
+        V = X[:, self.columns]
+        above = np.where(self.lo_incl, V >= self.lo, V > self.lo)
+        below = np.where(self.hi_incl, V <= self.hi, V < self.hi)
+        return (above & below) ^ self.negate
+
+
+class CompiledRules:
+    """One rule profile compiled to arrays; evaluates one reading or a batch.
+
+    Every section follows one policy: an entry that cannot be evaluated
+    (a metric that is not measured, an empty or malformed condition, a
+    missing key) is skipped with a warning naming it, and the rest of the
+    profile still applies.
+    """
+
+    def __init__(self, name, profile, metrics, defaults):
+        self.name = name
+        self.metrics = tuple(metrics)
+        self._col = {m: i for i, m in enumerate(self.metrics)}
+        self.defaults = np.array([float(defaults.get(m, 0.0)) for m in self.metrics])
+
+        # Alerts: critical outside [min, max], warning outside optimal range
+        alerts = {m: spec for m, spec in profile.get('alerts', {}).items()
+                  if self._usable('alerts', m, lambda: self._check_alert(m, spec))}
+        self.alert_sensors = list(alerts)
+        self.alert_cols = np.array([self._col[m] for m in self.alert_sensors], dtype=np.intp)
+        self.alert_min = np.array([alerts[m]['min'] for m in self.alert_sensors], dtype=np.float64)
+        self.alert_max = np.array([alerts[m]['max'] for m in self.alert_sensors], dtype=np.float64)
+        self.opt_min = np.array([alerts[m]['optimal_min'] for m in self.alert_sensors], dtype=np.float64)
+        self.opt_max = np.array([alerts[m]['optimal_max'] for m in self.alert_sensors], dtype=np.float64)
+        self.optimal_ranges = [
+            f"{alerts[m]['optimal_min']}-{alerts[m]['optimal_max']}" for m in self.alert_sensors
+        ]
+
+        # Health: per metric, first matching penalty band wins
+        self.health_bands = []  # (metric, clause offset, n bands, points array)
+        columns, specs = [], []
+        for metric, bands in profile.get('health', {}).items():
+            bands = [band for i, band in enumerate(bands or [])
+                     if self._usable('health', f"{metric}[{i}]", lambda: self._check_band(metric, band))]
+            if not bands:
+                continue
+            self.health_bands.append((
+                metric, len(specs), len(bands),
+                np.array([b['points'] for b in bands], dtype=np.float64),
+            ))
+            for band in bands:
+                columns.append(self._col[metric])
+                specs.append(band['when'])
+        self.health_clauses = _ClauseSet(columns, specs)
+
+        # Recommendations: each rule is an AND of per-metric clauses
+        self.recommendations = [
+            rule for i, rule in enumerate(profile.get('recommendations', []))
+            if self._usable('recommendations', f"#{i}", lambda: self._check_recommendation(rule))
+        ]
+        self.fallback = profile.get('fallback_recommendation')
+        columns, specs, starts = [], [], []
+        for rule in self.recommendations:
+            starts.append(len(specs))
+            for metric, spec in rule['when'].items():
+                columns.append(self._col[metric])
+                specs.append(spec)
+        self.rec_clauses = _ClauseSet(columns, specs)
+        self.rec_starts = np.array(starts, dtype=np.intp)
+
+    def _usable(self, section, entry, check):
+        try:
+            check()
+        except (ValueError, TypeError, KeyError) as e:
+            reason = f"missing {e}" if isinstance(e, KeyError) else str(e)
+            logger.warning(f"⚠️ Sensor rules {self.name}/{section}: skipping {entry}: {reason}")
+            return False
+        return True
+
+    def _check_metric(self, metric):
+        if metric not in self._col:
+            raise ValueError(f"unknown metric {metric!r}")
+
+    def _check_alert(self, metric, spec):
+        self._check_metric(metric)
+        for key in ALERT_KEYS:
+            float(spec[key])
+
+    def _check_band(self, metric, band):
+        self._check_metric(metric)
+        _check_clause(band['when'])
+        float(band['points'])
+
+    def _check_recommendation(self, rule):
+        when = rule['when']
+        if not isinstance(when, dict) or not when:
+            raise ValueError("'when' has no conditions")
+        for metric, spec in when.items():
+            self._check_metric(metric)
+            _check_clause(spec)
+        for key in RECOMMENDATION_KEYS:
+            rule[key]
+        try:
+            rule['message'].format(**dict.fromkeys(self.metrics, 0.0))
+        except (KeyError, IndexError) as e:
+            raise ValueError(f"message uses an unknown placeholder {e}") from None
+
+    def matrix(self, readings):
+        """Stack reading dicts into an (n, n_metrics) float matrix"""
+        if isinstance(readings, dict):
+            readings = [readings]
+        X = np.tile(self.defaults, (len(readings), 1))
+        for i, reading in enumerate(readings):
+            for m, j in self._col.items():
+                value = reading.get(m)
+                if value is not None:
+                    X[i, j] = value
+        return X
+
+    def evaluate(self, readings):
+        """Evaluate every rule for a reading dict, list of dicts or matrix"""
+        X = readings if isinstance(readings, np.ndarray) else self.matrix(readings)
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+
+        # Alerts: 0 ok, 1 warning, 2 critical
+        V = X[:, self.alert_cols]
+        critical = (V < self.alert_min) | (V > self.alert_max)
+        warning = (V < self.opt_min) | (V > self.opt_max)
+        alert_status = np.where(critical, 2, np.where(warning, 1, 0)).astype(np.int8)
+
+        # Health score
+        hits = self.health_clauses.evaluate(X)
+        penalty = np.zeros(X.shape[0])
+        for _, offset, count, points in self.health_bands:
+            band_hits = hits[:, offset:offset + count]
+            matched = band_hits.any(axis=1)
+            first = band_hits.argmax(axis=1)
+            penalty += np.where(matched, points[first], 0.0)
+        health = np.clip(100 - penalty, 0, 100).astype(np.int64)
+
+        # Recommendations
+        if len(self.rec_starts):
+            rec_hits = np.logical_and.reduceat(self.rec_clauses.evaluate(X), self.rec_starts, axis=1)
+        else:
+            rec_hits = np.zeros((X.shape[0], 0), dtype=bool)
+
+        return RuleEvaluation(self, X, alert_status, health, rec_hits)
+
+
+class RuleEvaluation:
+    """Raw evaluation arrays; dicts and messages are rendered on demand"""
+
+    def __init__(self, rules, X, alert_status, health, rec_hits):
+        self.rules = rules
+        self.X = X
+        self.alert_status = alert_status
+        self.health = health
+        self.rec_hits = rec_hits
+
+    def __len__(self):
+        return self.X.shape[0]
+
+    def health_score(self, i=0):
+        return int(self.health[i])
+
+    def alert_count(self, i=0):
+        return int(np.count_nonzero(self.alert_status[i]))
+
+    def alerts(self, i=0):
+        """Render alert dicts for row ``i``"""
+        rules = self.rules
+        out = []
+        for k in np.flatnonzero(self.alert_status[i]):
+            level = int(self.alert_status[i, k])
+            sensor = rules.alert_sensors[k]
+            value = self.X[i, rules.alert_cols[k]].item()
+            optimal = rules.optimal_ranges[k]
+            out.append({
+                'sensor': sensor,
+                'status': ALERT_STATUS[level],
+                'value': value,
+                'optimal_range': optimal,
+                'message': f'{ALERT_PREFIX[level]}: {sensor} at {value} (optimal: {optimal})',
+                'icon': ALERT_ICONS[level],
+            })
+        return out
+
+    def recommendations(self, i=0):
+        """Render recommendation dicts for row ``i``"""
+        rules = self.rules
+        values = dict(zip(rules.metrics, self.X[i].tolist()))
+        out = []
+        for k in np.flatnonzero(self.rec_hits[i]):
+            rule = rules.recommendations[k]
+            out.append({
+                'type': rule['type'],
+                'severity': rule['severity'],
+                'message': rule['message'].format(**values),
+                'action': rule['action'],
+                'icon': rule['icon'],
+            })
+        if not out and rules.fallback:
+            out.append(dict(rules.fallback))
+        return out
+
+
+class SensorRules:
+    """Rule table loaded from JSON; profiles are compiled once and cached.
+
+    The ``default`` profile applies to every crop. A profile named after a
+    crop (e.g. ``"Rice"``) is merged over it section by section, so crop
+    specific thresholds only need to list what differs.
+    """
+
+    def __init__(self, metrics, path=DEFAULT_RULES_PATH):
+        self.metrics = tuple(metrics)
+        self.path = path
+        with open(path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        self.defaults = table.get('defaults', {})
+        self.profiles = table.get('profiles', {})
+        self._compiled = {}
+        # Compile every profile now, so bad entries are reported at load time
+        for crop in set(self.profiles) | {'default'}:
+            self.for_crop(crop)
+        logger.info(f"✅ Sensor rules loaded: {len(self.profiles)} profiles")
+
+    def _merged_profile(self, crop):
+        profile = copy.deepcopy(self.profiles.get('default', {}))
+        override = self.profiles.get(crop) if crop else None
+        if override:
+            profile.setdefault('alerts', {}).update(override.get('alerts', {}))
+            profile.setdefault('health', {}).update(override.get('health', {}))
+            if 'recommendations' in override:
+                profile['recommendations'] = override['recommendations']
+            if 'fallback_recommendation' in override:
+                profile['fallback_recommendation'] = override['fallback_recommendation']
+        return profile
+
+    def for_crop(self, crop=None):
+        """Compiled rules for a crop, falling back to the default profile"""
+        key = crop if crop in self.profiles else 'default'
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = CompiledRules(key, self._merged_profile(crop), self.metrics, self.defaults)
+            self._compiled[key] = compiled
+        return compiled
@@ -0,0 +1,166 @@
+"""
+Streaming Sensor Statistics
+Incremental rolling-window accumulators used by the IoT analytics endpoints
+"""
+
+import math
+from collections import deque
+
+
+class RollingMetric:
+    """Sliding-window statistics for a single sensor metric.
+
+    Every push is O(1) amortised: mean/variance use Welford's update with
+    removal of the evicted sample, min/max use monotonic deques and the
+    trend compares a fast and a slow exponentially weighted moving average.
+    """
+
+    __slots__ = ('window', 'fast_alpha', 'slow_alpha', 'values', 'count_seen',
+                 'mean', 'm2', 'fast_ewma', 'slow_ewma', '_min_q', '_max_q')
+
+    def __init__(self, window=100, fast_alpha=0.5, slow_alpha=0.2):
+        self.window = window
+        self.fast_alpha = fast_alpha
+        self.slow_alpha = slow_alpha
+        self.values = deque()
+        self.count_seen = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.fast_ewma = None
+        self.slow_ewma = None
+        self._min_q = deque()  # (seq, value), values increasing
+        self._max_q = deque()  # (seq, value), values decreasing
+
+    def push(self, value):
+        """Add a new sample, evicting the oldest one once the window is full"""
+        value = float(value)
+        seq = self.count_seen
+        self.count_seen += 1
+
+        if len(self.values) == self.window:
+            self._remove(self.values[0])
+            self.values.popleft()
+        self.values.append(value)
+
+        # Welford add
+        n = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (value - self.mean)
+
+        # Monotonic deques for window min/max
+        oldest = seq - self.window
+        while self._min_q and self._min_q[-1][1] >= value:
+            self._min_q.pop()
+        self._min_q.append((seq, value))
+        while self._min_q[0][0] <= oldest:
+            self._min_q.popleft()
+
+        while self._max_q and self._max_q[-1][1] <= value:
+            self._max_q.pop()
+        self._max_q.append((seq, value))
+        while self._max_q[0][0] <= oldest:
+            self._max_q.popleft()
+
+        # EWMA trends
+        if self.fast_ewma is None:
+            self.fast_ewma = self.slow_ewma = value
+        else:
+            self.fast_ewma += self.fast_alpha * (value - self.fast_ewma)
+            self.slow_ewma += self.slow_alpha * (value - self.slow_ewma)
+
+    def _remove(self, value):
+        """Welford removal of a sample leaving the window"""
+        n = len(self.values)  # count before removal
+        if n <= 1:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / (n - 1)
+        self.m2 -= delta * (value - self.mean)
+        if self.m2 < 0:
+            self.m2 = 0.0
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    @property
+    def current(self):
+        return self.values[-1] if self.values else None
+
+    @property
+    def minimum(self):
+        return self._min_q[0][1] if self._min_q else None
+
+    @property
+    def maximum(self):
+        return self._max_q[0][1] if self._max_q else None
+
+    @property
+    def variance(self):
+        n = len(self.values)
+        return self.m2 / (n - 1) if n > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def trend(self, threshold_ratio=0.02):
+        """Return 'increasing', 'decreasing' or 'stable' from the EWMA spread"""
+        if len(self.values) < 3:
+            return 'stable'
+
+        diff = self.fast_ewma - self.slow_ewma
+        threshold = max(abs(self.fast_ewma), abs(self.slow_ewma)) * threshold_ratio
+
+        if abs(diff) < threshold:
+            return 'stable'
+        return 'increasing' if diff > 0 else 'decreasing'
+
+
+class SensorStats:
+    """Rolling statistics for every metric of a sensor reading"""
+
+    def __init__(self, metrics, window=100):
+        self.metrics = tuple(metrics)
+        self.window = window
+        self._stats = {metric: RollingMetric(window) for metric in self.metrics}
+
+    def __getitem__(self, metric):
+        return self._stats[metric]
+
+    def __len__(self):
+        return self._stats[self.metrics[0]].count if self.metrics else 0
+
+    def push(self, reading):
+        """Update all accumulators from one reading dict"""
+        for metric in self.metrics:
+            value = reading.get(metric)
+            if value is not None:
+                self._stats[metric].push(value)
+
+    def summary(self):
+        """Per-metric current/average/min/max/trend, O(metrics)"""
+        summary = {}
+        for metric, stat in self._stats.items():
+            if stat.count:
+                summary[metric] = {
+                    'current': stat.current,
+                    'average': round(stat.mean, 2),
+                    'min': round(stat.minimum, 2),
+                    'max': round(stat.maximum, 2),
+                    'std': round(stat.std, 2),
+                    'trend': stat.trend(),
+                }
+        return summary
+
+    def averages(self, precision=None):
+        """Window means keyed by metric, with optional per-metric rounding"""
+        precision = precision or {}
+        return {
+            metric: round(stat.mean, precision.get(metric, 2))
+            for metric, stat in self._stats.items()
+            if stat.count
+        }
@@ -0,0 +1,123 @@
+"""
+Live Sensor Stream Hub
+Fans readings from a single producer out to many Server-Sent Events clients
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Per-client mailbox holding at most one pending reading per device.
+
+    Publishing never blocks: a newer reading for a device replaces the
+    unsent one (coalescing), and once ``max_pending`` devices are queued
+    the oldest device's reading is dropped. Slow clients therefore always
+    catch up to the latest state instead of building an unbounded backlog.
+    """
+
+    def __init__(self, devices=None, max_pending=64):
+        self.devices = set(devices) if devices else None
+        self.max_pending = max_pending
+        self.coalesced = 0
+        self.dropped = 0
+        self.closed = False
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+
+    def wants(self, device_id):
+        return self.devices is None or device_id in self.devices
+
+    def offer(self, seq, device_id, reading):
+        with self._cond:
+            if self.closed:
+                return
+            if device_id in self._pending:
+                del self._pending[device_id]
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[device_id] = (seq, reading)
+            self._cond.notify()
+
+    def drain(self, timeout=None):
+        """Wait up to ``timeout`` seconds and return [(seq, device_id, reading)]"""
+        with self._cond:
+            if not self._pending and not self.closed:
+                self._cond.wait(timeout)
+            items = [(seq, device_id, reading)
+                     for device_id, (seq, reading) in self._pending.items()]
+            self._pending.clear()
+            return items
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+
+
+class SensorStreamHub:
+    """One producer, N cheap subscribers"""
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def subscribe(self, devices=None, max_pending=64):
+        sub = Subscription(devices, max_pending)
+        with self._lock:
+            self._subscribers = self._subscribers + [sub]
+        logger.info(f"Sensor stream subscriber added ({len(self._subscribers)} active)")
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.close()
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not sub]
+        logger.info(f"Sensor stream subscriber removed ({len(self._subscribers)} active)")
+
+    def on_snapshot(self, device_id, snapshot):
+        """SensorIngestor listener: publish every new snapshot"""
+        self.publish(device_id, snapshot.reading)
+
+    def publish(self, device_id, reading):
+        """Deliver a reading to every interested subscriber without blocking"""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            subscribers = self._subscribers  # copy-on-write list
+        for sub in subscribers:
+            if sub.wants(device_id):
+                sub.offer(seq, device_id, reading)
+        return seq
+
+    def stats(self):
+        subscribers = self._subscribers
+        return {
+            'subscribers': len(subscribers),
+            'published': self._seq,
+            'coalesced': sum(s.coalesced for s in subscribers),
+            'dropped': sum(s.dropped for s in subscribers),
+        }
+
+    def sse_events(self, sub, keepalive=15.0):
+        """Generator of Server-Sent Events frames for one subscription"""
+        try:
+            yield 'retry: 3000\n\n'
+            while not sub.closed:
+                items = sub.drain(timeout=keepalive)
+                if not items:
+                    yield ': keepalive\n\n'
+                    continue
+                for seq, device_id, reading in items:
+                    payload = json.dumps({'device_id': device_id, 'data': reading})
+                    yield f'id: {seq}\nevent: reading\ndata: {payload}\n\n'
+        finally:
+            self.unsubscribe(sub)
@@ -0,0 +1,372 @@
+"""
+Crop Suitability Maps
+Scores a grid of lat/lon soil and climate cells with the crop model across
+a process pool and writes resumable per-tile crop maps
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .crop_service import CropRecommender
+from .crop_suitability import DEFAULT_REQUIREMENTS_PATH
+from .model_reloader import file_signature
+
+logger = logging.getLogger(__name__)
+
+# Output layout version; bump when the tiles or manifest change meaning
+MAP_FORMAT = 2
+MANIFEST_FILE = 'manifest.json'
+GRID_FILE = 'grid.npy'
+
+# Grid columns: cell position, then the model inputs in CropRecommender order
+COLUMNS = ('lat', 'lon', *CropRecommender.FEATURES)
+COLUMN_ALIASES = {
+    'latitude': 'lat', 'longitude': 'lon', 'lng': 'lon',
+    'n': 'nitrogen', 'p': 'phosphorus', 'k': 'potassium',
+}
+
+# Cells per output tile (the unit of work and of resume)
+TILE_CELLS = 65536
+
+# Cells scored per model call inside a tile, bounding the traversal temporaries
+CHUNK_ROWS = 8192
+
+# Crop index of cells with missing inputs (masked out of the region)
+NODATA = -1
+# Crop index of cells no crop is suitable for (rule-based scoring only)
+UNSUITABLE = -2
+
+
+def load_grid(path, out_dir):
+    """
+    Open the input grid as a read-only (cells, 9) array in COLUMNS order
+
+    A ``.npy`` file is memory-mapped as is. A CSV file (header naming lat,
+    lon and the seven features; N/P/K and latitude/longitude are accepted)
+    is converted once into ``grid.npy`` in ``out_dir``, streaming rows so
+    the whole file is never held as Python objects; empty values become
+    NaN and mark the cell as no-data.
+    """
+    if path.endswith('.npy'):
+        grid = np.load(path, mmap_mode='r', allow_pickle=False)
+        if grid.ndim != 2 or grid.shape[1] != len(COLUMNS):
+            raise ValueError(f"{path}: expected a (cells, {len(COLUMNS)}) array with columns "
+                             f"{', '.join(COLUMNS)}, got shape {grid.shape}")
+        return grid
+
+    grid_path = os.path.join(out_dir, GRID_FILE)
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = [h.strip().lower() for h in next(reader, [])]
+        columns = [COLUMN_ALIASES.get(h, h) for h in header]
+        missing = [c for c in COLUMNS if c not in columns]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+        index = [columns.index(c) for c in COLUMNS]
+        n_cells = sum(1 for row in reader if row)
+
+        tmp = grid_path + '.tmp'
+        grid = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64,
+                                         shape=(n_cells, len(COLUMNS)))
+        f.seek(0)
+        next(reader)
+        i = 0
+        for row in reader:
+            if not row:
+                continue
+            grid[i] = [float(row[j]) if row[j].strip() else np.nan for j in index]
+            i += 1
+        grid.flush()
+        del grid
+    os.replace(tmp, grid_path)
+    logger.info(f"Converted {path} -> {grid_path} ({n_cells} cells)")
+    return np.load(grid_path, mmap_mode='r')
+
+
+# ----------------------------------------------------------------------
+# Worker side: one recommender and one grid mapping per process
+# ----------------------------------------------------------------------
+
+_worker = {}
+
+
+def _init_worker(grid_path, model_path, compiled_path, requirements_path):
+    _worker['grid'] = np.load(grid_path, mmap_mode='r')
+    # The compiled artifact is memory-mapped, so workers share its pages
+    _worker['recommender'] = CropRecommender(model_path, compiled_path, cache_size=0,
+                                             requirements_path=requirements_path)
+
+
+def _score_tile(index, start, stop, out_dir, version):
+    """Score cells [start, stop) and write tile ``index``; returns its manifest entry"""
+    started = time.perf_counter()
+    recommender = _worker['recommender']
+    cells = np.asarray(_worker['grid'][start:stop], dtype=np.float64)
+    X = cells[:, 2:]
+    valid = np.isfinite(X).all(axis=1)
+    rows = np.flatnonzero(valid)
+
+    labels, _, _, served = recommender.class_choices(X[:0])
+    if served != version:
+        raise RuntimeError(f"Crop model changed during the run ({version} -> {served})")
+
+    scores = np.full((len(cells), len(labels)), np.nan, dtype=np.float16)
+    crop = np.full(len(cells), NODATA, dtype=np.int16)
+    confidence = np.full(len(cells), np.nan, dtype=np.float16)
+    for offset in range(0, len(rows), CHUNK_ROWS):
+        chunk = rows[offset:offset + CHUNK_ROWS]
+        # Same choice as the API: ranking tie-break and min_score included
+        _, chunk_scores, choice, _ = recommender.class_choices(X[chunk])
+        scores[chunk] = chunk_scores
+        crop[chunk] = np.where(choice < 0, UNSUITABLE, choice)
+        # Unsuitable cells keep their best (sub-threshold) score
+        confidence[chunk] = chunk_scores.max(axis=1)
+
+    name = f"tile_{index:05d}.npz"
+    tmp = os.path.join(out_dir, name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(
+            f, lat=cells[:, 0].astype(np.float32), lon=cells[:, 1].astype(np.float32),
+            crop=crop, confidence=confidence, scores=scores
+        )
+    # Renamed into place: a tile file on disk is always complete
+    os.replace(tmp, os.path.join(out_dir, name))
+
+    suitable = rows[crop[rows] >= 0]
+    counts = np.bincount(crop[suitable], minlength=len(labels))
+    return {
+        'index': index,
+        'file': name,
+        'start': start,
+        'cells': stop - start,
+        'valid': len(rows),
+        'unsuitable': len(rows) - len(suitable),
+        'counts': [int(c) for c in counts],
+        'seconds': round(time.perf_counter() - started, 4),
+    }
+
+
+# ----------------------------------------------------------------------
+# Job
+# ----------------------------------------------------------------------
+
+class SuitabilityMapJob:
+    """Crop suitability map for a grid of cells, written as resumable tiles.
+
+    The grid is split into tiles of ``tile_cells`` consecutive cells that
+    are scored on a process pool, each worker mapping the grid and the
+    model artifact read-only, so memory stays bounded by a few tiles per
+    worker however large the grid is. Every tile is an ``.npz`` with
+    float32 ``lat``/``lon``, the ``crop`` index per cell (``NODATA`` where
+    inputs are missing, ``UNSUITABLE`` where no crop fits), its ``confidence`` and the float16 ``scores`` of
+    every crop; ``manifest.json`` lists the crops, the model version and
+    the finished tiles. It is rewritten after every tile, so a rerun with
+    the same input and model only scores the tiles still missing.
+    """
+
+    def __init__(self, grid_path, out_dir, model_path='models/crop_model.pkl',
+                 compiled_path='models/crop_forest', requirements_path=DEFAULT_REQUIREMENTS_PATH,
+                 tile_cells=TILE_CELLS, workers=None):
+        self.grid_path = grid_path
+        self.out_dir = out_dir
+        self.model_path = model_path
+        self.compiled_path = compiled_path
+        self.requirements_path = requirements_path
+        self.tile_cells = int(tile_cells)
+        self.workers = workers or os.cpu_count() or 1
+        if self.tile_cells <= 0:
+            raise ValueError('tile_cells must be positive')
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.out_dir, MANIFEST_FILE)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest):
+        manifest['updated_at'] = datetime.now().isoformat()
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def _new_manifest(self, signature, n_cells, crops, version):
+        return {
+            'format': MAP_FORMAT,
+            'kind': 'crop_suitability_map',
+            'created_at': datetime.now().isoformat(),
+            'input': {'path': os.path.abspath(self.grid_path), 'signature': signature},
+            'columns': list(COLUMNS),
+            'n_cells': n_cells,
+            'tile_cells': self.tile_cells,
+            'n_tiles': -(-n_cells // self.tile_cells),
+            'model_version': version,
+            'crops': crops,
+            'nodata': NODATA,
+            'unsuitable': UNSUITABLE,
+            'tiles': {},
+        }
+
+    def run(self, restart=False):
+        """
+        Score every tile not yet on disk; returns the final manifest
+
+        Raises ValueError when ``out_dir`` holds a map of another input,
+        model or tiling, unless ``restart`` discards it.
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        signature = [list(s) if s else None for s in file_signature([self.grid_path])]
+        manifest = self._read_manifest()
+        if manifest is not None and manifest['input']['signature'] != signature:
+            if not restart:
+                raise ValueError(f"{self.out_dir} holds a map of a different input; "
+                                 f"use restart to discard it")
+            manifest = None
+
+        grid_path = self.grid_path
+        if not grid_path.endswith('.npy'):
+            grid_path = os.path.join(self.out_dir, GRID_FILE)
+            if manifest is None or not os.path.exists(grid_path):
+                load_grid(self.grid_path, self.out_dir)
+        grid = load_grid(grid_path, self.out_dir)
+        n_cells = len(grid)
+
+        # Model identity from the parent's own load; workers must serve the same one
+        recommender = CropRecommender(self.model_path, self.compiled_path, cache_size=0,
+                                      requirements_path=self.requirements_path)
+        crops, _, _, version = recommender.class_choices(np.zeros((0, len(CropRecommender.FEATURES))))
+        del recommender
+
+        if manifest is not None and (manifest['model_version'] != version or
+                                     manifest['tile_cells'] != self.tile_cells or
+                                     manifest['format'] != MAP_FORMAT):
+            if not restart:
+                raise ValueError(f"{self.out_dir} was built with model {manifest['model_version']} "
+                                 f"and {manifest['tile_cells']}-cell tiles; use restart to discard it")
+            manifest = None
+        if manifest is None or restart:
+            manifest = self._new_manifest(signature, n_cells, crops, version)
+
+        done = {
+            int(i) for i, tile in manifest['tiles'].items()
+            if os.path.exists(os.path.join(self.out_dir, tile['file']))
+        }
+        manifest['tiles'] = {str(i): manifest['tiles'][str(i)] for i in sorted(done)}
+        todo = [i for i in range(manifest['n_tiles']) if i not in done]
+        self._write_manifest(manifest)
+        if done:
+            logger.info(f"Resuming: {len(done)} of {manifest['n_tiles']} tiles already done")
+
+        started = time.perf_counter()
+        scored, last_report = 0, started
+        for entry in self._execute(grid_path, todo, n_cells, version):
+            manifest['tiles'][str(entry['index'])] = entry
+            self._write_manifest(manifest)
+            scored += entry['cells']
+            now = time.perf_counter()
+            if now - last_report >= 5 or len(manifest['tiles']) == manifest['n_tiles']:
+                last_report = now
+                logger.info(f"Tiles {len(manifest['tiles'])}/{manifest['n_tiles']}: "
+                            f"{scored / (now - started):,.0f} cells/s")
+
+        elapsed = time.perf_counter() - started
+        counts = np.zeros(len(crops), dtype=np.int64)
+        for tile in manifest['tiles'].values():
+            counts += tile['counts']
+        manifest['crop_cells'] = {crop: int(c) for crop, c in zip(crops, counts)}
+        manifest['unsuitable_cells'] = sum(tile.get('unsuitable', 0) for tile in manifest['tiles'].values())
+        manifest['last_run'] = {
+            'tiles': len(todo),
+            'cells': scored,
+            'seconds': round(elapsed, 3),
+            'cells_per_second': round(scored / elapsed, 1) if elapsed > 0 and scored else None,
+            'workers': self.workers,
+        }
+        self._write_manifest(manifest)
+        logger.info(f"✅ Suitability map complete: {n_cells} cells in {manifest['n_tiles']} tiles "
+                    f"({scored} scored in {elapsed:.1f}s)")
+        return manifest
+
+    def _execute(self, grid_path, todo, n_cells, version):
+        """Yield the manifest entry of each tile as it finishes"""
+        tasks = [
+            (i, i * self.tile_cells, min((i + 1) * self.tile_cells, n_cells), self.out_dir, version)
+            for i in todo
+        ]
+        init_args = (grid_path, self.model_path, self.compiled_path, self.requirements_path)
+        if self.workers == 1 or len(tasks) <= 1:
+            _init_worker(*init_args)
+            for task in tasks:
+                yield _score_tile(*task)
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)),
+                                 initializer=_init_worker, initargs=init_args) as pool:
+            futures = [pool.submit(_score_tile, *task) for task in tasks]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+
+def read_map(out_dir, fields=('lat', 'lon', 'crop', 'confidence')):
+    """
+    Concatenate the finished tiles of a map
+
+    Returns (manifest, {field: array}) with cells in grid order; cells of
+    tiles not yet written are left out.
+    """
+    with open(os.path.join(out_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    parts = {field: [] for field in fields}
+    for _, tile in sorted(manifest['tiles'].items(), key=lambda item: int(item[0])):
+        with np.load(os.path.join(out_dir, tile['file'])) as data:
+            for field in fields:
+                parts[field].append(data[field])
+    return manifest, {field: np.concatenate(arrays) if arrays else np.zeros(0)
+                      for field, arrays in parts.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build a crop suitability map for a grid of cells')
+    parser.add_argument('grid', help=f"CSV or .npy grid with columns {', '.join(COLUMNS)}")
+    parser.add_argument('out', help='output directory for tiles and manifest.json')
+    parser.add_argument('--model', default='models/crop_model.pkl', help='pickled crop model')
+    parser.add_argument('--compiled', default='models/crop_forest', help='compiled model artifact')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPUs)')
+    parser.add_argument('--tile-cells', type=int, default=TILE_CELLS, help='cells per output tile')
+    parser.add_argument('--restart', action='store_true',
+                        help='discard an existing map in the output directory')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    job = SuitabilityMapJob(args.grid, args.out, model_path=args.model, compiled_path=args.compiled,
+                            tile_cells=args.tile_cells, workers=args.workers)
+    try:
+        manifest = job.run(restart=args.restart)
+    except ValueError as e:
+        parser.error(str(e))
+    run = manifest['last_run']
+    print(f"{manifest['n_cells']} cells, {run['cells']} scored in {run['seconds']}s "
+          f"({run['cells_per_second'] or 0:,.0f} cells/s) -> {args.out}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Multi-Resolution Sensor Time-Series Store
+Rolls raw readings up into 1-minute, 1-hour and 1-day buckets on ingest
+"""
+
+import logging
+from collections import deque
+from itertools import islice
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def _floor_minute(ts):
+    return ts.replace(second=0, microsecond=0)
+
+
+def _floor_hour(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(ts):
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class Bucket:
+    """min/max/sum/count rollup of every metric over one time bucket"""
+
+    __slots__ = ('start', 'count', 'sums', 'mins', 'maxs')
+
+    def __init__(self, start, values):
+        self.start = start
+        self.count = 1
+        self.sums = list(values)
+        self.mins = list(values)
+        self.maxs = list(values)
+
+    def add(self, values):
+        self.count += 1
+        sums, mins, maxs = self.sums, self.mins, self.maxs
+        for i, v in enumerate(values):
+            sums[i] += v
+            if v < mins[i]:
+                mins[i] = v
+            if v > maxs[i]:
+                maxs[i] = v
+
+
+class Tier:
+    """One resolution level: a bounded deque of buckets, newest last"""
+
+    def __init__(self, name, resolution, floor, retention):
+        self.name = name
+        self.resolution = resolution
+        self.floor = floor
+        self.buckets = deque(maxlen=retention)
+        self.dropped = 0  # late readings older than anything still retained
+
+    def covers(self, start):
+        """True if nothing at or after ``start`` has been evicted yet"""
+        if len(self.buckets) < self.buckets.maxlen:
+            return True
+        return self.buckets[0].start <= self.floor(start)
+
+    def ingest(self, ts, values):
+        """Add a reading; returns False if it was too late to keep"""
+        buckets = self.buckets
+        start = self.floor(ts)
+        if not buckets or start > buckets[-1].start:
+            buckets.append(Bucket(start, values))
+        elif buckets[-1].start == start:
+            buckets[-1].add(values)
+        elif len(buckets) == buckets.maxlen and start < buckets[0].start:
+            # Its bucket was already evicted; keeping it would evict newer data
+            self.dropped += 1
+            return False
+        else:
+            # Late reading: fold into its bucket, or open one in a gap
+            i = len(buckets) - 1
+            while i >= 0 and buckets[i].start > start:
+                i -= 1
+            if i >= 0 and buckets[i].start == start:
+                buckets[i].add(values)
+                return True
+            if len(buckets) == buckets.maxlen:
+                buckets.popleft()
+                i -= 1
+            buckets.insert(i + 1, Bucket(start, values))
+        return True
+
+    def range(self, start, end):
+        return [b for b in self.buckets if start <= b.start <= end]
+
+
+class TimeSeriesStore:
+    """Raw -> 1-min -> 1-hour -> 1-day store with constant-size retention.
+
+    Every tier is updated incrementally on ingest, so queries never rescan
+    raw readings; each tier keeps a fixed number of buckets.
+    """
+
+    # (name, bucket width, floor function, buckets retained)
+    TIERS = (
+        ('minute', timedelta(minutes=1), _floor_minute, 24 * 60),
+        ('hour', timedelta(hours=1), _floor_hour, 24 * 31),
+        ('day', timedelta(days=1), _floor_day, 366),
+    )
+
+    def __init__(self, metrics, raw_retention=1000, clock=None):
+        self.metrics = tuple(metrics)
+        self.clock = clock or datetime.now  # "now" for open-ended queries
+        self.raw = deque(maxlen=raw_retention)
+        self.tiers = [Tier(*spec) for spec in self.TIERS]
+        self._tiers_by_name = {t.name: t for t in self.tiers}
+
+    @staticmethod
+    def _parse_ts(ts):
+        if isinstance(ts, datetime):
+            return ts
+        return datetime.fromisoformat(ts)
+
+    def ingest(self, reading):
+        """Add one reading dict (must carry a timestamp) to every tier"""
+        ts = self._parse_ts(reading['timestamp'])
+        values = [float(reading.get(m, 0.0)) for m in self.metrics]
+        self.raw.append((ts, values))
+        for tier in self.tiers:
+            # Logged on the 1st, 10th, 100th and every 1000th drop per tier
+            if not tier.ingest(ts, values) and (tier.dropped in (1, 10, 100) or tier.dropped % 1000 == 0):
+                logger.warning(f"Dropped late sensor reading at {ts.isoformat()}: older than the "
+                               f"{tier.name} tier keeps ({tier.dropped} dropped so far)")
+
+    def stats(self):
+        """Late readings dropped per tier (a clock or delivery problem upstream)"""
+        return {'late_dropped': {tier.name: tier.dropped for tier in self.tiers}}
+
+    def pick_tier(self, start, end, max_points=500):
+        """Choose the coarsest resolution needed for the range.
+
+        Walks from raw upwards and returns the first tier that still holds
+        data back to ``start`` and fits the range in ``max_points`` buckets;
+        falls back to the daily tier.
+        """
+        span = end - start
+        raw_complete = len(self.raw) < self.raw.maxlen or self.raw[0][0] <= start
+        if raw_complete and sum(1 for ts, _ in self.raw if start <= ts <= end) <= max_points:
+            return 'raw'
+        for tier in self.tiers:
+            if tier.covers(start) and span / tier.resolution <= max_points:
+                return tier.name
+        return self.tiers[-1].name
+
+    def query(self, start, end=None, resolution=None, max_points=500):
+        """Return rollup points for [start, end] at the chosen resolution"""
+        end = end or self.clock()
+        resolution = resolution or self.pick_tier(start, end, max_points)
+
+        if resolution == 'raw':
+            return resolution, [
+                self._point(ts, 1, values, values, values)
+                for ts, values in self.raw if start <= ts <= end
+            ]
+
+        tier = self._tiers_by_name.get(resolution)
+        if tier is None:
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        points = []
+        for b in tier.range(tier.floor(start), end):
+            means = [s / b.count for s in b.sums]
+            points.append(self._point(b.start, b.count, means, b.mins, b.maxs))
+        return resolution, points
+
+    def _point(self, ts, count, means, mins, maxs):
+        point = {'timestamp': ts.isoformat(), 'count': count}
+        for i, metric in enumerate(self.metrics):
+            point[metric] = {
+                'mean': round(means[i], 2),
+                'min': round(mins[i], 2),
+                'max': round(maxs[i], 2),
+            }
+        return point
+
+    def latest(self, resolution, count):
+        """Last ``count`` buckets of a tier as (start, bucket count, means)"""
+        tier = self._tiers_by_name[resolution]
+        buckets = reversed(list(islice(reversed(tier.buckets), count)))
+        return [
+            (b.start, b.count, {m: s / b.count for m, s in zip(self.metrics, b.sums)})
+            for b in buckets
+        ]
@@ -0,0 +1,302 @@
+"""
+Request Validation
+Declarative request schemas compiled once into per-field converters, with
+range checks and vectorized coercion for batch payloads
+"""
+
+import math
+from datetime import datetime
+from itertools import chain
+from collections.abc import Mapping
+
+import numpy as np
+
+_MISSING = object()
+
+# Errors reported per batch; the first few are enough to fix a sheet
+MAX_ERRORS = 20
+
+# Cell types np.array would silently coerce to a float (1.0/0.0, NaN)
+_NOT_NUMBERS = frozenset((bool, type(None)))
+
+
+class ValidationError(ValueError):
+    """Request input failed validation.
+
+    ``errors`` lists every problem as ``{'field', 'message'}`` (plus
+    ``row`` for batch payloads: the 0-based index into the samples, so
+    the first data row of a CSV is row 0); the app turns it into a
+    uniform 400.
+    """
+
+    def __init__(self, errors, message='Invalid input values', required=None):
+        self.errors = errors
+        self.message = message
+        self.required = required
+        super().__init__('; '.join(map(self._describe, errors)))
+
+    @staticmethod
+    def _describe(error):
+        where = [f"row {error['row']}"] if 'row' in error else []
+        if error.get('field'):
+            where.append(error['field'])
+        return ': '.join(where + [error['message']])
+
+    def to_dict(self):
+        body = {'error': self.message, 'message': str(self), 'errors': self.errors}
+        if self.required:
+            body['required'] = self.required
+        return body
+
+
+def _to_float(value):
+    # bool is an int subclass; a JSON true is not a measurement
+    if isinstance(value, bool):
+        raise ValueError('must be a number')
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('must be a number') from None
+    if not math.isfinite(number):
+        raise ValueError('must be a finite number')
+    return number
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        raise ValueError('must be an integer')
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError('must be an integer')
+        return int(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('must be an integer') from None
+
+
+_TRUE = frozenset(('1', 'true', 'yes', 'on'))
+_FALSE = frozenset(('0', 'false', 'no', 'off'))
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError('must be true or false')
+
+
+def _to_str(value):
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        raise ValueError('must be a string')
+    return str(value).strip()
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError('must be an ISO 8601 timestamp') from None
+
+
+_CONVERTERS = {float: _to_float, int: _to_int, bool: _to_bool, str: _to_str, datetime: _to_datetime}
+
+
+class Field:
+    """One input field: its type, whether it is required, and its allowed values"""
+
+    __slots__ = ('name', 'kind', 'required', 'default', 'min', 'max', 'choices', 'aliases')
+
+    def __init__(self, name, kind=float, required=True, default=None, min=None, max=None,
+                 choices=None, aliases=()):
+        if kind not in _CONVERTERS:
+            raise TypeError(f"Unsupported field type: {kind!r}")
+        self.name = name
+        self.kind = kind
+        self.required = required and default is None
+        self.default = default
+        self.min = min
+        self.max = max
+        self.choices = frozenset(choices) if choices is not None else None
+        self.aliases = tuple(aliases)
+
+    def compile(self):
+        """Converter for one raw value; raises ValueError with the reason"""
+        convert = _CONVERTERS[self.kind]
+        low, high, choices = self.min, self.max, self.choices
+
+        if low is None and high is None and choices is None:
+            return convert
+
+        if choices is not None:
+            allowed = ', '.join(sorted(map(str, choices)))
+
+            def check(value):
+                value = convert(value)
+                if value not in choices:
+                    raise ValueError(f"must be one of {allowed}")
+                return value
+            return check
+
+        def check(value):
+            value = convert(value)
+            if low is not None and value < low:
+                raise ValueError(f"must be at least {low:g}" if high is None
+                                 else f"must be between {low:g} and {high:g}")
+            if high is not None and value > high:
+                raise ValueError(f"must be at most {high:g}" if low is None
+                                 else f"must be between {low:g} and {high:g}")
+            return value
+        return check
+
+
+class Schema:
+    """Validates a request body or query string against a list of Fields.
+
+    Each field is compiled to a converter once, when the schema is built
+    at import time, so validating a request is one pass over a tuple of
+    closures. ``validate`` returns a dict of converted values (defaults
+    filled in, unknown keys dropped) or raises ValidationError listing
+    every bad field at once. ``validate_matrix`` coerces a whole batch of
+    numeric samples with a single ``np.array`` call and checks all ranges
+    with two vectorized comparisons; per-cell parsing only happens to
+    pinpoint the errors when the batch is invalid.
+    """
+
+    def __init__(self, *fields, message='Invalid input values'):
+        self.fields = fields
+        self.names = [field.name for field in fields]
+        self.message = message
+        self.required = [field.name for field in fields if field.required]
+        self._compiled = tuple(
+            (field.name, (field.name, *field.aliases), field.required, field.default, field.compile())
+            for field in fields
+        )
+        if all(field.kind is float for field in fields):
+            self._low = np.array([-np.inf if f.min is None else f.min for f in fields], dtype=np.float64)
+            self._high = np.array([np.inf if f.max is None else f.max for f in fields], dtype=np.float64)
+        else:
+            self._low = self._high = None
+
+    def _error(self, errors):
+        return ValidationError(errors, self.message, self.required)
+
+    def validate(self, data):
+        """Converted values of one mapping (JSON body or request.args)"""
+        if data is None:
+            data = {}
+        if not isinstance(data, Mapping):
+            raise self._error([{'field': None, 'message': 'Expected a JSON object'}])
+
+        values, errors = {}, []
+        for name, keys, required, default, convert in self._compiled:
+            value = _MISSING
+            for key in keys:
+                value = data.get(key, _MISSING)
+                if value is not _MISSING:
+                    break
+            # An empty query parameter or string counts as not sent
+            if value is _MISSING or value is None or (isinstance(value, str) and not value.strip()):
+                if required:
+                    errors.append({'field': name, 'message': 'is required'})
+                elif default is not None:
+                    values[name] = default
+                continue
+            try:
+                values[name] = convert(value)
+            except ValueError as e:
+                errors.append({'field': name, 'message': str(e)})
+        if errors:
+            raise self._error(errors)
+        return values
+
+    def validate_matrix(self, rows, max_samples=None):
+        """(n, fields) float64 array from a list of value lists or of dicts"""
+        if self._low is None:
+            raise TypeError('validate_matrix needs an all-float schema')
+        if isinstance(rows, np.ndarray):
+            samples = rows
+        else:
+            if not isinstance(rows, (list, tuple)):
+                raise self._error([{'field': None, 'message': 'Expected a list of samples'}])
+            if max_samples is not None and len(rows) > max_samples:
+                raise self._error([{'field': None,
+                                    'message': f"Too many samples: {len(rows)} (max {max_samples})"}])
+            if rows and isinstance(rows[0], Mapping):
+                try:
+                    samples = [[row[name] for name in self.names] for row in rows]
+                except (KeyError, TypeError):
+                    raise self._error(self._locate(rows)) from None
+            else:
+                samples = rows
+            # np.array would read JSON true/false as 1.0/0.0 and null as
+            # NaN, which validate() rejects as a type error and a missing
+            # value; one C-level pass over the cell types finds both
+            try:
+                suspect = not set(map(type, chain.from_iterable(samples))).isdisjoint(_NOT_NUMBERS)
+            except TypeError:
+                suspect = True  # a row that isn't a list: let _locate say which
+            if suspect:
+                raise self._error(self._locate(rows))
+
+        try:
+            X = np.array(samples, dtype=np.float64)
+        except (ValueError, TypeError):
+            raise self._error(self._locate(rows)) from None
+        if len(samples) == 0:
+            return X.reshape(0, len(self.names))
+        if X.ndim != 2 or X.shape[1] != len(self.names):
+            raise self._error([{'field': None, 'message':
+                                f"Each sample needs {len(self.names)} values "
+                                f"({', '.join(self.names)})"}])
+
+        # NaN fails both comparisons, so it is caught here as well
+        bad = ~((X >= self._low) & (X <= self._high))
+        if bad.any():
+            errors = []
+            for i, j in zip(*np.nonzero(bad)):
+                if len(errors) == MAX_ERRORS:
+                    break
+                field = self.fields[j]
+                try:
+                    self._compiled[j][4](X[i, j])
+                except ValueError as e:
+                    errors.append({'row': int(i), 'field': field.name, 'message': str(e)})
+            raise self._error(errors)
+        return X
+
+    def _locate(self, rows):
+        """Per-cell errors of a batch that failed bulk conversion"""
+        errors = []
+        as_objects = bool(len(rows)) and isinstance(rows[0], Mapping)
+        for i, row in enumerate(rows):
+            if isinstance(row, Mapping) != as_objects:
+                errors.append({'row': i, 'field': None, 'message':
+                               'Samples must all be objects or all be value lists'})
+            elif as_objects:
+                try:
+                    self.validate(row)
+                except ValidationError as e:
+                    errors.extend({'row': i, **error} for error in e.errors)
+            elif not isinstance(row, (list, tuple)) or len(row) != len(self.names):
+                errors.append({'row': i, 'field': None, 'message':
+                               f"Expected {len(self.names)} values ({', '.join(self.names)})"})
+            else:
+                for (name, _, _, _, convert), value in zip(self._compiled, row):
+                    # Missing as in validate(): null or a blank cell
+                    if value is None or (isinstance(value, str) and not value.strip()):
+                        errors.append({'row': i, 'field': name, 'message': 'is required'})
+                        continue
+                    try:
+                        convert(value)
+                    except ValueError as e:
+                        errors.append({'row': i, 'field': name, 'message': str(e)})
+            if len(errors) >= MAX_ERRORS:
+                return errors[:MAX_ERRORS]
+        return errors or [{'field': None, 'message': 'Samples could not be read as numbers'}]
@@ -0,0 +1,139 @@
+"""Rule-file validation in services/sensor_rules.py"""
+
+import json
+import logging
+
+import numpy as np
+import pytest
+
+from services.iot_service import IOTSimulator
+from services.sensor_rules import CompiledRules, SensorRules
+
+METRICS = ('nitrogen', 'ph', 'soil_moisture')
+
+RECOMMENDATION = {
+    'when': {'nitrogen': {'lt': 50}},
+    'type': 'nutrient',
+    'severity': 'critical',
+    'icon': '!',
+    'message': 'Low nitrogen ({nitrogen})',
+    'action': 'Fertilize',
+}
+
+
+def compile_profile(profile):
+    return CompiledRules('test', profile, METRICS, {})
+
+
+def recommendation(**changes):
+    return {**RECOMMENDATION, **changes}
+
+
+def skipped(caplog):
+    return [r.getMessage() for r in caplog.records
+            if r.levelno == logging.WARNING and 'skipping' in r.getMessage()]
+
+
+def test_valid_profile_evaluates_without_warnings(caplog):
+    rules = compile_profile({
+        'alerts': {'ph': {'min': 4, 'optimal_min': 6, 'optimal_max': 7.5, 'max': 9}},
+        'health': {'soil_moisture': [{'when': {'lt': 30}, 'points': 25}]},
+        'recommendations': [recommendation()],
+    })
+    result = rules.evaluate({'nitrogen': 40, 'ph': 8, 'soil_moisture': 20})
+    assert result.alerts()[0]['status'] == 'warning'
+    assert result.health_score() == 75
+    assert [r['message'] for r in result.recommendations()] == ['Low nitrogen (40.0)']
+    assert skipped(caplog) == []
+
+
+def test_unknown_metric_in_recommendation_is_skipped(caplog):
+    rules = compile_profile({'recommendations': [
+        recommendation(when={'potassium': {'lt': 10}}),
+        recommendation(),
+    ]})
+    assert len(rules.recommendations) == 1
+    assert rules.evaluate({'nitrogen': 40}).rec_hits.tolist() == [[True]]
+    assert "unknown metric 'potassium'" in skipped(caplog)[0]
+
+
+def test_unknown_metric_in_alerts_and_health_is_skipped(caplog):
+    rules = compile_profile({
+        'alerts': {'potassium': {'min': 1, 'optimal_min': 2, 'optimal_max': 3, 'max': 4}},
+        'health': {'potassium': [{'when': {'lt': 10}, 'points': 5}]},
+    })
+    assert rules.alert_sensors == []
+    assert rules.health_bands == []
+    messages = skipped(caplog)
+    assert len(messages) == 2
+    assert all("unknown metric 'potassium'" in m for m in messages)
+
+
+@pytest.mark.parametrize('when', [{}, [], None])
+def test_empty_when_is_skipped(caplog, when):
+    rules = compile_profile({'recommendations': [recommendation(when=when), recommendation()]})
+    assert len(rules.recommendations) == 1
+    # The remaining rule still lines up with its clauses
+    hits = rules.evaluate(np.array([[40.0, 7.0, 50.0], [60.0, 7.0, 50.0]])).rec_hits
+    assert hits.tolist() == [[True], [False]]
+    assert "'when' has no conditions" in skipped(caplog)[0]
+
+
+def test_only_empty_when_rules_leave_no_recommendations(caplog):
+    rules = compile_profile({'recommendations': [recommendation(when={})],
+                             'fallback_recommendation': {'message': 'ok'}})
+    result = rules.evaluate({'nitrogen': 40})
+    assert result.rec_hits.shape == (1, 0)
+    assert result.recommendations() == [{'message': 'ok'}]
+
+
+def test_empty_health_band_condition_is_skipped(caplog):
+    rules = compile_profile({'health': {'ph': [{'when': {}, 'points': 50},
+                                               {'when': {'gt': 8}, 'points': 10}]}})
+    assert rules.evaluate({'ph': 7}).health_score() == 100
+    assert rules.evaluate({'ph': 9}).health_score() == 90
+    assert 'ph[0]' in skipped(caplog)[0]
+
+
+@pytest.mark.parametrize('spec, reason', [
+    ({'below': 5}, 'unknown operator below'),
+    ({'outside': [1]}, "'outside' needs [low, high]"),
+    ({'lt': 'low'}, 'could not convert'),
+])
+def test_malformed_clause_is_skipped(caplog, spec, reason):
+    rules = compile_profile({'recommendations': [recommendation(when={'nitrogen': spec})]})
+    assert rules.recommendations == []
+    assert reason in skipped(caplog)[0]
+
+
+def test_missing_keys_are_skipped(caplog):
+    incomplete = dict(RECOMMENDATION)
+    del incomplete['action']
+    rules = compile_profile({
+        'alerts': {'ph': {'min': 4, 'max': 9}},
+        'recommendations': [incomplete, recommendation(message='Low {potassium}')],
+    })
+    assert rules.alert_sensors == []
+    assert rules.recommendations == []
+    messages = skipped(caplog)
+    assert "missing 'optimal_min'" in messages[0]
+    assert "missing 'action'" in messages[1]
+    assert 'unknown placeholder' in messages[2]
+
+
+def test_rule_file_is_checked_at_load_time(tmp_path, caplog):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'profiles': {
+        'default': {'recommendations': [recommendation()]},
+        'Rice': {'recommendations': [recommendation(when={})]},
+    }}))
+    rules = SensorRules(METRICS, path=str(path))
+    assert 'test' not in skipped(caplog)[0]
+    assert 'Rice/recommendations' in skipped(caplog)[0]
+    assert len(rules.for_crop('Rice').recommendations) == 0
+    assert len(rules.for_crop('Wheat').recommendations) == 1
+
+
+def test_shipped_rule_file_is_valid(caplog):
+    SensorRules(IOTSimulator.METRICS)
+    assert skipped(caplog) == []